@@ -0,0 +1,47 @@
+"""Documents table
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+Databases created before migrations were added are stamped at this
+revision (``alembic stamp 0001``) and upgraded from here.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "documents",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("filename", sa.String(), nullable=True),
+        sa.Column("file_path", sa.String(), nullable=True),
+        sa.Column("extracted_text_path", sa.String(), nullable=True),
+        sa.Column("uploaded_at", sa.DateTime(), nullable=True),
+        sa.Column("file_size", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("content_hash", sa.String(), nullable=True),
+        sa.Column("mime_type", sa.String(), nullable=True),
+        sa.Column("metadata", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_documents_id", "documents", ["id"])
+    op.create_index("ix_documents_filename", "documents", ["filename"])
+    op.create_index("ix_documents_content_hash", "documents", ["content_hash"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_content_hash", table_name="documents")
+    op.drop_index("ix_documents_filename", table_name="documents")
+    op.drop_index("ix_documents_id", table_name="documents")
+    op.drop_table("documents")
@@ -0,0 +1,46 @@
+"""Document versions and page fingerprints
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.add_column(sa.Column("page_hashes", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("version", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("parent_id", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("lineage_id", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("reuse_stats", sa.Text(), nullable=True))
+        batch_op.create_foreign_key(
+            "documents_parent_id_fkey", "documents",
+            ["parent_id"], ["id"], ondelete="SET NULL"
+        )
+        batch_op.create_index("ix_documents_parent_id", ["parent_id"], unique=True)
+        batch_op.create_index("ix_documents_lineage_id", ["lineage_id"])
+    op.execute("UPDATE documents SET version = 1 WHERE version IS NULL")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_index("ix_documents_lineage_id")
+        batch_op.drop_index("ix_documents_parent_id")
+        batch_op.drop_constraint("documents_parent_id_fkey", type_="foreignkey")
+        batch_op.drop_column("reuse_stats")
+        batch_op.drop_column("lineage_id")
+        batch_op.drop_column("parent_id")
+        batch_op.drop_column("version")
+        batch_op.drop_column("page_hashes")
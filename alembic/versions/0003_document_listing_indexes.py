@@ -0,0 +1,61 @@
+"""Indexes for keyset-paginated document listings
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:20:00
+
+On PostgreSQL the indexes are built CONCURRENTLY, outside a transaction,
+so uploads keep working while a large table is indexed.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SUMMARY_INCLUDE = ["filename", "status", "file_size", "version"]
+
+
+def upgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_documents_uploaded_at_id", "documents", ["uploaded_at", "id"],
+            postgresql_include=SUMMARY_INCLUDE,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            "ix_documents_status_uploaded_at_id", "documents",
+            ["status", "uploaded_at", "id"],
+            postgresql_include=[name for name in SUMMARY_INCLUDE if name != "status"],
+            postgresql_concurrently=True
+        )
+        if is_postgresql:
+            op.create_index(
+                "ix_documents_filename_pattern", "documents", ["filename"],
+                postgresql_ops={"filename": "text_pattern_ops"},
+                postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        if is_postgresql:
+            op.drop_index(
+                "ix_documents_filename_pattern", table_name="documents",
+                postgresql_concurrently=True
+            )
+        op.drop_index(
+            "ix_documents_status_uploaded_at_id", table_name="documents",
+            postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_documents_uploaded_at_id", table_name="documents",
+            postgresql_concurrently=True
+        )
@@ -1,62 +1,303 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Path, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.session import get_db
-from app.services.storage import StorageService
-from app.schemas.document import DocumentCreate, DocumentInDB, DocumentUpdate
-from app.core.rate_limiter import RateLimiter
-from typing import List
-import hashlib
+from app.models.document import READY_STATUSES
+from app.services.ingestion import ingestion_pipeline
+from app.services.providers import get_qa_service, get_storage_service
+from app.services.text_store import get_text_store
+from app.schemas.document import (
+    BulkUploadResult,
+    DocumentCreate,
+    DocumentInDB,
+    DocumentPage,
+    DocumentSummary,
+    DocumentUpdate,
+    IngestionReuse,
+    IngestionStatus
+)
+from app.schemas.message import AnswerMessage, BatchQuestionRequest, ErrorMessage
+from app.core.config import get_settings
+from app.core.executors import run_io
+from app.core.rate_limiter import rate_limit
+from app.utils.pagination import decode_cursor, encode_cursor
+from starlette.datastructures import UploadFile as FormFile
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
-router = APIRouter()
-storage_service = StorageService()
-rate_limiter = RateLimiter()
+if TYPE_CHECKING:
+    from app.services.qa import QAService
+    from app.services.storage import StorageService
 
-@router.post("/upload", response_model=DocumentInDB)
+settings = get_settings()
+router = APIRouter(
+    dependencies=[Depends(rate_limit("documents", settings.RATE_LIMIT_PER_MINUTE))]
+)
+
+@router.post("/upload", response_model=DocumentInDB, status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    storage_service: "StorageService" = Depends(get_storage_service)
 ):
-    """Upload a PDF document."""
+    """Upload a PDF document and queue it for background ingestion."""
     if not file.filename.endswith('.pdf'):
         raise HTTPException(400, "Only PDF files are allowed")
         
-    # Generate content hash
-    content = await file.read()
-    content_hash = hashlib.sha256(content).hexdigest()
-    await file.seek(0)
-    
-    # Check if document already exists
-    existing_doc = storage_service.get_by_hash(db, content_hash)
-    if existing_doc:
-        raise HTTPException(400, "Document already exists")
-    
     document_in = DocumentCreate(filename=file.filename)
-    return await storage_service.store_document(db, file, document_in, content_hash)
+    with ingestion_pipeline.admission():
+        document = await storage_service.store_document(db, file, document_in)
+        await ingestion_pipeline.enqueue(document.id)
+    return document
+
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+@router.post(
+    "/bulk",
+    response_model=BulkUploadResult,
+    status_code=202,
+    openapi_extra={"requestBody": {"content": {
+        "multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"files": {
+                "type": "array", "items": {"type": "string", "format": "binary"}
+            }}
+        }},
+        "application/zip": {"schema": {"type": "string", "format": "binary"}},
+    }}}
+)
+async def upload_documents(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    storage_service: "StorageService" = Depends(get_storage_service)
+):
+    """Upload many PDFs, as multipart ``files`` or a ZIP archive request body.
+
+    Each new file is queued for ingestion; the response lists every file
+    with its document id, or why it was not stored (duplicate content, not
+    a PDF, too large). A ZIP archive is unpacked as it streams in.
+    """
+    # Imports PyMuPDF and the storage service; load it on first use
+    from app.services.bulk_upload import BulkUpload
 
-@router.get("/", response_model=List[DocumentInDB])
-def list_documents(
-    skip: int = Query(0, ge=0),
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    # Refuse at once when not even one more document would be queued;
+    # each batch is admitted again as it is stored
+    ingestion_pipeline.check_admission()
+    upload = BulkUpload(db, storage_service)
+    if content_type == "multipart/form-data":
+        # Starlette spools each part to a temporary file while parsing
+        async with request.form(max_files=settings.BULK_UPLOAD_MAX_FILES) as form:
+            await upload.add_files(
+                value for _, value in form.multi_items() if isinstance(value, FormFile)
+            )
+    elif content_type in ZIP_CONTENT_TYPES:
+        await upload.add_zip(request.stream())
+    else:
+        raise HTTPException(
+            415, "Send the files as multipart/form-data or a ZIP archive"
+        )
+    manifest = upload.manifest()
+    if upload.retry_after is not None:
+        # The batches before the refused one stay queued; the manifest says which
+        return JSONResponse(
+            status_code=503,
+            content=manifest.model_dump(mode="json"),
+            headers={"Retry-After": str(upload.retry_after)}
+        )
+    if manifest.error and not manifest.items:
+        raise HTTPException(400, manifest.error)
+    return manifest
+
+@router.get("/", response_model=DocumentPage)
+async def list_documents(
     limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    status: Optional[str] = Query(None, max_length=32),
+    filename_prefix: Optional[str] = Query(None, min_length=1, max_length=255),
+    include_total: bool = Query(False, description="add an estimated total count"),
+    db: AsyncSession = Depends(get_db),
+    storage_service: "StorageService" = Depends(get_storage_service)
 ):
-    """List all uploaded documents."""
-    return storage_service.get_documents(db, skip=skip, limit=limit)
+    """List document summaries, newest first, one keyset-paginated page at a time."""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    rows, has_more = await storage_service.list_documents(
+        db, limit=limit, after=after, status=status, filename_prefix=filename_prefix
+    )
+    page = DocumentPage(items=[DocumentSummary.model_validate(row) for row in rows])
+    if has_more:
+        page.next_cursor = encode_cursor(rows[-1]["uploaded_at"], rows[-1]["id"])
+    if include_total:
+        page.total_estimate = await storage_service.estimate_count(
+            db, status=status, filename_prefix=filename_prefix
+        )
+    return page
 
 @router.get("/{document_id}", response_model=DocumentInDB)
-def get_document(
+async def get_document(
     document_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    storage_service: "StorageService" = Depends(get_storage_service)
 ):
     """Get a specific document by ID."""
-    document = storage_service.get_document(db, document_id)
+    document = await storage_service.get_document(db, document_id)
     if not document:
         raise HTTPException(404, "Document not found")
     return document
 
+@router.get("/{document_id}/status", response_model=IngestionStatus)
+async def get_document_status(
+    document_id: int,
+    db: AsyncSession = Depends(get_db),
+    storage_service: "StorageService" = Depends(get_storage_service)
+):
+    """Get the ingestion status and progress of a document."""
+    document = await storage_service.get_document(db, document_id)
+    if not document:
+        raise HTTPException(404, "Document not found")
+
+    job = await ingestion_pipeline.get_status(document_id)
+    if job:
+        return job.to_status()
+
+    # No job on record (e.g. ingested by another worker or before a restart)
+    return IngestionStatus(
+        document_id=document.id,
+        status=document.status,
+        progress=1.0 if document.status in READY_STATUSES else 0.0,
+        reuse=IngestionReuse.model_validate_json(document.reuse_stats)
+        if document.reuse_stats else None
+    )
+
+@router.post(
+    "/{document_id}/versions", response_model=DocumentInDB, status_code=202
+)
+async def upload_document_version(
+    document_id: int,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    storage_service: "StorageService" = Depends(get_storage_service)
+):
+    """Upload a revised PDF as the next version of a document.
+
+    Pages and chunks unchanged since that version are not extracted or
+    embedded again; the status endpoint reports how much was reused.
+    """
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(400, "Only PDF files are allowed")
+
+    parent = await storage_service.get_document(db, document_id)
+    if not parent:
+        raise HTTPException(404, "Document not found")
+    if parent.status not in READY_STATUSES:
+        raise HTTPException(
+            409, f"Document is not ready for a new version (status: {parent.status})"
+        )
+    newer = await storage_service.get_next_version(db, document_id)
+    if newer:
+        raise HTTPException(
+            409, f"Document already has a newer version (document {newer.id})"
+        )
+
+    document_in = DocumentCreate(filename=file.filename)
+    with ingestion_pipeline.admission():
+        document = await storage_service.store_document(
+            db, file, document_in, parent=parent
+        )
+        await ingestion_pipeline.enqueue(document.id)
+    return document
+
+@router.get("/{document_id}/versions", response_model=List[DocumentInDB])
+async def list_document_versions(
+    document_id: int,
+    db: AsyncSession = Depends(get_db),
+    storage_service: "StorageService" = Depends(get_storage_service)
+):
+    """List every version in a document's lineage, oldest first."""
+    document = await storage_service.get_document(db, document_id)
+    if not document:
+        raise HTTPException(404, "Document not found")
+    return await storage_service.get_versions(db, document)
+
+def _read_page(text_path: str, page: int) -> Tuple[bytes, int]:
+    text = get_text_store().open(text_path)
+    return bytes(text.raw_page(page)), text.page_count
+
+@router.get("/{document_id}/pages/{page}", response_class=Response)
+async def get_document_page(
+    document_id: int,
+    page: int = Path(..., ge=1),
+    db: AsyncSession = Depends(get_db),
+    storage_service: "StorageService" = Depends(get_storage_service)
+):
+    """Extracted text of one page (1-based) as plain text; X-Page-Count gives the total."""
+    document = await storage_service.get_document(db, document_id)
+    if not document:
+        raise HTTPException(404, "Document not found")
+    if not document.extracted_text_path:
+        raise HTTPException(409, "Document text has not been extracted yet")
+
+    try:
+        content, page_count = await run_io(_read_page, document.extracted_text_path, page)
+    except FileNotFoundError:
+        raise HTTPException(409, "Document text has not been extracted yet")
+    except IndexError as e:
+        raise HTTPException(404, str(e))
+    return Response(
+        content,
+        media_type="text/plain",
+        headers={"X-Page-Count": str(page_count)}
+    )
+
+@router.post("/{document_id}/qa:batch")
+async def answer_questions(
+    document_id: int,
+    request: BatchQuestionRequest,
+    db: AsyncSession = Depends(get_db),
+    storage_service: "StorageService" = Depends(get_storage_service),
+    qa_service: "QAService" = Depends(get_qa_service)
+):
+    """Answer many questions about a document, streamed as NDJSON.
+
+    Each line is an answer or error message whose request_id is the
+    question's position in the request; lines arrive as answers finish,
+    not in request order.
+    """
+    document = await storage_service.get_document(db, document_id)
+    if not document:
+        raise HTTPException(404, "Document not found")
+    if document.status not in READY_STATUSES:
+        raise HTTPException(
+            409, f"Document is not ready for questions (status: {document.status})"
+        )
+    # Release the connection before the answers are streamed
+    await db.commit()
+
+    async def lines():
+        async for index, result in qa_service.answer_batch(
+            document, request.questions, request.retrieval
+        ):
+            if isinstance(result, AnswerMessage):
+                line = result.model_copy(update={"request_id": str(index)}).model_dump_json()
+            else:
+                line = ErrorMessage(
+                    error="Failed to process question",
+                    detail=str(result),
+                    code="QA_PROCESSING_ERROR",
+                    request_id=str(index)
+                ).model_dump_json(exclude_none=True)
+            yield line + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.delete("/{document_id}")
-def delete_document(
+async def delete_document(
     document_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    storage_service: "StorageService" = Depends(get_storage_service)
 ):
     """Delete a specific document."""
-    return storage_service.delete_document(db, document_id)
\ No newline at end of file
+    return await storage_service.delete_document(db, document_id)
\ No newline at end of file
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.providers import readiness
+
+router = APIRouter()
+
+
+@router.get("/ready")
+async def get_readiness():
+    """200 once the database is reachable and the heavy services are built, else 503.
+
+    With STARTUP_WARMUP off, the first probe starts the warm-up.
+    """
+    if not readiness.ready:
+        readiness.start()
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
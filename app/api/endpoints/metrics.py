@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import QUEUE_DEPTH, registry
+import asyncio
+
+router = APIRouter()
+
+
+def _default_executor_backlog() -> int:
+    # Work queued for asyncio.to_thread and run_in_executor(None, ...)
+    pool = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    return pool._work_queue.qsize() if pool is not None else 0
+
+
+QUEUE_DEPTH.labels("default_threads").set_function(_default_executor_backlog)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from app.core.config import get_settings
+from app.services.answer_cache import answer_cache
+from app.services.conversation_store import get_conversation_store
+from app.services.retriever_cache import retriever_cache
+
+settings = get_settings()
+router = APIRouter()
+
+@router.get("/stats")
+async def get_qa_stats():
+    """Hit rates of the QA caches, conversation memory and skipped LLM calls."""
+    # These modules import LangChain; load them on first use, not at startup
+    from app.services.embeddings import get_embedding_cache
+    from app.services.lexical_index import get_lexical_index
+    from app.services.qa import relevance_stats
+
+    stats = {
+        "answer_cache": answer_cache.stats(),
+        "retriever_cache": retriever_cache.stats(),
+        "lexical_index": get_lexical_index().stats(),
+        "relevance": relevance_stats.stats(),
+        "conversations": await get_conversation_store().stats()
+    }
+    if settings.EMBEDDING_CACHE_ENABLED:
+        stats["embedding_cache"] = get_embedding_cache().stats()
+    return stats
@@ -1,150 +1,338 @@
 # app/api/websockets/qa.py
 from fastapi import APIRouter, WebSocket, Depends, HTTPException, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from app.database.session import get_db
-from app.schemas.message import QuestionMessage, AnswerMessage
-from app.services.qa import QAService
-from app.core.rate_limiter import RateLimiter
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.database.session import get_session_factory
+from app.core.config import get_settings
+from app.core.executors import Overloaded
+from app.schemas.message import (
+    QuestionMessage,
+    AnswerMessage,
+    AnswerDeltaMessage,
+    CancelMessage,
+    ErrorMessage
+)
+from app.services.providers import get_qa_service
+from app.core.rate_limiter import get_rate_limiter
+from app.core.metrics import (
+    WEBSOCKET_CONNECTIONS,
+    WEBSOCKET_ERRORS,
+    current_trace,
+    start_trace
+)
+from contextlib import aclosing
+from pydantic import ValidationError
 import json
-from typing import Dict, Set
+from typing import TYPE_CHECKING, Dict, Optional, Set
 import asyncio
+import logging
+import uuid
 
-router = APIRouter()
-qa_service = QAService()
-rate_limiter = RateLimiter()
+if TYPE_CHECKING:
+    from app.services.qa import QAService
 
-# Store active connections and their rate limits
-active_connections: Dict[str, WebSocket] = {}
-client_message_counts: Dict[str, int] = {}
-RATE_LIMIT_WINDOW = 60  # seconds
-MAX_MESSAGES = 30  # messages per minute
+settings = get_settings()
+router = APIRouter()
+logger = logging.getLogger(__name__)
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.client_message_counts: Dict[str, int] = {}
+        # A client id may have several connections open, e.g. browser tabs
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
         
     async def connect(self, websocket: WebSocket, client_id: str):
         await websocket.accept()
-        self.active_connections[client_id] = websocket
-        self.client_message_counts[client_id] = 0
+        self.active_connections.setdefault(client_id, set()).add(websocket)
+        WEBSOCKET_CONNECTIONS.inc()
         
-    def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
+    def disconnect(self, client_id: str, websocket: WebSocket):
+        """Forget a connection; repeated calls for the same one do nothing."""
+        connections = self.active_connections.get(client_id)
+        if not connections or websocket not in connections:
+            return
+        connections.discard(websocket)
+        if not connections:
             del self.active_connections[client_id]
-        if client_id in self.client_message_counts:
-            del self.client_message_counts[client_id]
+        WEBSOCKET_CONNECTIONS.dec()
             
     async def check_rate_limit(self, client_id: str) -> bool:
-        current_count = self.client_message_counts.get(client_id, 0)
-        if current_count >= MAX_MESSAGES:
-            return False
-        self.client_message_counts[client_id] = current_count + 1
-        return True
-        
-    async def reset_rate_limits(self):
-        """Reset rate limits every minute"""
-        while True:
-            await asyncio.sleep(RATE_LIMIT_WINDOW)
-            self.client_message_counts.clear()
+        # Sliding window per client id, shared across connections and workers
+        return await get_rate_limiter().check_rate_limit(
+            f"ws:{client_id}",
+            settings.WS_RATE_LIMIT_PER_MINUTE
+        )
             
     async def send_personal_message(self, message: dict, client_id: str):
-        """Send a message to a specific client"""
-        if client_id in self.active_connections:
-            websocket = self.active_connections[client_id]
+        """Send a message to every connection of a specific client"""
+        for websocket in list(self.active_connections.get(client_id, ())):
             await websocket.send_json(message)
 
 manager = ConnectionManager()
 
+def with_trace(answer: AnswerMessage) -> AnswerMessage:
+    """Add the spans of the current trace, if one was requested, to the metadata."""
+    trace = current_trace()
+    if trace is not None:
+        answer.metadata = {**(answer.metadata or {}), "trace": trace.to_list()}
+    return answer
+
+class ClientConnection:
+    """Per-connection state: in-flight questions and serialized sends."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session_factory: async_sessionmaker,
+        qa_service: "QAService"
+    ):
+        self.websocket = websocket
+        # Questions run concurrently, so each one gets its own session
+        self.session_factory = session_factory
+        self.qa_service = qa_service
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, payload: dict):
+        """Send one frame; frames from concurrent answers never interleave."""
+        async with self._send_lock:
+            try:
+                await asyncio.wait_for(
+                    self.websocket.send_json(payload),
+                    timeout=settings.WS_SEND_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                # The client stopped reading; drop it rather than keep buffering
+                await self.websocket.close(code=1013)
+                raise WebSocketDisconnect(code=1013)
+
+    async def send_error(
+        self,
+        error: str,
+        code: str,
+        detail: Optional[str] = None,
+        request_id: Optional[str] = None
+    ):
+        WEBSOCKET_ERRORS.labels(code).inc()
+        await self.send(ErrorMessage(
+            error=error,
+            detail=detail,
+            code=code,
+            request_id=request_id
+        ).model_dump(exclude_none=True))
+
+    def submit(self, message: QuestionMessage, request_id: str):
+        """Start answering a question as its own task."""
+        task = asyncio.create_task(self.answer(message, request_id))
+        self.in_flight[request_id] = task
+        task.add_done_callback(lambda _: self._forget(request_id, task))
+
+    def _forget(self, request_id: str, task: asyncio.Task):
+        # A cancelled task can finish after its request id was reused
+        if self.in_flight.get(request_id) is task:
+            del self.in_flight[request_id]
+
+    async def cancel(self, request_id: str):
+        task = self.in_flight.pop(request_id, None)
+        if not task:
+            await self.send_error(
+                "No question in flight with this request id",
+                "UNKNOWN_REQUEST_ID",
+                request_id=request_id
+            )
+            return
+        task.cancel()
+        await self.send({"type": "cancelled", "request_id": request_id})
+
+    async def close(self):
+        """Cancel every in-flight question and wait for them to finish."""
+        tasks = list(self.in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.in_flight.clear()
+
+    async def answer(self, message: QuestionMessage, request_id: str):
+        # Runs in its own task, so the trace only collects this question's spans
+        if message.trace:
+            start_trace()
+        try:
+            if message.stream:
+                await self.stream_answer(message, request_id)
+                return
+
+            async with self.session_factory() as db:
+                answer = await self.qa_service.get_answer(
+                    db,
+                    message.document_id,
+                    message.question,
+                    message.conversation_id,
+                    message.document_ids,
+                    message.retrieval
+                )
+            answer.request_id = request_id
+            await self.send(with_trace(answer).model_dump())
+
+        except (asyncio.CancelledError, WebSocketDisconnect):
+            raise
+
+        except Overloaded as e:
+            try:
+                await self.send_error(
+                    "The server is busy. Retry the question shortly.",
+                    "OVERLOADED",
+                    detail=f"Retry after {e.retry_after}s",
+                    request_id=request_id
+                )
+            except Exception:
+                pass
+
+        except Exception as e:
+            # Handle QA service errors
+            try:
+                await self.send_error(
+                    "Failed to process question",
+                    "QA_PROCESSING_ERROR",
+                    detail=str(e),
+                    request_id=request_id
+                )
+            except Exception:
+                pass
+
+    async def stream_answer(self, message: QuestionMessage, request_id: str):
+        """Send answer_delta frames as tokens arrive, then the final answer.
+
+        Tokens pass through a bounded queue: when the client reads slowly the
+        queue fills and the LLM stream is paused instead of buffering without
+        limit. Tokens that queue up while a frame is being sent are coalesced
+        into the next frame, and a send that blocks for longer than
+        WS_SEND_TIMEOUT drops the connection.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_STREAM_BUFFER_SIZE)
+
+        async def produce():
+            try:
+                async with self.session_factory() as db, aclosing(
+                    self.qa_service.stream_answer(
+                        db,
+                        message.document_id,
+                        message.question,
+                        message.conversation_id,
+                        message.document_ids,
+                        message.retrieval
+                    )
+                ) as stream:
+                    async for item in stream:
+                        await queue.put(item)
+            except Exception as e:
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+
+                # Coalesce every token already buffered into one frame
+                deltas = []
+                while isinstance(item, str):
+                    deltas.append(item)
+                    item = queue.get_nowait() if not queue.empty() else None
+                if deltas:
+                    await self.send(AnswerDeltaMessage(
+                        delta="".join(deltas),
+                        conversation_id=message.conversation_id,
+                        request_id=request_id
+                    ).model_dump())
+
+                if isinstance(item, Exception):
+                    raise item
+                if isinstance(item, AnswerMessage):
+                    item.request_id = request_id
+                    await self.send(with_trace(item).model_dump())
+                    return
+        finally:
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
+
 @router.websocket("/ws/qa/{client_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     client_id: str,
-    db: Session = Depends(get_db)
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+    qa_service: "QAService" = Depends(get_qa_service)
 ):
     await manager.connect(websocket, client_id)
-    
-    # Start rate limit reset task
-    reset_task = asyncio.create_task(manager.reset_rate_limits())
+    connection = ClientConnection(websocket, session_factory, qa_service)
     
     try:
         while True:
+            # Reading continues while earlier questions are being answered
+            data = await websocket.receive_text()
+            try:
+                payload = json.loads(data)
+                if payload.get("type") == "cancel":
+                    await connection.cancel(CancelMessage(**payload).request_id)
+                    continue
+                message = QuestionMessage(**payload)
+            except (json.JSONDecodeError, AttributeError, ValidationError) as e:
+                await connection.send_error(
+                    "Invalid message format",
+                    "INVALID_MESSAGE_FORMAT",
+                    detail=str(e)
+                )
+                continue
+
+            request_id = message.request_id or str(uuid.uuid4())
+
             # Check rate limit
             if not await manager.check_rate_limit(client_id):
-                await websocket.send_json({
-                    "error": "Rate limit exceeded. Please wait before sending more messages.",
-                    "code": "RATE_LIMIT_EXCEEDED"
-                })
+                await connection.send_error(
+                    "Rate limit exceeded. Please wait before sending more messages.",
+                    "RATE_LIMIT_EXCEEDED",
+                    request_id=request_id
+                )
                 continue
 
-            try:
-                # Receive message
-                data = await websocket.receive_text()
-                message = QuestionMessage.parse_raw(data)
-                
-                # Process question and get answer
-                try:
-                    answer = await qa_service.get_answer(
-                        db,
-                        message.document_id,
-                        message.question,
-                        message.conversation_id
-                    )
-                    
-                    # Send response
-                    response = AnswerMessage(
-                        answer=answer.answer,
-                        confidence=answer.confidence,
-                        context=answer.context,
-                        conversation_id=answer.conversation_id
-                    )
-                    
-                    await websocket.send_json(response.dict())
-                    
-                except Exception as e:
-                    # Handle QA service errors
-                    await websocket.send_json({
-                        "error": "Failed to process question",
-                        "detail": str(e),
-                        "code": "QA_PROCESSING_ERROR"
-                    })
-                    
-            except json.JSONDecodeError:
-                await websocket.send_json({
-                    "error": "Invalid message format",
-                    "code": "INVALID_MESSAGE_FORMAT"
-                })
-                
-            except Exception as e:
-                await websocket.send_json({
-                    "error": "Internal server error",
-                    "detail": str(e),
-                    "code": "INTERNAL_SERVER_ERROR"
-                })
+            if request_id in connection.in_flight:
+                await connection.send_error(
+                    "A question with this request id is already in flight",
+                    "DUPLICATE_REQUEST_ID",
+                    request_id=request_id
+                )
+                continue
+
+            if len(connection.in_flight) >= settings.WS_MAX_IN_FLIGHT:
+                await connection.send_error(
+                    "Too many questions in flight. Wait for an answer or cancel one.",
+                    "TOO_MANY_IN_FLIGHT",
+                    request_id=request_id
+                )
+                continue
+
+            connection.submit(message, request_id)
                 
     except WebSocketDisconnect:
-        manager.disconnect(client_id)
+        pass
         
-    except Exception as e:
-        manager.disconnect(client_id)
-        # Log the error here
-        print(f"Error in websocket connection: {str(e)}")
+    except Exception:
+        WEBSOCKET_ERRORS.labels("CONNECTION_ERROR").inc()
+        logger.exception("Error in websocket connection %s", client_id)
         
     finally:
-        # Clean up
-        reset_task.cancel()
-        try:
-            await reset_task
-        except asyncio.CancelledError:
-            pass
-        manager.disconnect(client_id)
+        # Clean up: stop in-flight answers before releasing the connection
+        await connection.close()
+        manager.disconnect(client_id, websocket)
 
 # Helper function to broadcast messages to all connected clients
 async def broadcast_message(message: dict):
     """Broadcast a message to all connected clients"""
-    for client_id, connection in manager.active_connections.items():
-        try:
-            await connection.send_json(message)
-        except Exception as e:
-            print(f"Error sending message to client {client_id}: {str(e)}")
-            manager.disconnect(client_id)
\ No newline at end of file
+    # Failed connections are disconnected while iterating
+    for client_id, connections in list(manager.active_connections.items()):
+        for websocket in list(connections):
+            try:
+                await websocket.send_json(message)
+            except Exception as e:
+                WEBSOCKET_ERRORS.labels("BROADCAST_ERROR").inc()
+                logger.warning("Error sending message to client %s: %s", client_id, e)
+                manager.disconnect(client_id, websocket)
\ No newline at end of file
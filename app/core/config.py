@@ -1,6 +1,7 @@
 from typing import Any, Dict, Optional
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+import os
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "PDF QA Service"
@@ -14,21 +15,156 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = "5432"
     POSTGRES_DB: str = "pdf_qa_db"
 
+    # Full URL overriding the POSTGRES_* settings, e.g. sqlite:///storage/local.db
+    DATABASE_URI: Optional[str] = None
+
+    # Connection Pool (ignored for SQLite, which picks its own pool)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_ECHO: bool = False
+
     # SQLAlchemy Database URL
     @property
     def DATABASE_URL(self) -> str:
+        if self.DATABASE_URI:
+            return self.DATABASE_URI
         return (
             f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@"
             f"{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
+
+    # Same database through an asyncio driver (asyncpg, aiosqlite)
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        url = self.DATABASE_URL
+        for sync_prefix, async_prefix in (
+            ("postgresql://", "postgresql+asyncpg://"),
+            ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+            ("sqlite://", "sqlite+aiosqlite://"),
+        ):
+            if url.startswith(sync_prefix):
+                return async_prefix + url[len(sync_prefix):]
+        return url
+
     # Storage
     UPLOAD_DIR: str = "storage/pdfs"
     EXTRACTED_TEXT_DIR: str = "storage/extracted_text"
+    EXTRACTED_TEXT_COMPRESSION: str = "none"  # none, zlib (per page; pages are then copied on read)
+    EXTRACTED_TEXT_MAX_OPEN: int = 128  # memory-mapped text files kept open
+    VECTORSTORE_DIR: str = "storage/vectorstore"
+    VECTOR_INDEX_LAYOUT: str = "per_document"  # per_document, shared
+    VECTOR_INDEX_WRITE_BATCH: int = 1000
+    RETRIEVAL_K: int = 3
+    CHUNK_SIZE: int = 1000  # characters
+    CHUNK_OVERLAP: int = 200
+    MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # bytes
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    BULK_UPLOAD_MAX_FILES: int = 5000  # files per bulk upload request
+    BULK_UPLOAD_BATCH_SIZE: int = 500  # files stored and queued per database round trip
+
+    # Embeddings
+    EMBEDDING_PROVIDER: str = "openai"  # openai, hash (local, deterministic)
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    EMBEDDING_DIMENSIONS: int = 256  # hash provider only
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "storage/embedding_cache.sqlite3"
+    EMBEDDING_BATCH_SIZE: int = 256
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    EMBEDDING_COST_PER_1K_TOKENS: float = 0.0001
+
+    # Answer Cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_SCOPES: int = 1024  # (document, conversation context) pairs
+    ANSWER_CACHE_MAX_PER_SCOPE: int = 256
+    ANSWER_CACHE_TTL: float = 24 * 60 * 60  # seconds
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # 1.0 disables semantic matching
+
+    # PDF Extraction
+    PDF_PARALLEL_PAGE_THRESHOLD: int = 64  # pages before extraction is sharded
+
+    # Executors: bounded pools for CPU-bound and blocking work
+    EXECUTOR_CPU_WORKERS: int = min(4, os.cpu_count() or 1)  # processes: extraction, chunking
+    EXECUTOR_IO_WORKERS: int = 16  # threads: file, text store and index calls
+    EXECUTOR_MAX_QUEUE: int = 64  # interactive tasks waiting per pool before 503
+
+    # Retriever Cache
+    RETRIEVER_CACHE_MAX_ENTRIES: int = 64
+    RETRIEVER_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Hybrid Retrieval (BM25 + vector, fused by reciprocal rank)
+    RETRIEVAL_VECTOR_WEIGHT: float = 1.0  # 0 disables vector search
+    RETRIEVAL_LEXICAL_WEIGHT: float = 1.0  # 0 disables BM25
+    RETRIEVAL_CANDIDATES: int = 20  # results taken from each retriever before fusion
+    RETRIEVAL_RRF_K: int = 60
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    LEXICAL_INDEX_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # Reranking: over-fetch, rescore locally, keep what fits the prompt budget
+    RERANKER: str = "lexical"  # none, lexical
+    RERANK_CANDIDATES: int = 12  # chunks retrieved for the reranker to choose from
+    RERANK_TOKEN_BUDGET: int = 800  # estimated context tokens per prompt
+    RERANK_MIN_RELATIVE_SCORE: float = 0.6  # drop chunks below this share of the best score
+    RERANK_LEXICAL_WEIGHT: float = 0.5  # lexical reranker: TF-IDF cosine vs retrieval relevance
+
+    # Answers without relevant context skip the LLM
+    QA_NO_CONTEXT_THRESHOLD: float = 0.0  # best chunk relevance below this; 0 disables
+    QA_NO_CONTEXT_ANSWER: str = (
+        "I could not find anything relevant to this question in the document."
+    )
+
+    # Ingestion Pipeline
+    INGESTION_QUEUE_BACKEND: str = "memory"  # memory, sqlite
+    INGESTION_QUEUE_PATH: str = "storage/ingestion_queue.sqlite3"
+    INGESTION_WORKERS: int = 4
+    INGESTION_POLL_INTERVAL: float = 0.5
+    INGESTION_RETRY_BACKOFF: float = 1.0
+    INGESTION_MAX_PENDING: int = 256  # queued documents before uploads get 503
+    INGESTION_RETRY_AFTER: int = 30  # seconds, sent with that 503
+    INGESTION_STAGE_CONCURRENCY: Dict[str, int] = {
+        "extract": 2, "chunk": 2, "embed": 4, "persist": 2
+    }
+    INGESTION_STAGE_RETRIES: Dict[str, int] = {
+        "extract": 1, "chunk": 0, "embed": 3, "persist": 2
+    }
+
+    # Conversation Memory
+    CONVERSATION_STORE_BACKEND: str = "memory"  # memory, redis
+    CONVERSATION_MAX_ENTRIES: int = 10000
+    CONVERSATION_MAX_TOTAL_BYTES: int = 64 * 1024 * 1024  # memory backend only
+    CONVERSATION_MAX_BYTES: int = 16 * 1024  # per conversation
+    CONVERSATION_TTL: int = 24 * 60 * 60  # seconds since the last turn
+    CONVERSATION_MAX_TURNS: int = 10
+    CONVERSATION_CONTEXT_TURNS: int = 3  # recent turns included in the prompt
+    CONVERSATION_SUMMARIZE_AFTER: int = 0  # turns before older ones are summarized; 0 disables
+    CONVERSATION_SUMMARIZER: str = "extractive"  # extractive, llm
+    CONVERSATION_SUMMARY_MAX_CHARS: int = 2000
 
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
     WS_RATE_LIMIT_PER_MINUTE: int = 30
-    
+    RATE_LIMIT_BACKEND: str = "memory"  # memory, redis
+    RATE_LIMIT_FAIL_OPEN: bool = True  # allow requests if the backend is down
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    # WebSocket Streaming
+    WS_STREAM_BUFFER_SIZE: int = 64  # token chunks buffered per answer stream
+    WS_SEND_TIMEOUT: float = 10.0  # seconds a slow client may block a send
+    WS_MAX_IN_FLIGHT: int = 4  # concurrent questions per connection
+
+    # Batch Questions
+    QA_BATCH_MAX_QUESTIONS: int = 500
+    QA_BATCH_CONCURRENCY: int = 8  # LLM calls in flight per batch
+
+    # Startup
+    STARTUP_WARMUP: bool = True  # build heavy services in the background at startup
+
+    # Metrics and Tracing
+    METRICS_ENABLED: bool = True  # serve /metrics
+    TRACE_HEADER: str = "X-Trace"  # request header that turns on trace spans
+
     # Token Settings
     SECRET_KEY: str = "your-secret-key-here"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
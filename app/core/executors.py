@@ -0,0 +1,228 @@
+# app/core/executors.py
+"""Bounded pools for CPU-bound and blocking work.
+
+``cpu`` is a process pool for PDF extraction, page fingerprints and
+chunking; ``io`` is a thread pool for blocking file and index calls. A pool
+runs at most ``workers`` tasks at once. The rest wait in the pool's queue,
+interactive work (questions, page reads) ahead of bulk work (ingestion,
+batch questions). Work takes its priority from the caller's context, see
+``priority``.
+
+Interactive work that finds its queue full raises ``Overloaded``, which the
+API answers with 503 and Retry-After. Bulk work waits instead: the
+ingestion workers and batch concurrency already bound how much of it can
+queue, and uploads are admitted against the ingestion backlog.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+from app.core.config import get_settings
+from app.core.metrics import (
+    ADMISSION_REJECTIONS,
+    EXECUTOR_BUSY,
+    EXECUTOR_WAIT_SECONDS,
+    QUEUE_DEPTH
+)
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import math
+import threading
+import time
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = ("interactive", "bulk")
+
+_priority: ContextVar[int] = ContextVar("executor_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Submit work at ``level`` within the block, and from tasks started in it."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class Overloaded(Exception):
+    """A bounded queue is full; retry after ``retry_after`` seconds."""
+
+    def __init__(self, queue: str, retry_after: int):
+        super().__init__(f"The {queue} queue is full, retry in {retry_after}s")
+        self.queue = queue
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """A thread or process pool with a priority queue in front of it.
+
+    Slots are handed out on the event loop, so the pool itself never holds
+    more than ``workers`` tasks and its own FIFO queue cannot reorder work.
+    """
+
+    def __init__(self, name: str, kind: str, workers: int, max_queue: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self._pool: Optional[Executor] = None
+        self._running = 0
+        # (priority, arrival, future) of each waiting task
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self._mean_seconds = 0.0
+
+        for level, label in enumerate(PRIORITY_NAMES):
+            QUEUE_DEPTH.labels(f"{name}_{label}").set_function(
+                functools.partial(self.queued, level)
+            )
+        EXECUTOR_BUSY.labels(name).set_function(lambda: self._running)
+
+    def queued(self, level: Optional[int] = None) -> int:
+        return sum(1 for waiter in self._waiters if level is None or waiter[0] == level)
+
+    def retry_after(self) -> int:
+        """Seconds until the work ahead of a new task has likely drained."""
+        backlog = len(self._waiters) + self._running
+        return max(1, math.ceil(backlog * self._mean_seconds / self.workers))
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Run ``func(*args)`` in the pool once a slot is free."""
+        level = _priority.get()
+        waited = await self._acquire(level)
+        EXECUTOR_WAIT_SECONDS.labels(self.name, PRIORITY_NAMES[level]).observe(waited)
+
+        call = functools.partial(func, *args)
+        if self.kind == "thread":
+            # Trace spans follow the call into the thread, as with asyncio.to_thread
+            call = functools.partial(contextvars.copy_context().run, call)
+        try:
+            pool = self._get_pool()
+            future = pool.submit(call)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the task ends, even if the caller stops waiting
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(
+            functools.partial(self._finished, loop, time.perf_counter())
+        )
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # A crashed worker breaks the whole pool; the next task starts a new one
+            if self._pool is pool:
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def shutdown(self):
+        """Drop queued tasks and wait for the running ones."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def _acquire(self, level: int) -> float:
+        """Take a slot, waiting behind higher-priority and earlier work."""
+        if self._running < self.workers and not self._waiters:
+            self._running += 1
+            return 0.0
+        if level == INTERACTIVE and self.queued(INTERACTIVE) >= self.max_queue:
+            ADMISSION_REJECTIONS.labels(self.name).inc()
+            raise Overloaded(self.name, self.retry_after())
+
+        waiter = (level, next(self._arrivals), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        started = time.perf_counter()
+        try:
+            await waiter[2]
+        except asyncio.CancelledError:
+            if waiter[2].cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                    heapq.heapify(self._waiters)
+                except ValueError:
+                    pass
+            else:
+                # The slot was handed over just before the cancellation
+                self._release()
+            raise
+        return time.perf_counter() - started
+
+    def _finished(self, loop: asyncio.AbstractEventLoop, started: float, future):
+        # Runs in the worker thread, or the process pool's management thread
+        elapsed = time.perf_counter() - started
+        self._mean_seconds += 0.1 * (elapsed - self._mean_seconds)
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The loop has closed, and its waiters with it
+            self._running -= 1
+
+    def _release(self):
+        # Hand the slot straight to the next waiter, so new arrivals cannot take it
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running -= 1
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix=f"{self.name}-executor"
+                )
+        return self._pool
+
+
+_executors: Dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    """Return the "cpu" or "io" pool, creating it on first use."""
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            kind, workers = {
+                "cpu": ("process", settings.EXECUTOR_CPU_WORKERS),
+                "io": ("thread", settings.EXECUTOR_IO_WORKERS),
+            }[name]
+            executor = _executors[name] = BoundedExecutor(
+                name, kind, workers, settings.EXECUTOR_MAX_QUEUE
+            )
+    return executor
+
+
+async def run_cpu(func: Callable[..., T], *args: Any) -> T:
+    """Run a picklable module-level function in the CPU process pool."""
+    return await get_executor("cpu").run(func, *args)
+
+
+async def run_io(func: Callable[..., T], *args: Any) -> T:
+    """Run a blocking call in the I/O thread pool."""
+    return await get_executor("io").run(func, *args)
+
+
+def shutdown_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown()
@@ -0,0 +1,427 @@
+# app/core/metrics.py
+"""In-process metrics in the Prometheus text format, and per-request traces.
+
+Metrics are declared once at import and updated with a lock-protected
+increment, cheap enough to leave on. ``/metrics`` renders the registry.
+
+``stage(pipeline, name)`` times a block into the stage histogram. When a
+trace was started for the current request (X-Trace header or a message's
+``trace`` flag), the block is also recorded as a span of that trace.
+Spans follow the request into ``asyncio.to_thread`` calls and tasks.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from app.core.config import get_settings
+import threading
+import time
+
+settings = get_settings()
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Any):
+        """Child series for the label values, created on first use."""
+        # Label values are nearly always strings already, so look them up as given
+        child = self._children.get(values)
+        if child is not None:
+            return child
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for key, child in sorted(self._series()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        if not self.labelnames and not self._children:
+            self.labels()
+        return list(self._children.items())
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from ``function`` at scrape time."""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is None:
+            return self.value
+        try:
+            return float(self.function())
+        except Exception:
+            return float("nan")
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self.labels().set_function(function)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, key, child):
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+STAGE_SECONDS = histogram(
+    "pdfqa_stage_seconds",
+    "Time spent in each stage of ingestion and question answering",
+    ("pipeline", "stage")
+)
+HTTP_REQUEST_SECONDS = histogram(
+    "pdfqa_http_request_seconds",
+    "HTTP request latency until the response starts",
+    ("method", "endpoint", "status")
+)
+QA_QUESTIONS = counter(
+    "pdfqa_qa_questions_total",
+    "Questions answered, by how the answer was produced",
+    ("outcome",)
+)
+RATE_LIMIT_REJECTIONS = counter(
+    "pdfqa_rate_limit_rejections_total",
+    "Requests and messages rejected by the rate limiter",
+    ("scope",)
+)
+RATE_LIMIT_BACKEND_ERRORS = counter(
+    "pdfqa_rate_limit_backend_errors_total",
+    "Rate limiter backend failures"
+)
+WEBSOCKET_CONNECTIONS = gauge(
+    "pdfqa_websocket_connections",
+    "Open WebSocket connections"
+)
+WEBSOCKET_ERRORS = counter(
+    "pdfqa_websocket_errors_total",
+    "WebSocket errors, by code",
+    ("code",)
+)
+QUEUE_DEPTH = gauge(
+    "pdfqa_queue_depth",
+    "Work waiting in each queue or executor",
+    ("queue",)
+)
+EXECUTOR_BUSY = gauge(
+    "pdfqa_executor_busy",
+    "Tasks running in each executor pool",
+    ("pool",)
+)
+EXECUTOR_WAIT_SECONDS = histogram(
+    "pdfqa_executor_wait_seconds",
+    "Time tasks waited for an executor slot, by pool and priority",
+    ("pool", "priority")
+)
+ADMISSION_REJECTIONS = counter(
+    "pdfqa_admission_rejections_total",
+    "Work refused with 503 because its queue was full",
+    ("queue",)
+)
+CACHE_ENTRIES = gauge(
+    "pdfqa_cache_entries",
+    "Entries held by each in-process cache",
+    ("cache",)
+)
+CACHE_BYTES = gauge(
+    "pdfqa_cache_bytes",
+    "Approximate bytes held by each in-process cache",
+    ("cache",)
+)
+PROMPT_TOKENS = histogram(
+    "pdfqa_prompt_tokens",
+    "Estimated tokens of retrieved context and of the prompt sent to the LLM",
+    ("part",),
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000)
+)
+ANSWER_SECONDS = histogram(
+    "pdfqa_answer_seconds",
+    "Time from retrieval to the complete answer of questions sent to the LLM"
+)
+
+
+class Trace:
+    """Spans recorded for one request, as offsets from its start."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add(self, name: str, start: float, duration: float):
+        # list.append is atomic, so spans from worker threads need no lock
+        self.spans.append({
+            "name": name,
+            "start_ms": round((start - self.started) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+        })
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return sorted(self.spans, key=lambda span: span["start_ms"])
+
+    def server_timing(self) -> str:
+        """The spans as a Server-Timing header value."""
+        return ", ".join(
+            f'{span["name"]};dur={span["duration_ms"]}' for span in self.to_list()
+        )
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def start_trace() -> Trace:
+    """Record spans of the current context (and tasks it starts) into a new trace."""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+class stage:
+    """Time a block into STAGE_SECONDS and the current trace, if any.
+
+    A class rather than a generator-based context manager: it runs around
+    every step of every request, and this halves its cost.
+    """
+
+    __slots__ = ("pipeline", "name", "started")
+
+    def __init__(self, pipeline: str, name: str):
+        self.pipeline = pipeline
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.started
+        STAGE_SECONDS.labels(self.pipeline, self.name).observe(duration)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(f"{self.pipeline}.{self.name}", self.started, duration)
+        return False
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing HTTP requests and tracing them on request.
+
+    A request carrying TRACE_HEADER gets its spans back in a Server-Timing
+    header. Streamed bodies finish after the headers are sent, so their
+    later spans are not included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.trace_header = settings.TRACE_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = None
+        if any(name == self.trace_header and value not in (b"", b"0")
+               for name, value in scope["headers"]):
+            trace = start_trace()
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                endpoint = scope.get("endpoint")
+                HTTP_REQUEST_SECONDS.labels(
+                    scope["method"],
+                    getattr(endpoint, "__name__", "unmatched"),
+                    message["status"]
+                ).observe(time.perf_counter() - started)
+                if trace is not None and trace.spans:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,28 +1,218 @@
-from typing import Dict, Optional
+from typing import Optional, Tuple
+from collections import OrderedDict
+import logging
+import math
+import threading
 import time
-from fastapi import HTTPException
+from fastapi import HTTPException, Request
+from app.core.config import get_settings
+from app.core.metrics import RATE_LIMIT_BACKEND_ERRORS, RATE_LIMIT_REJECTIONS
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class RateLimitResult:
+    def __init__(self, allowed: bool, remaining: int, retry_after: float):
+        self.allowed = allowed
+        self.remaining = remaining
+        self.retry_after = retry_after
+
+
+def sliding_window(
+    previous: int,
+    current: int,
+    elapsed: float,
+    window_size: float,
+    max_requests: int
+) -> Tuple[bool, int, float]:
+    """Decide one request with the sliding-window counter approximation.
+
+    The previous fixed window's count is weighted by how much of it still
+    overlaps the sliding window ending now. Returns (allowed, remaining,
+    retry_after) where ``current`` does not yet include this request.
+    ``retry_after`` is the time until the estimate leaves room for one more
+    request, in whole seconds and at least 1.
+    """
+    weight = 1.0 - elapsed / window_size
+    estimate = previous * weight + current
+    if estimate + 1 <= max_requests:
+        return True, int(max_requests - estimate - 1), 0.0
+
+    if current >= max_requests:
+        # Wait for this window to end, then for its weight to decay enough
+        retry_after = window_size - elapsed + window_size * (1 - (max_requests - 1) / current)
+    else:
+        # Wait for enough of the previous window to slide out
+        retry_after = window_size * (1 - (max_requests - current - 1) / previous) - elapsed
+    return False, 0, max(math.ceil(retry_after), 1)
+
+
+class InMemoryRateLimitBackend:
+    """Per-process sliding-window counters: two integers per key.
+
+    Keys are kept in least-recently-used order so idle keys, whose windows
+    have fully expired, are dropped from the front as new requests arrive.
+    """
 
-class RateLimiter:
     def __init__(self):
-        self.requests: Dict[str, list] = {}
-        self.window_size = 60  # 60 seconds
-        
-    def check_rate_limit(self, key: str, max_requests: int) -> bool:
-        current_time = time.time()
-        
-        if key not in self.requests:
-            self.requests[key] = []
-            
-        # Remove old requests
-        self.requests[key] = [
-            req_time for req_time in self.requests[key]
-            if current_time - req_time < self.window_size
-        ]
-        
-        # Check if rate limit is exceeded
-        if len(self.requests[key]) >= max_requests:
-            return False
-            
-        # Add new request
-        self.requests[key].append(current_time)
-        return True
\ No newline at end of file
+        # key -> [window_start, previous_count, current_count]
+        self._windows: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def hit(
+        self,
+        key: str,
+        max_requests: int,
+        window_size: float
+    ) -> RateLimitResult:
+        return self.hit_sync(key, max_requests, window_size)
+
+    def hit_sync(
+        self,
+        key: str,
+        max_requests: int,
+        window_size: float
+    ) -> RateLimitResult:
+        now = time.time()
+        window_start = now - now % window_size
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None:
+                state = self._windows[key] = [window_start, 0, 0]
+            else:
+                self._windows.move_to_end(key)
+                if state[0] != window_start:
+                    # Roll over; a gap of more than one window forgets everything
+                    adjacent = window_start - state[0] <= window_size
+                    state[:] = [window_start, state[2] if adjacent else 0, 0]
+
+            allowed, remaining, retry_after = sliding_window(
+                state[1], state[2], now - window_start, window_size, max_requests
+            )
+            if allowed:
+                state[2] += 1
+
+            self._expire_idle(now, window_size)
+        return RateLimitResult(allowed, remaining, retry_after)
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def _expire_idle(self, now: float, window_size: float):
+        while self._windows:
+            key, state = next(iter(self._windows.items()))
+            if now - state[0] < 2 * window_size:
+                break
+            del self._windows[key]
+
+
+# KEYS[1] current window counter, KEYS[2] previous window counter
+# ARGV: max_requests, window_size (ms), elapsed in current window (ms)
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local max_requests = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local estimate = previous * (1 - elapsed / window) + current
+if estimate + 1 <= max_requests then
+    redis.call('INCR', KEYS[1])
+    redis.call('PEXPIRE', KEYS[1], window * 2)
+    return {1, previous, current}
+end
+return {0, previous, current}
+"""
+
+
+class RedisRateLimitBackend:
+    """Sliding-window counters in Redis, shared by every worker process.
+
+    Each key uses at most two small counters that expire on their own.
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit"):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.redis.register_script(SLIDING_WINDOW_SCRIPT)
+
+    async def hit(
+        self,
+        key: str,
+        max_requests: int,
+        window_size: float
+    ) -> RateLimitResult:
+        now = time.time()
+        window_index = math.floor(now / window_size)
+        elapsed = now - window_index * window_size
+        allowed, previous, current = await self._script(
+            keys=[
+                f"{self.prefix}:{key}:{window_index}",
+                f"{self.prefix}:{key}:{window_index - 1}",
+            ],
+            args=[max_requests, int(window_size * 1000), int(elapsed * 1000)]
+        )
+        _, remaining, retry_after = sliding_window(
+            int(previous), int(current), elapsed, window_size, max_requests
+        )
+        return RateLimitResult(bool(allowed), remaining, retry_after)
+
+
+class RateLimiter:
+    def __init__(self, backend=None, window_size: float = 60):
+        self.backend = backend or InMemoryRateLimitBackend()
+        self.window_size = window_size  # 60 seconds
+        self.rejections = 0
+
+    async def hit(self, key: str, max_requests: int) -> RateLimitResult:
+        """Count one request for the key and report whether it is allowed."""
+        try:
+            result = await self.backend.hit(key, max_requests, self.window_size)
+        except Exception:
+            if not settings.RATE_LIMIT_FAIL_OPEN:
+                raise
+            # A backend outage should not take the service down with it
+            RATE_LIMIT_BACKEND_ERRORS.inc()
+            logger.warning("Rate limiter backend error, allowing request", exc_info=True)
+            return RateLimitResult(True, max_requests, 0.0)
+        if not result.allowed:
+            self.rejections += 1
+            # Keys are "{scope}:{client}"; the client would explode cardinality
+            RATE_LIMIT_REJECTIONS.labels(key.split(":", 1)[0]).inc()
+        return result
+
+    async def check_rate_limit(self, key: str, max_requests: int) -> bool:
+        return (await self.hit(key, max_requests)).allowed
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter using the backend selected by RATE_LIMIT_BACKEND."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            backend = RedisRateLimitBackend(settings.REDIS_URL)
+        elif settings.RATE_LIMIT_BACKEND == "memory":
+            backend = InMemoryRateLimitBackend()
+        else:
+            raise ValueError(f"Unknown rate limit backend: {settings.RATE_LIMIT_BACKEND}")
+        _rate_limiter = RateLimiter(backend)
+    return _rate_limiter
+
+
+def rate_limit(scope: str, max_requests: int):
+    """FastAPI dependency limiting requests per client address."""
+    async def dependency(request: Request):
+        client = request.client.host if request.client else "unknown"
+        result = await get_rate_limiter().hit(f"{scope}:{client}", max_requests)
+        if not result.allowed:
+            raise HTTPException(
+                429,
+                "Rate limit exceeded. Please wait before sending more requests.",
+                headers={"Retry-After": str(math.ceil(result.retry_after))}
+            )
+    return dependency
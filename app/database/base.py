@@ -1,17 +1,72 @@
+from functools import lru_cache
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import get_settings
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def engine_options(url: str) -> dict:
+    """Pool settings shared by the sync and async engines."""
+    options = {"echo": settings.DB_ECHO}
+    if url.startswith("sqlite"):
+        return options
+    return {
+        **options,
+        "pool_pre_ping": True,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
 
-Base = declarative_base()
\ No newline at end of file
+
+# Engines import their DB driver when created, so each is built on first use
+
+@lru_cache()
+def get_engine():
+    """Sync engine for scripts and migrations; the application uses the async one."""
+    return create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+
+
+@lru_cache()
+def get_session_local() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+@lru_cache()
+def get_async_engine():
+    return create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        **engine_options(settings.ASYNC_DATABASE_URL)
+    )
+
+
+@lru_cache()
+def get_async_session_local() -> async_sessionmaker:
+    # Loaded objects stay usable after commit without lazy loads on the event loop
+    return async_sessionmaker(
+        get_async_engine(),
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "SessionLocal": get_session_local,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": get_async_session_local,
+}
+
+
+def __getattr__(name: str):
+    # Keeps ``from app.database.base import AsyncSessionLocal`` and friends working
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+Base = declarative_base()
@@ -1,12 +1,11 @@
-from typing import Generator
-from sqlalchemy.orm import Session
-from app.database.base import SessionLocal
+from typing import AsyncGenerator
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.database.base import get_async_session_local
 
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_session_local()() as db:
         yield db
-    finally:
-        db.close()
 
-        
\ No newline at end of file
+def get_session_factory() -> async_sessionmaker:
+    """Session factory for long-lived handlers that open a session per task."""
+    return get_async_session_local()
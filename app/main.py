@@ -1,14 +1,37 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api.endpoints import documents
+from app.api.endpoints import health
+from app.api.endpoints import metrics as metrics_endpoints
+from app.api.endpoints import qa as qa_endpoints
 from app.api.websockets import qa
 from app.core.config import get_settings
+from app.core.executors import Overloaded
+from app.core.metrics import MetricsMiddleware
+from app.services import providers
+from app.services.ingestion import ingestion_pipeline
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Workers resolve their services per job, so starting them is cheap
+    await ingestion_pipeline.start()
+    if settings.STARTUP_WARMUP:
+        providers.readiness.start()
+    yield
+    await providers.readiness.stop()
+    await ingestion_pipeline.stop()
+    providers.shutdown()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
+    lifespan=lifespan
 )
 
 #CORS Config
@@ -20,6 +43,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request timing, and Server-Timing spans for requests with the trace header
+app.add_middleware(MetricsMiddleware)
+
+# Full executor or ingestion queues
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    # Saturation is the server's state, not the client's rate: 503, not 429
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Include routers
 app.include_router(
     documents.router,
@@ -27,6 +63,16 @@ app.include_router(
     tags=["documents"]
 )
 
+app.include_router(
+    qa_endpoints.router,
+    prefix=settings.API_V1_STR + "/qa",
+    tags=["qa"]
+)
+
 # Add WebSocket endpoint
 app.include_router(qa.router)
 
+app.include_router(health.router, tags=["health"])
+
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_endpoints.router, tags=["metrics"])
@@ -1,9 +1,33 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, DateTime, Text
 from datetime import datetime
 from app.database.base import Base
 
+# "processed" is the final status of documents ingested before the pipeline
+READY_STATUSES = ("ready", "processed")
+
+# Columns returned by document listings; PostgreSQL indexes carry them as
+# INCLUDE columns so listing pages are index-only scans
+SUMMARY_COLUMNS = ("id", "filename", "status", "uploaded_at", "file_size", "version")
+_SUMMARY_INCLUDE = ["filename", "status", "file_size", "version"]
+
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Keyset pagination, newest first
+        Index(
+            "ix_documents_uploaded_at_id", "uploaded_at", "id",
+            postgresql_include=_SUMMARY_INCLUDE
+        ),
+        Index(
+            "ix_documents_status_uploaded_at_id", "status", "uploaded_at", "id",
+            postgresql_include=[name for name in _SUMMARY_INCLUDE if name != "status"]
+        ),
+        # LIKE 'prefix%' only uses a btree index with pattern ops outside the C locale
+        Index(
+            "ix_documents_filename_pattern", "filename",
+            postgresql_ops={"filename": "text_pattern_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
@@ -11,9 +35,23 @@ class Document(Base):
     extracted_text_path = Column(String)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     file_size = Column(Integer)
-    status = Column(String, default="pending")  # pending, processed, failed
+    status = Column(String, default="pending")  # pending, extracting, chunking, embedding, ready, failed
     content_hash = Column(String, unique=True, index=True)
     mime_type = Column(String)
-    metadata = Column(Text, nullable=True)  # JSON field for additional metadata
+    # "metadata" is reserved on declarative models, so map it under another attribute
+    doc_metadata = Column("metadata", Text, nullable=True)  # JSON field for additional metadata
+    # JSON list of per-page content fingerprints, compared against the next version
+    page_hashes = Column(Text, nullable=True)
 
-    
\ No newline at end of file
+    # Version lineage: each upload of a revision points at the version it replaces
+    version = Column(Integer, default=1)
+    parent_id = Column(
+        Integer,
+        ForeignKey("documents.id", ondelete="SET NULL"),
+        unique=True,  # a version is replaced at most once
+        index=True,
+        nullable=True
+    )
+    lineage_id = Column(Integer, index=True, nullable=True)  # id of the first version
+    # JSON of the pages and chunks carried over from the parent at ingestion
+    reuse_stats = Column(Text, nullable=True)
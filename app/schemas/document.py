@@ -1,6 +1,7 @@
-from pydantic import BaseModel, validator
+from pydantic import AliasChoices, BaseModel, Field, validator
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import json
 
 class DocumentBase(BaseModel):
     filename: str
@@ -12,16 +13,93 @@ class DocumentUpdate(DocumentBase):
     status: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
 
+class IngestionReuse(BaseModel):
+    """Work carried over from the previous version of a document."""
+    pages: int = 0
+    pages_reused: int = 0  # pages whose text was not extracted again
+    chunks: int = 0
+    chunks_reused: int = 0  # chunks whose vectors were not computed again
+    reused_fraction: float = Field(0.0, ge=0.0, le=1.0)
+
 class DocumentInDB(DocumentBase):
     id: int
     file_path: str
-    extracted_text_path: str
+    extracted_text_path: Optional[str] = None
     uploaded_at: datetime
     file_size: int
     status: str
     content_hash: str
     mime_type: str
-    metadata: Optional[Dict[str, Any]] = None
+    metadata: Optional[Dict[str, Any]] = Field(
+        None, validation_alias=AliasChoices("doc_metadata", "metadata")
+    )
+    version: int = 1
+    parent_id: Optional[int] = None
+    lineage_id: Optional[int] = None
+    reuse: Optional[IngestionReuse] = Field(
+        None, validation_alias=AliasChoices("reuse_stats", "reuse")
+    )
+
+    @validator("metadata", "reuse", pre=True)
+    def parse_json(cls, value):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    @validator("version", pre=True)
+    def default_version(cls, value):
+        # Rows created before versioning have no version
+        return 1 if value is None else value
+
+    class Config:
+        from_attributes = True
+
+class DocumentSummary(BaseModel):
+    """Document listing row; never carries metadata or storage paths."""
+    id: int
+    filename: str
+    status: str
+    uploaded_at: datetime
+    file_size: Optional[int] = None
+    version: int = 1
+
+    @validator("version", pre=True)
+    def default_version(cls, value):
+        return 1 if value is None else value
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class DocumentPage(BaseModel):
+    items: List[DocumentSummary]
+    # Pass as ``cursor`` to get the next page; None on the last page
+    next_cursor: Optional[str] = None
+    # Only when requested with include_total, and only where the database can estimate
+    total_estimate: Optional[int] = None
+
+class BulkUploadItem(BaseModel):
+    """Outcome of one file of a bulk upload."""
+    filename: str
+    status: str  # queued, duplicate, rejected
+    # The new document, or for a duplicate the document already holding the content
+    document_id: Optional[int] = None
+    content_hash: Optional[str] = None
+    detail: Optional[str] = None
+
+class BulkUploadResult(BaseModel):
+    items: List[BulkUploadItem] = []
+    queued: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    # Why the upload stopped early, e.g. a corrupt archive; the items before it stand
+    error: Optional[str] = None
+
+class IngestionStatus(BaseModel):
+    document_id: int
+    status: str
+    stage: Optional[str] = None
+    progress: float = Field(0.0, ge=0.0, le=1.0)
+    attempts: Dict[str, int] = {}
+    error: Optional[str] = None
+    reuse: Optional[IngestionReuse] = None
+    updated_at: Optional[datetime] = None
@@ -1,21 +1,66 @@
 # app/schemas/message.py
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Dict, Any, List
+from app.core.config import get_settings
+
+settings = get_settings()
+
+class RetrievalOptions(BaseModel):
+    """Per-question overrides of the RETRIEVAL_* settings."""
+    k: Optional[int] = Field(None, ge=1, le=50)
+    vector_weight: Optional[float] = Field(None, ge=0.0)
+    lexical_weight: Optional[float] = Field(None, ge=0.0)
+
+    @model_validator(mode="after")
+    def check_weights(self):
+        if self.vector_weight == 0 and self.lexical_weight == 0:
+            raise ValueError("vector_weight and lexical_weight cannot both be 0")
+        return self
 
 class QuestionMessage(BaseModel):
-    document_id: int
+    document_id: Optional[int] = None
+    document_ids: Optional[List[int]] = None  # ask across several documents at once
     question: str
     conversation_id: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
+    stream: bool = False  # send answer_delta frames before the final answer
+    request_id: Optional[str] = None  # echoed on every frame of the answer
+    retrieval: Optional[RetrievalOptions] = None
+    trace: bool = False  # return per-stage timings in the answer metadata
+
+    @model_validator(mode="after")
+    def check_documents(self):
+        if self.document_id is None and not self.document_ids:
+            raise ValueError("document_id or document_ids is required")
+        return self
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[str] = Field(
+        ..., min_length=1, max_length=settings.QA_BATCH_MAX_QUESTIONS
+    )
+    retrieval: Optional[RetrievalOptions] = None
+
+class CancelMessage(BaseModel):
+    type: str = "cancel"
+    request_id: str
 
 class AnswerMessage(BaseModel):
+    type: str = "answer"
     answer: str
     confidence: float = Field(..., ge=0.0, le=1.0)
     context: Optional[str] = None
     conversation_id: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
+    request_id: Optional[str] = None
+
+class AnswerDeltaMessage(BaseModel):
+    type: str = "answer_delta"
+    delta: str
+    conversation_id: Optional[str] = None
+    request_id: Optional[str] = None
 
 class ErrorMessage(BaseModel):
     error: str
     detail: Optional[str] = None
-    code: Optional[str] = None
\ No newline at end of file
+    code: Optional[str] = None
+    request_id: Optional[str] = None
@@ -0,0 +1,216 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.core.config import get_settings
+from app.core.metrics import CACHE_ENTRIES
+from app.schemas.message import AnswerMessage
+from app.utils.cache import LRUCache
+import hashlib
+import re
+import threading
+
+settings = get_settings()
+
+CONTRACTIONS = {
+    "what's": "what is",
+    "who's": "who is",
+    "where's": "where is",
+    "when's": "when is",
+    "how's": "how is",
+    "it's": "it is",
+    "that's": "that is",
+    "there's": "there is",
+    "won't": "will not",
+    "can't": "cannot",
+    "n't": " not",
+    "'re": " are",
+    "'ll": " will",
+    "'ve": " have",
+    "'d": " would",
+}
+CONTRACTION_PATTERN = re.compile(
+    "|".join(re.escape(c) for c in sorted(CONTRACTIONS, key=len, reverse=True))
+)
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, expand contractions and strip punctuation and extra spaces."""
+    text = question.lower().replace("’", "'")
+    text = CONTRACTION_PATTERN.sub(lambda m: CONTRACTIONS[m.group(0)], text)
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def context_key(context: list) -> str:
+    """Stable key for the conversation history that shapes an answer."""
+    if not context:
+        return ""
+    return hashlib.sha256(repr(context).encode("utf-8")).hexdigest()
+
+
+def unit_vector(embedding: Optional[List[float]]):
+    """The embedding scaled to length 1 as float32, or None if empty or zero."""
+    if not embedding:
+        return None
+    # numpy stays out of app startup, like the other heavy dependencies
+    import numpy as np
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+class CachedAnswer:
+    def __init__(
+        self,
+        answer: AnswerMessage,
+        embedding: Optional[List[float]],
+        latency: float
+    ):
+        self.answer = answer
+        self.vector = unit_vector(embedding)
+        self.latency = latency
+
+
+class AnswerCache:
+    """Answer cache scoped by document and conversation context.
+
+    Lookups match the normalized question exactly first, then fall back to
+    the most similar cached question embedding above SIMILARITY_THRESHOLD.
+    """
+
+    def __init__(
+        self,
+        max_scopes: int = settings.ANSWER_CACHE_MAX_SCOPES,
+        max_per_scope: int = settings.ANSWER_CACHE_MAX_PER_SCOPE,
+        ttl: float = settings.ANSWER_CACHE_TTL,
+        similarity_threshold: float = settings.ANSWER_CACHE_SIMILARITY_THRESHOLD
+    ):
+        self.max_per_scope = max_per_scope
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._scopes = LRUCache(max_entries=max_scopes)
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    async def lookup(
+        self,
+        document_id: int,
+        content_hash: Optional[str],
+        context: list,
+        question: str,
+        embed: Callable[[str], Awaitable[List[float]]]
+    ) -> Tuple[Optional[AnswerMessage], Optional[List[float]]]:
+        """Return a cached answer (or None) and the question embedding if one was computed."""
+        scope = self._scopes.peek((document_id, content_hash, context_key(context)))
+        normalized = normalize_question(question)
+
+        if scope is not None:
+            cached = scope.get(normalized)
+            if cached:
+                self._record_hit(cached, "exact")
+                return self._mark(cached, "exact", 1.0), None
+
+        if self.similarity_threshold >= 1.0 or scope is None or not len(scope):
+            self.misses += 1
+            return None, None
+
+        embedding = await embed(normalized)
+        best, best_similarity = self._most_similar(unit_vector(embedding), scope.values())
+        if best is None:
+            self.misses += 1
+            return None, embedding
+
+        self._record_hit(best, "semantic")
+        return self._mark(best, "semantic", best_similarity), embedding
+
+    async def store(
+        self,
+        document_id: int,
+        content_hash: Optional[str],
+        context: list,
+        question: str,
+        answer: AnswerMessage,
+        latency: float,
+        embed: Callable[[str], Awaitable[List[float]]],
+        embedding: Optional[List[float]] = None
+    ):
+        """Cache an answer produced by the LLM and how long it took."""
+        if embedding is None and self.similarity_threshold < 1.0:
+            embedding = await embed(normalize_question(question))
+
+        key = (document_id, content_hash, context_key(context))
+        with self._lock:
+            scope = self._scopes.peek(key)
+            if scope is None:
+                scope = LRUCache(max_entries=self.max_per_scope, ttl=self.ttl)
+            self._scopes.put(key, scope)
+        scope.put(
+            normalize_question(question),
+            CachedAnswer(answer.model_copy(), embedding, latency)
+        )
+
+    def invalidate(self, document_id: int) -> int:
+        """Remove all cached answers for a document."""
+        return self._scopes.discard_where(lambda key: key[0] == document_id)
+
+    def clear(self):
+        self._scopes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "scopes": len(self._scopes),
+            "entries": sum(len(scope) for scope in self._scopes.values()),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "latency_saved_seconds": self.latency_saved
+        }
+
+    def _most_similar(
+        self,
+        query,
+        candidates: List[CachedAnswer]
+    ) -> Tuple[Optional[CachedAnswer], float]:
+        """The candidate closest to the unit query vector, if above the threshold.
+
+        One matrix product over the scope's cached embeddings, so a full scope
+        costs well under a millisecond of event loop time.
+        """
+        candidates = [cached for cached in candidates if cached.vector is not None]
+        if query is None or not candidates:
+            return None, 0.0
+        import numpy as np
+        similarities = np.stack([cached.vector for cached in candidates]) @ query
+        best = int(similarities.argmax())
+        if similarities[best] < self.similarity_threshold:
+            return None, 0.0
+        return candidates[best], float(similarities[best])
+
+    def _record_hit(self, cached: CachedAnswer, kind: str):
+        if kind == "exact":
+            self.exact_hits += 1
+        else:
+            self.semantic_hits += 1
+        self.latency_saved += cached.latency
+
+    def _mark(self, cached: CachedAnswer, kind: str, similarity: float) -> AnswerMessage:
+        answer = cached.answer.model_copy()
+        answer.metadata = {
+            **(answer.metadata or {}),
+            "cache": {
+                "hit": kind,
+                "similarity": round(similarity, 4),
+                "saved_ms": round(cached.latency * 1000, 1)
+            }
+        }
+        return answer
+
+
+answer_cache = AnswerCache()
+CACHE_ENTRIES.labels("answer_cache").set_function(
+    lambda: sum(len(scope) for scope in answer_cache._scopes.values())
+)
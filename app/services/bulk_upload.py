@@ -0,0 +1,194 @@
+# app/services/bulk_upload.py
+"""Bulk uploads: many PDFs in one request, as a multipart batch or a ZIP stream.
+
+Files are streamed to temporary paths as they arrive; a ZIP archive is
+unpacked entry by entry and never written to disk whole. Every
+BULK_UPLOAD_BATCH_SIZE files, the batch is deduplicated by content hash
+with one query, inserted with one statement and queued for ingestion with
+one write, so the ingestion workers start on the first batch while the
+rest of the request is still arriving.
+
+Each batch is admitted against INGESTION_MAX_PENDING like single uploads.
+When the ingestion queue is full, the batch is refused and the rest of the
+request is not read; ``retry_after`` is then set.
+"""
+from typing import AsyncIterator, Awaitable, Iterable, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.executors import Overloaded
+from app.schemas.document import BulkUploadItem, BulkUploadResult
+from app.services.ingestion import ingestion_pipeline
+from app.services.storage import StagedUpload, StorageService
+from app.utils.zipstream import UnsupportedEntry, ZipStreamError, read_zip
+import os
+
+settings = get_settings()
+
+
+def _is_pdf(filename: str) -> bool:
+    return filename.lower().endswith(".pdf")
+
+
+def _is_archive_metadata(name: str) -> bool:
+    # Resource forks and folder attributes added by macOS archivers
+    return name.startswith("__MACOSX/") or os.path.basename(name).startswith("._")
+
+
+class BulkUpload:
+    """One bulk upload request; ``manifest()`` reports each file in request order."""
+
+    def __init__(self, db: AsyncSession, storage_service: StorageService):
+        self.db = db
+        self.storage_service = storage_service
+        self.error: Optional[str] = None
+        # Seconds to wait before retrying, once the ingestion queue refused a batch
+        self.retry_after: Optional[int] = None
+        # One item per file read; staged files get theirs when their batch is stored
+        self._items: List[Optional[BulkUploadItem]] = []
+        self._staged: List[Tuple[int, StagedUpload]] = []
+
+    async def add_files(self, files: Iterable[UploadFile]):
+        """Store the files of a multipart request."""
+        try:
+            for file in files:
+                if self._at_limit():
+                    break
+                if not self._admit(file.filename or ""):
+                    continue
+                await self._stage(
+                    file.filename,
+                    self.storage_service.pdf_service.save_uploaded_file(file)
+                )
+        except Overloaded:
+            # _flush recorded the refusal; the rest of the request is not read
+            return
+        except BaseException:
+            self._discard_staged()
+            raise
+        await self._flush_last()
+
+    async def add_zip(self, chunks: AsyncIterator[bytes]):
+        """Store the PDFs of a ZIP archive arriving as ``chunks``.
+
+        A corrupt or truncated archive ends the upload: the files before
+        the damage are stored, and the manifest's error says what went wrong.
+        """
+        try:
+            async for entry in read_zip(chunks):
+                if entry.is_dir or _is_archive_metadata(entry.name):
+                    continue
+                if self._at_limit():
+                    break
+                if not self._admit(entry.name):
+                    continue
+                try:
+                    await self._stage(
+                        entry.name,
+                        self.storage_service.pdf_service.save_stream(entry.chunks())
+                    )
+                except UnsupportedEntry as e:
+                    self._reject(entry.name, str(e))
+        except ZipStreamError as e:
+            self.error = f"Invalid ZIP archive: {e}"
+        except Overloaded:
+            # _flush recorded the refusal; the rest of the request is not read
+            return
+        except BaseException:
+            self._discard_staged()
+            raise
+        await self._flush_last()
+
+    def manifest(self) -> BulkUploadResult:
+        items = [item for item in self._items if item is not None]
+        counts = {status: 0 for status in ("queued", "duplicate", "rejected")}
+        for item in items:
+            counts[item.status] += 1
+        return BulkUploadResult(
+            items=items,
+            queued=counts["queued"],
+            duplicates=counts["duplicate"],
+            rejected=counts["rejected"],
+            error=self.error
+        )
+
+    def _at_limit(self) -> bool:
+        if len(self._items) < settings.BULK_UPLOAD_MAX_FILES:
+            return False
+        self.error = (
+            f"At most {settings.BULK_UPLOAD_MAX_FILES} files per upload; "
+            f"the rest were not read"
+        )
+        return True
+
+    def _admit(self, filename: str) -> bool:
+        """Whether to read the file, recording the rejection if not."""
+        if not _is_pdf(filename):
+            self._reject(filename, "Only PDF files are allowed")
+            return False
+        return True
+
+    async def _stage(self, filename: str, saving: Awaitable[Tuple[str, int, str]]):
+        """Await the streaming of one file and store the batch once it is full."""
+        try:
+            temp_path, file_size, content_hash = await saving
+        except HTTPException as e:
+            # Too large: the rest of the request is still worth reading
+            self._reject(filename, e.detail)
+            return
+        self._staged.append(
+            (len(self._items), StagedUpload(filename, temp_path, file_size, content_hash))
+        )
+        self._items.append(None)
+        # A batch larger than the ingestion backlog could never be admitted
+        batch_size = min(settings.BULK_UPLOAD_BATCH_SIZE, settings.INGESTION_MAX_PENDING)
+        if len(self._staged) >= batch_size:
+            await self._flush()
+
+    async def _flush(self):
+        """Store and queue the staged batch; raises Overloaded if it is refused."""
+        if not self._staged:
+            return
+        staged, self._staged = self._staged, []
+        uploads = [upload for _, upload in staged]
+        try:
+            with ingestion_pipeline.admission(len(uploads)):
+                items = await self.storage_service.store_documents(self.db, uploads)
+                await ingestion_pipeline.enqueue_many(
+                    [item.document_id for item in items if item.status == "queued"]
+                )
+        except Overloaded as e:
+            for position, upload in staged:
+                self.storage_service.pdf_service.discard_upload(upload.temp_path)
+                self._items[position] = BulkUploadItem(
+                    filename=upload.filename,
+                    status="rejected",
+                    detail="The ingestion queue is full"
+                )
+            self.error = (
+                "The ingestion queue is full: the rejected files and any after "
+                "them were not stored, retry them later"
+            )
+            self.retry_after = e.retry_after
+            raise
+        except BaseException:
+            for upload in uploads:
+                self.storage_service.pdf_service.discard_upload(upload.temp_path)
+            raise
+        for (position, _), item in zip(staged, items):
+            self._items[position] = item
+
+    async def _flush_last(self):
+        try:
+            await self._flush()
+        except Overloaded:
+            # Recorded in the manifest
+            pass
+
+    def _reject(self, filename: str, detail: str):
+        self._items.append(BulkUploadItem(filename=filename, status="rejected", detail=detail))
+
+    def _discard_staged(self):
+        for _, upload in self._staged:
+            self.storage_service.pdf_service.discard_upload(upload.temp_path)
+        self._staged = []
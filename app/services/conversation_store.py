@@ -0,0 +1,331 @@
+# app/services/conversation_store.py
+"""Bounded conversation history.
+
+Each conversation is a short summary of older turns plus the most recent
+(question, answer) turns, serialized as JSON. Stores cap the number of
+conversations, the bytes per conversation and their idle lifetime.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.core.config import get_settings
+from app.core.metrics import CACHE_BYTES, CACHE_ENTRIES
+from app.utils.cache import LRUCache
+import json
+import re
+import time
+
+settings = get_settings()
+
+Turn = Tuple[str, str]
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+
+class Conversation:
+    def __init__(self, summary: str = "", turns: Optional[List[Turn]] = None):
+        self.summary = summary
+        self.turns: List[Turn] = turns or []
+
+    def context(self, turns: int = settings.CONVERSATION_CONTEXT_TURNS) -> list:
+        """Recent turns for the prompt, preceded by the summary as (None, summary)."""
+        context: list = [(None, self.summary)] if self.summary else []
+        # turns[-0:] would be every turn
+        return context + (self.turns[-turns:] if turns > 0 else [])
+
+    def to_json(self) -> str:
+        return json.dumps({"summary": self.summary, "turns": self.turns})
+
+    @classmethod
+    def from_json(cls, payload: str) -> "Conversation":
+        data = json.loads(payload)
+        return cls(data["summary"], [tuple(turn) for turn in data["turns"]])
+
+
+async def extractive_summary(summary: str, turns: List[Turn]) -> str:
+    """Fold turns into the summary as "question -> first sentence of answer"."""
+    lines = [summary] if summary else []
+    for question, answer in turns:
+        first_sentence = re.split(r"(?<=[.!?])\s", answer.strip(), maxsplit=1)[0]
+        lines.append(f"{question} -> {first_sentence}")
+    # Keep the most recent part when the summary outgrows its budget
+    return "\n".join(lines)[-settings.CONVERSATION_SUMMARY_MAX_CHARS:]
+
+
+class ConversationStore:
+    """Shared limits and compaction; backends implement load/save/delete."""
+
+    def __init__(
+        self,
+        max_turns: int = settings.CONVERSATION_MAX_TURNS,
+        max_bytes: int = settings.CONVERSATION_MAX_BYTES,
+        summarize_after: int = settings.CONVERSATION_SUMMARIZE_AFTER,
+        ttl: float = settings.CONVERSATION_TTL
+    ):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self.summarize_after = summarize_after
+        self.ttl = ttl
+        self.summaries = 0
+
+    async def get(self, conversation_id: str) -> Conversation:
+        payload = await self._load(conversation_id)
+        return Conversation.from_json(payload) if payload else Conversation()
+
+    async def append(
+        self,
+        conversation_id: str,
+        question: str,
+        answer: str,
+        summarize: Optional[Summarizer] = None
+    ) -> Conversation:
+        """Add a turn, compacting the history to stay within the limits."""
+        conversation = await self.get(conversation_id)
+        conversation.turns.append((question, answer))
+        payload = await self._compact(conversation, summarize or extractive_summary)
+        await self._save(conversation_id, payload)
+        return conversation
+
+    async def delete(self, conversation_id: str):
+        await self._delete(conversation_id)
+
+    async def _compact(self, conversation: Conversation, summarize: Summarizer) -> str:
+        keep = settings.CONVERSATION_CONTEXT_TURNS
+        if self.summarize_after and len(conversation.turns) > self.summarize_after:
+            # With no recent turns kept, every turn goes into the summary
+            older = conversation.turns[:-keep] if keep > 0 else conversation.turns
+            conversation.turns = conversation.turns[-keep:] if keep > 0 else []
+            conversation.summary = await summarize(conversation.summary, older)
+            self.summaries += 1
+        else:
+            conversation.turns = conversation.turns[-self.max_turns:]
+
+        payload = conversation.to_json()
+        while len(payload.encode("utf-8")) > self.max_bytes and len(conversation.turns) > 1:
+            dropped = conversation.turns.pop(0)
+            if self.summarize_after:
+                conversation.summary = await summarize(conversation.summary, [dropped])
+            payload = conversation.to_json()
+
+        if len(payload.encode("utf-8")) > self.max_bytes:
+            # A single oversized turn: keep a short summary and cut the turn to fit
+            conversation.summary = conversation.summary[-(self.max_bytes // 4):]
+            payload = self._truncate(conversation)
+        return payload
+
+    def _truncate(self, conversation: Conversation) -> str:
+        """Cut the answer, then the question, then the summary until max_bytes fits.
+
+        Each pass removes at least the overflow: every character takes one
+        byte or more in the payload.
+        """
+        payload = conversation.to_json()
+        while True:
+            overflow = len(payload.encode("utf-8")) - self.max_bytes
+            if overflow <= 0:
+                return payload
+            if conversation.turns:
+                question, answer = conversation.turns[-1]
+                if answer:
+                    answer = answer[:max(len(answer) - overflow, 0)]
+                elif question:
+                    question = question[:max(len(question) - overflow, 0)]
+                else:
+                    conversation.turns.pop()
+                    payload = conversation.to_json()
+                    continue
+                conversation.turns[-1] = (question, answer)
+            elif conversation.summary:
+                summary = conversation.summary
+                conversation.summary = summary[min(overflow, len(summary)):]
+            else:
+                # Not even an empty conversation fits
+                return payload
+            payload = conversation.to_json()
+
+    async def _load(self, conversation_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def _save(self, conversation_id: str, payload: str):
+        raise NotImplementedError
+
+    async def _delete(self, conversation_id: str):
+        raise NotImplementedError
+
+    async def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class MemoryConversationStore(ConversationStore):
+    """Per-process LRU of conversations, bounded by count, total bytes and TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = settings.CONVERSATION_MAX_ENTRIES,
+        max_total_bytes: int = settings.CONVERSATION_MAX_TOTAL_BYTES,
+        **limits
+    ):
+        super().__init__(**limits)
+        self._conversations = LRUCache(
+            max_entries=max_entries,
+            max_weight=max_total_bytes,
+            ttl=self.ttl
+        )
+
+    async def _load(self, conversation_id: str) -> Optional[str]:
+        return self._conversations.get(conversation_id)
+
+    async def _save(self, conversation_id: str, payload: str):
+        self._conversations.put(
+            conversation_id, payload, weight=len(payload.encode("utf-8"))
+        )
+
+    async def _delete(self, conversation_id: str):
+        self._conversations.pop(conversation_id)
+
+    async def stats(self) -> Dict[str, Any]:
+        stats = self._conversations.stats()
+        return {
+            "backend": "memory",
+            "conversations": stats["entries"],
+            "bytes": stats["weight"],
+            "evictions": stats["evictions"],
+            "expirations": stats["expirations"],
+            "summaries": self.summaries
+        }
+
+
+# Both scripts take KEYS[1] conversation key, KEYS[2] recency zset,
+# KEYS[3] sizes hash, KEYS[4] bytes counter
+FORGET_FUNCTION = """
+local function forget(id, key_prefix)
+    local size = tonumber(redis.call('HGET', KEYS[3], id) or '0')
+    redis.call('DECRBY', KEYS[4], size)
+    redis.call('HDEL', KEYS[3], id)
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('DEL', key_prefix .. id)
+end
+"""
+
+# ARGV: id, payload, ttl, now, max_entries, key prefix
+SAVE_SCRIPT = FORGET_FUNCTION + """
+local size = string.len(ARGV[2])
+local old = tonumber(redis.call('HGET', KEYS[3], ARGV[1]) or '0')
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('HSET', KEYS[3], ARGV[1], size)
+redis.call('INCRBY', KEYS[4], size - old)
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[1])
+
+-- Conversations whose key already expired
+local now = tonumber(ARGV[4])
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[3]))) do
+    forget(id, ARGV[6])
+end
+
+-- Least recently used conversations beyond the limit
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[5])
+if excess > 0 then
+    for _, id in ipairs(redis.call('ZRANGE', KEYS[2], 0, excess - 1)) do
+        forget(id, ARGV[6])
+    end
+    return excess
+end
+return 0
+"""
+
+# ARGV: id, key prefix; the size is read and subtracted atomically with the delete
+DELETE_SCRIPT = FORGET_FUNCTION + """
+forget(ARGV[1], ARGV[2])
+return 0
+"""
+
+
+class RedisConversationStore(ConversationStore):
+    """Conversations in Redis, shared by every worker process.
+
+    A sorted set orders conversations by last use so the oldest are evicted
+    beyond max_entries, and a counter tracks the bytes stored.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_entries: int = settings.CONVERSATION_MAX_ENTRIES,
+        prefix: str = "conversation",
+        **limits
+    ):
+        import redis.asyncio as redis
+
+        super().__init__(**limits)
+        self.redis = redis.from_url(url)
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.evictions = 0
+        self._save_script = self.redis.register_script(SAVE_SCRIPT)
+        self._delete_script = self.redis.register_script(DELETE_SCRIPT)
+
+    async def _load(self, conversation_id: str) -> Optional[str]:
+        payload = await self.redis.get(self._key(conversation_id))
+        return payload.decode("utf-8") if payload else None
+
+    async def _save(self, conversation_id: str, payload: str):
+        evicted = await self._save_script(
+            keys=self._script_keys(conversation_id),
+            args=[
+                conversation_id,
+                payload,
+                int(self.ttl),
+                time.time(),
+                self.max_entries,
+                f"{self.prefix}:id:",
+            ]
+        )
+        self.evictions += int(evicted)
+
+    async def _delete(self, conversation_id: str):
+        await self._delete_script(
+            keys=self._script_keys(conversation_id),
+            args=[conversation_id, f"{self.prefix}:id:"]
+        )
+
+    async def stats(self) -> Dict[str, Any]:
+        conversations = await self.redis.zcard(f"{self.prefix}:recency")
+        stored = await self.redis.get(f"{self.prefix}:bytes")
+        return {
+            "backend": "redis",
+            "conversations": conversations,
+            "bytes": int(stored or 0),
+            "evictions": self.evictions,
+            "summaries": self.summaries
+        }
+
+    def _key(self, conversation_id: str) -> str:
+        return f"{self.prefix}:id:{conversation_id}"
+
+    def _script_keys(self, conversation_id: str) -> List[str]:
+        return [
+            self._key(conversation_id),
+            f"{self.prefix}:recency",
+            f"{self.prefix}:sizes",
+            f"{self.prefix}:bytes",
+        ]
+
+
+_conversation_store: Optional[ConversationStore] = None
+
+
+def get_conversation_store() -> ConversationStore:
+    """Process-wide store selected by CONVERSATION_STORE_BACKEND."""
+    global _conversation_store
+    if _conversation_store is None:
+        if settings.CONVERSATION_STORE_BACKEND == "memory":
+            _conversation_store = MemoryConversationStore()
+            conversations = _conversation_store._conversations
+            CACHE_ENTRIES.labels("conversations").set_function(lambda: len(conversations))
+            CACHE_BYTES.labels("conversations").set_function(
+                lambda: conversations.total_weight
+            )
+        elif settings.CONVERSATION_STORE_BACKEND == "redis":
+            _conversation_store = RedisConversationStore(settings.REDIS_URL)
+        else:
+            raise ValueError(
+                f"Unknown conversation store backend: {settings.CONVERSATION_STORE_BACKEND}"
+            )
+    return _conversation_store
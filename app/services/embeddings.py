@@ -0,0 +1,260 @@
+# app/services/embeddings.py
+from typing import Any, Dict, List, Optional, Sequence
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from langchain.schema.embeddings import Embeddings
+from app.core.config import get_settings
+import asyncio
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+settings = get_settings()
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_BATCH = 500
+
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by a hash of the model and the text."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path,
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self.api_seconds = 0.0
+        self.api_texts = 0
+        self.chars_saved = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_BATCH):
+                batch = keys[start:start + SQLITE_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [
+                    (key, array("f", vector).tobytes())
+                    for key, vector in items.items()
+                ]
+            )
+            self._conn.execute("COMMIT")
+
+    def record_lookup(self, hits: int, misses: int, chars_saved: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.chars_saved += chars_saved
+
+    def record_api_call(self, texts: int, seconds: float):
+        with self._lock:
+            self.api_calls += 1
+            self.api_texts += texts
+            self.api_seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        seconds_per_text = self.api_seconds / self.api_texts if self.api_texts else 0.0
+        tokens_saved = self.chars_saved / 4  # rough chars-per-token estimate
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "api_calls": self.api_calls,
+            "api_seconds": self.api_seconds,
+            "estimated_api_seconds_saved": self.hits * seconds_per_text,
+            "estimated_tokens_saved": int(tokens_saved),
+            "estimated_cost_saved": tokens_saved / 1000 * settings.EMBEDDING_COST_PER_1K_TOKENS
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that dedupes, batches and caches on disk.
+
+    Texts already in the cache are never sent to the underlying model;
+    the rest are deduplicated and embedded in batches of ``batch_size``,
+    with at most ``max_concurrency`` batches in flight.
+
+    Only document chunks are cached. Queries go straight to the model:
+    questions rarely repeat verbatim (the answer cache handles those that
+    do), and caching them would grow the unbounded on-disk table with every
+    question and add a SQLite write to each answer.
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        cache: "EmbeddingCache",
+        model_name: str,
+        batch_size: int = settings.EMBEDDING_BATCH_SIZE,
+        max_concurrency: int = settings.EMBEDDING_MAX_CONCURRENCY
+    ):
+        self.base = base
+        self.cache = cache
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = self._lookup(texts)
+        if missing:
+            batches = self._batches(list(missing))
+            for batch, vectors in zip(
+                batches,
+                self._executor.map(self._embed_batch, batches)
+            ):
+                self._store(batch, vectors, missing)
+        return [missing.get(text) or cached[text] for text in texts]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            limit = asyncio.Semaphore(self.max_concurrency)
+
+            async def embed(batch: List[str]):
+                async with limit:
+                    started = time.perf_counter()
+                    vectors = await self.base.aembed_documents(batch)
+                    self.cache.record_api_call(len(batch), time.perf_counter() - started)
+                    await asyncio.to_thread(self._store, batch, vectors, missing)
+
+            await asyncio.gather(*[
+                embed(batch) for batch in self._batches(list(missing))
+            ])
+        return [missing.get(text) or cached[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.base.aembed_query(text)
+
+    def _lookup(self, texts: List[str]):
+        """Return cached vectors by text and a dict of unique texts still to embed."""
+        unique = list(dict.fromkeys(texts))
+        keys = {text: EmbeddingCache.key(self.model_name, text) for text in unique}
+        found = self.cache.get_many(list(keys.values()))
+
+        cached: Dict[str, List[float]] = {}
+        missing: Dict[str, Optional[List[float]]] = {}
+        for text in unique:
+            if keys[text] in found:
+                cached[text] = found[keys[text]]
+            else:
+                missing[text] = None
+
+        # Duplicates within the batch count as hits as well
+        self.cache.record_lookup(
+            hits=len(texts) - len(missing),
+            misses=len(missing),
+            chars_saved=sum(map(len, texts)) - sum(map(len, missing))
+        )
+        return cached, missing
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        vectors = self.base.embed_documents(batch)
+        self.cache.record_api_call(len(batch), time.perf_counter() - started)
+        return vectors
+
+    def _store(self, batch: List[str], vectors: List[List[float]], missing: Dict[str, Any]):
+        # Round to float32 like stored vectors, so results do not depend on cache state
+        packed = [array("f", vector) for vector in vectors]
+        self.cache.put_many({
+            EmbeddingCache.key(self.model_name, text): vector
+            for text, vector in zip(batch, packed)
+        })
+        missing.update(zip(batch, (vector.tolist() for vector in packed)))
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [
+            texts[start:start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic local embedder using signed feature hashing of words.
+
+    Needs no network or model files, so tests and benchmarks can run
+    without an OpenAI key. Texts sharing words get similar vectors.
+    """
+
+    def __init__(self, dimensions: int = settings.EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimensions] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Open the shared on-disk embedding cache on first use."""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH)
+    return _embedding_cache
+
+
+def create_embeddings() -> Embeddings:
+    """Build the embedder selected by EMBEDDING_PROVIDER, cached if enabled."""
+    if settings.EMBEDDING_PROVIDER == "openai":
+        from langchain.embeddings import OpenAIEmbeddings
+        base = OpenAIEmbeddings(model=settings.EMBEDDING_MODEL)
+        model_name = settings.EMBEDDING_MODEL
+    elif settings.EMBEDDING_PROVIDER == "hash":
+        base = HashEmbeddings()
+        model_name = f"hash-{settings.EMBEDDING_DIMENSIONS}"
+    else:
+        raise ValueError(f"Unknown embedding provider: {settings.EMBEDDING_PROVIDER}")
+
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return base
+    return CachedEmbeddings(base, get_embedding_cache(), model_name)
@@ -0,0 +1,515 @@
+# app/services/ingestion.py
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from datetime import datetime
+from app.core.config import get_settings
+from app.core import metrics
+from app.core.executors import BULK, Overloaded, priority, run_cpu, run_io
+from app.database.base import get_async_session_local
+from app.models.document import READY_STATUSES, Document
+from app.schemas.document import IngestionStatus
+from app.services.providers import get_qa_service, get_storage_service
+from app.services.text_store import get_text_store, split_stored_text
+from app.utils.text_processing import Chunk
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+STAGES = ("extract", "chunk", "embed", "persist")
+
+# Document.status reported while each stage runs
+STAGE_STATUS = {
+    "extract": "extracting",
+    "chunk": "chunking",
+    "embed": "embedding",
+    "persist": "embedding",
+}
+
+
+class IngestionJob:
+    """Progress of one document through the ingestion stages."""
+
+    def __init__(
+        self,
+        document_id: int,
+        status: str = "pending",
+        stage: Optional[str] = None,
+        progress: float = 0.0,
+        attempts: Optional[Dict[str, int]] = None,
+        error: Optional[str] = None,
+        reuse: Optional[Dict[str, Any]] = None,
+        updated_at: Optional[datetime] = None
+    ):
+        self.document_id = document_id
+        self.status = status
+        self.stage = stage
+        self.progress = progress
+        self.attempts = attempts or {}
+        self.error = error
+        # Set for new versions of a document: work carried over from the parent
+        self.reuse = reuse
+        self.updated_at = updated_at or datetime.utcnow()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("ready", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "document_id": self.document_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "attempts": self.attempts,
+            "error": self.error,
+            "reuse": self.reuse,
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IngestionJob":
+        data = dict(data)
+        data["updated_at"] = datetime.fromisoformat(data["updated_at"])
+        return cls(**data)
+
+    def to_status(self) -> IngestionStatus:
+        return IngestionStatus(**self.to_dict())
+
+
+class InMemoryJobQueue:
+    """Job queue and job state held in this process."""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: Dict[int, IngestionJob] = {}
+
+    async def put(self, job: IngestionJob):
+        self._jobs[job.document_id] = job
+        await self._queue.put(job.document_id)
+
+    async def put_many(self, jobs: List[IngestionJob]):
+        for job in jobs:
+            await self.put(job)
+
+    async def get(self) -> IngestionJob:
+        document_id = await self._queue.get()
+        return self._jobs[document_id]
+
+    async def save(self, job: IngestionJob):
+        self._jobs[job.document_id] = job
+
+    async def get_job(self, document_id: int) -> Optional[IngestionJob]:
+        return self._jobs.get(document_id)
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self):
+        pass
+
+
+class SQLiteJobQueue:
+    """Durable job queue in a local SQLite file, shared by workers on one host."""
+
+    def __init__(self, path: str, poll_interval: float):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path,
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                document_id INTEGER PRIMARY KEY,
+                state TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                queued_at REAL NOT NULL
+            )
+            """
+        )
+        # Jobs interrupted by a restart are picked up again
+        self._conn.execute(
+            "UPDATE ingestion_jobs SET state = 'queued' WHERE state = 'running'"
+        )
+
+    async def put(self, job: IngestionJob):
+        await asyncio.to_thread(self._put, [job])
+
+    async def put_many(self, jobs: List[IngestionJob]):
+        await asyncio.to_thread(self._put, jobs)
+
+    async def get(self) -> IngestionJob:
+        while True:
+            job = await asyncio.to_thread(self._claim)
+            if job:
+                return job
+            await asyncio.sleep(self.poll_interval)
+
+    async def save(self, job: IngestionJob):
+        await asyncio.to_thread(self._save, job)
+
+    async def get_job(self, document_id: int) -> Optional[IngestionJob]:
+        return await asyncio.to_thread(self._get_job, document_id)
+
+    def qsize(self) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM ingestion_jobs WHERE state = 'queued'"
+            ).fetchone()
+        return row[0]
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _put(self, jobs: List[IngestionJob]):
+        with self._lock:
+            # The connection autocommits; one transaction covers the whole list
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    """
+                    INSERT INTO ingestion_jobs (document_id, state, payload, queued_at)
+                    VALUES (?, 'queued', ?, strftime('%s', 'now'))
+                    ON CONFLICT (document_id) DO UPDATE SET
+                        state = 'queued',
+                        payload = excluded.payload,
+                        queued_at = excluded.queued_at
+                    """,
+                    [(job.document_id, json.dumps(job.to_dict())) for job in jobs]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _claim(self) -> Optional[IngestionJob]:
+        with self._lock:
+            row = self._conn.execute(
+                """
+                UPDATE ingestion_jobs SET state = 'running'
+                WHERE document_id = (
+                    SELECT document_id FROM ingestion_jobs
+                    WHERE state = 'queued'
+                    ORDER BY queued_at, document_id
+                    LIMIT 1
+                )
+                RETURNING payload
+                """
+            ).fetchone()
+        return IngestionJob.from_dict(json.loads(row[0])) if row else None
+
+    def _save(self, job: IngestionJob):
+        state = "done" if job.finished else "running"
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET state = ?, payload = ? WHERE document_id = ?",
+                (state, json.dumps(job.to_dict()), job.document_id)
+            )
+
+    def _get_job(self, document_id: int) -> Optional[IngestionJob]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM ingestion_jobs WHERE document_id = ?",
+                (document_id,)
+            ).fetchone()
+        return IngestionJob.from_dict(json.loads(row[0])) if row else None
+
+
+def create_job_queue():
+    """Build the job queue selected by INGESTION_QUEUE_BACKEND."""
+    if settings.INGESTION_QUEUE_BACKEND == "sqlite":
+        return SQLiteJobQueue(
+            settings.INGESTION_QUEUE_PATH,
+            settings.INGESTION_POLL_INTERVAL
+        )
+    if settings.INGESTION_QUEUE_BACKEND == "memory":
+        return InMemoryJobQueue()
+    raise ValueError(
+        f"Unknown ingestion queue backend: {settings.INGESTION_QUEUE_BACKEND}"
+    )
+
+
+class IngestionPipeline:
+    """Worker pool running extraction, chunking, embedding and persistence."""
+
+    def __init__(self, queue=None):
+        self.queue = queue or create_job_queue()
+        self.stage_limits = {
+            stage: asyncio.Semaphore(
+                settings.INGESTION_STAGE_CONCURRENCY.get(stage, 1)
+            )
+            for stage in STAGES
+        }
+        self.stage_retries = {
+            stage: settings.INGESTION_STAGE_RETRIES.get(stage, 0)
+            for stage in STAGES
+        }
+        self._workers: List[asyncio.Task] = []
+        # Uploads admitted but not yet queued
+        self._admitting = 0
+
+    # Services are resolved on use, so starting the workers stays cheap
+
+    @property
+    def storage_service(self):
+        return get_storage_service()
+
+    @property
+    def pdf_service(self):
+        return get_storage_service().pdf_service
+
+    @property
+    def qa_service(self):
+        return get_qa_service()
+
+    async def start(self, workers: int = settings.INGESTION_WORKERS):
+        """Start the worker tasks."""
+        for _ in range(workers):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        """Cancel the worker tasks and close the queue."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        await self.queue.close()
+
+    def check_admission(self, count: int = 1):
+        """Raise Overloaded unless ``count`` more documents fit INGESTION_MAX_PENDING."""
+        pending = self.queue.qsize() + self._admitting
+        if pending + count > settings.INGESTION_MAX_PENDING:
+            metrics.ADMISSION_REJECTIONS.labels("ingestion").inc()
+            raise Overloaded("ingestion", settings.INGESTION_RETRY_AFTER)
+
+    @contextmanager
+    def admission(self, count: int = 1) -> Iterator[None]:
+        """Admit ``count`` uploads, unless that exceeds INGESTION_MAX_PENDING.
+
+        Uploads in progress count as pending until they are queued, so a
+        burst of concurrent uploads cannot all slip past the check.
+        """
+        self.check_admission(count)
+        self._admitting += count
+        try:
+            yield
+        finally:
+            self._admitting -= count
+
+    async def enqueue(self, document_id: int) -> IngestionJob:
+        """Queue a stored document for ingestion."""
+        job = IngestionJob(document_id)
+        await self.queue.put(job)
+        return job
+
+    async def enqueue_many(self, document_ids: List[int]) -> List[IngestionJob]:
+        """Queue stored documents for ingestion in one write."""
+        jobs = [IngestionJob(document_id) for document_id in document_ids]
+        await self.queue.put_many(jobs)
+        return jobs
+
+    async def get_status(self, document_id: int) -> Optional[IngestionJob]:
+        return await self.queue.get_job(document_id)
+
+    async def _worker(self):
+        # Ingestion queues behind interactive work for the executors
+        with priority(BULK):
+            while True:
+                job = await self.queue.get()
+                try:
+                    await self.process(job)
+                except Exception:
+                    # Failures are recorded on the job; keep the worker alive
+                    logger.exception("Ingestion of document %s failed", job.document_id)
+
+    async def process(self, job: IngestionJob):
+        """Run every stage for one document, updating its status as it goes."""
+        db = get_async_session_local()()
+        try:
+            document = await self.storage_service.get_document(db, job.document_id)
+            if not document:
+                raise ValueError("Document not found")
+
+            parent = await self._reuse_source(db, document)
+            if document.parent_id:
+                job.reuse = {"pages": 0, "pages_reused": 0, "chunks": 0, "chunks_reused": 0}
+
+            text_path, page_hashes = await self._run_stage(
+                db, job, "extract", lambda: self._extract(document, parent, job)
+            )
+            await self.storage_service.update_status(
+                db, document.id, document.status,
+                extracted_text_path=text_path,
+                page_hashes=json.dumps(page_hashes)
+            )
+
+            chunks = await self._run_stage(
+                db, job, "chunk", lambda: self._chunk(text_path)
+            )
+            vectors = await self._run_stage(
+                db, job, "embed", lambda: self._embed(chunks, parent, job)
+            )
+            await self._run_stage(
+                db, job, "persist",
+                lambda: run_io(
+                    self.qa_service.persist_vectorstore,
+                    document.id,
+                    chunks,
+                    vectors
+                )
+            )
+
+            job.status = "ready"
+            job.stage = None
+            job.progress = 1.0
+            await self.storage_service.update_status(
+                db, document.id, "ready",
+                reuse_stats=json.dumps(job.reuse) if job.reuse else None
+            )
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            await db.rollback()
+            await self.storage_service.update_status(db, job.document_id, "failed")
+            raise
+        finally:
+            job.updated_at = datetime.utcnow()
+            await self.queue.save(job)
+            await db.close()
+
+    async def _run_stage(
+        self,
+        db,
+        job: IngestionJob,
+        stage: str,
+        func: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Run one stage under its concurrency limit, retrying on failure."""
+        job.stage = stage
+        job.status = STAGE_STATUS[stage]
+        job.updated_at = datetime.utcnow()
+        await self.queue.save(job)
+        await self.storage_service.update_status(db, job.document_id, job.status)
+
+        retries = self.stage_retries[stage]
+        for attempt in range(retries + 1):
+            job.attempts[stage] = attempt + 1
+            try:
+                async with self.stage_limits[stage]:
+                    with metrics.stage("ingestion", stage):
+                        result = await func()
+                break
+            except Exception:
+                if attempt == retries:
+                    raise
+                await asyncio.sleep(settings.INGESTION_RETRY_BACKOFF * 2 ** attempt)
+
+        job.progress = (STAGES.index(stage) + 1) / len(STAGES)
+        return result
+
+    async def _reuse_source(self, db, document: Document) -> Optional[Document]:
+        """The parent version whose pages and vectors can be reused, if any."""
+        if not document.parent_id:
+            return None
+        parent = await self.storage_service.get_document(db, document.parent_id)
+        if not parent or parent.status not in READY_STATUSES:
+            return None
+        if not parent.extracted_text_path or not os.path.exists(parent.extracted_text_path):
+            return None
+        return parent
+
+    async def _extract(
+        self,
+        document: Document,
+        parent: Optional[Document],
+        job: IngestionJob
+    ) -> Tuple[str, List[str]]:
+        """Extract the text, reusing the parent's text for unchanged pages."""
+        page_hashes = await self.pdf_service.page_hashes(document.file_path)
+        known_pages: Dict[int, str] = {}
+        if parent is not None:
+            try:
+                known_pages = await run_io(self._unchanged_pages, parent, page_hashes)
+            except Exception:
+                logger.warning("Could not reuse pages of document %s", parent.id, exc_info=True)
+        text_path = await self.pdf_service.extract_text(
+            document.file_path, document.id, known_pages
+        )
+        if job.reuse is not None:
+            job.reuse.update(pages=len(page_hashes), pages_reused=len(known_pages))
+        return text_path, page_hashes
+
+    def _unchanged_pages(self, parent: Document, page_hashes: List[str]) -> Dict[int, str]:
+        """Text of the new pages whose fingerprint matches a page of the parent.
+
+        Matching by fingerprint rather than position keeps the reuse when
+        pages are inserted or removed.
+        """
+        if not parent.page_hashes:
+            return {}
+        parent_hashes = json.loads(parent.page_hashes)
+        parent_text = get_text_store().open(parent.extracted_text_path)
+        if parent_text.page_count != len(parent_hashes):
+            return {}
+
+        # Only the matched pages of the parent are read
+        page_by_hash: Dict[str, int] = {}
+        for number, page_hash in enumerate(parent_hashes, start=1):
+            page_by_hash.setdefault(page_hash, number)
+        return {
+            number: parent_text.page(page_by_hash[page_hash])
+            for number, page_hash in enumerate(page_hashes)
+            if page_hash in page_by_hash
+        }
+
+    async def _embed(
+        self,
+        chunks: List[Chunk],
+        parent: Optional[Document],
+        job: IngestionJob
+    ) -> List[List[float]]:
+        """Embed the chunks, reusing the parent's vectors for identical chunk text."""
+        reusable: Dict[str, List[float]] = {}
+        if parent is not None:
+            try:
+                reusable = await run_io(self.qa_service.vector_index.get_vectors, parent)
+            except Exception:
+                # Losing the reuse only costs time; embed everything instead
+                logger.warning(
+                    "Could not read vectors of document %s", parent.id, exc_info=True
+                )
+
+        texts = [chunk.text for chunk in chunks]
+        missing = list(dict.fromkeys(text for text in texts if text not in reusable))
+        computed: Dict[str, List[float]] = {}
+        if missing:
+            computed = dict(zip(missing, await self.qa_service.embed_texts(missing)))
+
+        if job.reuse is not None:
+            chunks_reused = sum(1 for text in texts if text in reusable)
+            job.reuse.update(
+                chunks=len(texts),
+                chunks_reused=chunks_reused,
+                reused_fraction=chunks_reused / len(texts) if texts else 0.0
+            )
+        return [reusable[text] if text in reusable else computed[text] for text in texts]
+
+    async def _chunk(self, text_path: str) -> List[Chunk]:
+        """Split the extracted text once and keep the chunks in a sidecar file."""
+        return await run_cpu(split_stored_text, text_path, self.qa_service.chunker)
+
+
+ingestion_pipeline = IngestionPipeline()
+metrics.QUEUE_DEPTH.labels("ingestion").set_function(ingestion_pipeline.queue.qsize)
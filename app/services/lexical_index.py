@@ -0,0 +1,326 @@
+# app/services/lexical_index.py
+"""Per-document BM25 index over chunk text.
+
+Each document's index is one file under VECTORSTORE_DIR/_lexical holding a
+JSON header (vocabulary and sizes) followed by flat little-endian arrays:
+
+    term_offsets  uint32[terms + 1]  postings of term t are [offsets[t], offsets[t + 1])
+    postings      uint32[postings]   chunk numbers, ascending within a term
+    frequencies   uint16[postings]   term frequency in that chunk
+    lengths       uint32[chunks]     tokens per chunk
+    pages, starts, ends uint32[chunks]
+    text_offsets  uint64[chunks + 1] byte ranges of chunk text in the trailing blob
+
+Queries load everything but the text blob, which is read per hit.
+"""
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from langchain.schema import Document as LCDocument
+from app.core.config import get_settings
+from app.core.metrics import CACHE_BYTES, CACHE_ENTRIES, stage
+from app.utils.cache import LRUCache
+from app.utils.text_processing import Chunk
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import sys
+import threading
+
+settings = get_settings()
+
+MAGIC = b"BM25\x00\x00\x00\x01"
+# Clause numbers, part numbers and defined terms stay whole: "12.3", "ab-1234"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the "
+    "this to was were will with what which who how does do".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound tokens also yield their parts."""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(
+                part for part in re.split(r"[.\-/]", token) if part not in STOPWORDS
+            )
+    return terms
+
+
+def term_coverage(query: str, text: str) -> float:
+    """Share of the query's distinct terms that occur in the text."""
+    terms = set(tokenize(query))
+    if not terms:
+        return 0.0
+    return len(terms & set(tokenize(text))) / len(terms)
+
+
+# "I" and "Q" are 4 and 8 bytes on every platform CPython supports
+TYPECODES = {"uint16": "H", "uint32": "I", "uint64": "Q"}
+
+
+def _typed(dtype: str, values: Iterable[int] = ()) -> array:
+    return array(TYPECODES[dtype], values)
+
+
+# (field, dtype, length in terms of the header sizes)
+LAYOUT = (
+    ("term_offsets", "uint32", lambda h: h["terms"] + 1),
+    ("postings", "uint32", lambda h: h["postings"]),
+    ("frequencies", "uint16", lambda h: h["postings"]),
+    ("lengths", "uint32", lambda h: h["chunks"]),
+    ("pages", "uint32", lambda h: h["chunks"]),
+    ("starts", "uint32", lambda h: h["chunks"]),
+    ("ends", "uint32", lambda h: h["chunks"]),
+    ("text_offsets", "uint64", lambda h: h["chunks"] + 1),
+)
+
+
+class BM25Index:
+    """Loaded postings of one document; chunk text stays on disk."""
+
+    def __init__(
+        self,
+        path: str,
+        header: Dict[str, Any],
+        arrays: Dict[str, array],
+        text_base: int
+    ):
+        self.path = path
+        self.terms = {term: number for number, term in enumerate(header["vocabulary"])}
+        self.chunk_count = header["chunks"]
+        self.average_length = header["average_length"] or 1.0
+        self.text_base = text_base
+        for name, values in arrays.items():
+            setattr(self, name, values)
+
+    @property
+    def size_bytes(self) -> int:
+        arrays = sum(
+            len(getattr(self, name)) * getattr(self, name).itemsize
+            for name, _, _ in LAYOUT
+        )
+        # Rough per-entry cost of the vocabulary dict
+        return arrays + sum(len(term) + 80 for term in self.terms)
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        k1: float = settings.BM25_K1,
+        b: float = settings.BM25_B
+    ) -> List[Tuple[int, float]]:
+        """Top-k (chunk number, BM25 score), best first."""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            number = self.terms.get(term)
+            if number is None:
+                continue
+            first, last = self.term_offsets[number], self.term_offsets[number + 1]
+            frequency = last - first
+            idf = math.log(1 + (self.chunk_count - frequency + 0.5) / (frequency + 0.5))
+            for position in range(first, last):
+                chunk = self.postings[position]
+                tf = self.frequencies[position]
+                norm = k1 * (1 - b + b * self.lengths[chunk] / self.average_length)
+                scores[chunk] = scores.get(chunk, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def chunk(self, number: int) -> Chunk:
+        start, end = self.text_offsets[number], self.text_offsets[number + 1]
+        with open(self.path, "rb") as f:
+            f.seek(self.text_base + start)
+            text = f.read(end - start).decode("utf-8")
+        return Chunk(text, self.pages[number], self.starts[number], self.ends[number])
+
+
+def build_index(path: str, chunks: Sequence[Chunk]):
+    """Write the index file for a document's chunks, replacing it atomically."""
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    lengths = _typed("uint32")
+    for number, chunk in enumerate(chunks):
+        terms = tokenize(chunk.text)
+        lengths.append(len(terms))
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            postings.setdefault(term, []).append((number, min(count, 0xFFFF)))
+
+    vocabulary = sorted(postings)
+    arrays = {
+        "term_offsets": _typed("uint32", [0]),
+        "postings": _typed("uint32"),
+        "frequencies": _typed("uint16"),
+        "lengths": lengths,
+        "pages": _typed("uint32", (chunk.page for chunk in chunks)),
+        "starts": _typed("uint32", (chunk.start for chunk in chunks)),
+        "ends": _typed("uint32", (chunk.end for chunk in chunks)),
+        "text_offsets": _typed("uint64", [0]),
+    }
+    for term in vocabulary:
+        for number, count in postings[term]:
+            arrays["postings"].append(number)
+            arrays["frequencies"].append(count)
+        arrays["term_offsets"].append(len(arrays["postings"]))
+
+    texts = [chunk.text.encode("utf-8") for chunk in chunks]
+    for text in texts:
+        arrays["text_offsets"].append(arrays["text_offsets"][-1] + len(text))
+
+    header = json.dumps({
+        "chunks": len(chunks),
+        "terms": len(vocabulary),
+        "postings": len(arrays["postings"]),
+        "average_length": sum(lengths) / len(lengths) if len(lengths) else 0.0,
+        "vocabulary": vocabulary,
+    }).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, _, _ in LAYOUT:
+            values = arrays[name]
+            if sys.byteorder == "big":
+                values = array(values.typecode, values)
+                values.byteswap()
+            values.tofile(f)
+        for text in texts:
+            f.write(text)
+    os.replace(temp_path, path)
+
+
+def load_index(path: str) -> BM25Index:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a lexical index: {path}")
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+        arrays = {}
+        for name, dtype, length in LAYOUT:
+            values = _typed(dtype)
+            values.fromfile(f, length(header))
+            if sys.byteorder == "big":
+                values.byteswap()
+            arrays[name] = values
+        return BM25Index(path, header, arrays, f.tell())
+
+
+class LexicalIndex:
+    """BM25 index files per document, loaded on first query into an LRU cache."""
+
+    def __init__(
+        self,
+        root: str = os.path.join(settings.VECTORSTORE_DIR, "_lexical"),
+        max_bytes: int = settings.LEXICAL_INDEX_CACHE_MAX_BYTES
+    ):
+        self.root = root
+        self._cache = LRUCache(max_entries=sys.maxsize, max_weight=max_bytes)
+
+    def contains(self, document_id: int) -> bool:
+        return os.path.exists(self.path(document_id))
+
+    def add_document(self, document_id: int, chunks: Sequence[Chunk]):
+        build_index(self.path(document_id), chunks)
+        self._cache.pop(document_id)
+
+    def delete_document(self, document_id: int):
+        self._cache.pop(document_id)
+        if os.path.exists(self.path(document_id)):
+            os.remove(self.path(document_id))
+
+    def search(
+        self,
+        document_ids: Sequence[int],
+        query: str,
+        k: int
+    ) -> List[Tuple[LCDocument, float]]:
+        """Top-k chunks over the given documents, merged by BM25 score."""
+        results: List[Tuple[int, int, float]] = []
+        for document_id in document_ids:
+            index = self.open(document_id)
+            if index:
+                results.extend(
+                    (document_id, number, score)
+                    for number, score in index.search(query, k)
+                )
+        results = heapq.nlargest(k, results, key=lambda result: result[2])
+        return [
+            (self._to_document(document_id, number), score)
+            for document_id, number, score in results
+        ]
+
+    def open(self, document_id: int) -> Optional[BM25Index]:
+        index = self._cache.get(document_id)
+        if index is None and self.contains(document_id):
+            with stage("qa", "lexical_index_open"):
+                index = load_index(self.path(document_id))
+            self._cache.put(document_id, index, weight=index.size_bytes)
+        return index
+
+    def path(self, document_id: int) -> str:
+        return os.path.join(self.root, f"{document_id}.bm25")
+
+    def clear(self):
+        """Close all open indexes; the files stay on disk."""
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    def _to_document(self, document_id: int, number: int) -> LCDocument:
+        chunk = self.open(document_id).chunk(number)
+        return LCDocument(
+            page_content=chunk.text,
+            metadata={**chunk.metadata(), "document_id": document_id, "chunk": number}
+        )
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Tuple[Sequence[Tuple[LCDocument, float]], float]],
+    k: int,
+    rank_constant: int = settings.RETRIEVAL_RRF_K
+) -> List[Tuple[LCDocument, float]]:
+    """Merge ranked result lists, each with a weight, by weighted RRF.
+
+    A chunk scores sum(weight / (rank_constant + rank)) over the lists it
+    appears in. Chunks are matched by document and text, since stores
+    indexed before page-aware chunking number their chunks differently.
+    """
+    fused: Dict[Tuple[Any, str], List[Any]] = {}
+    for results, weight in rankings:
+        for rank, (document, _) in enumerate(results, start=1):
+            key = (document.metadata.get("document_id"), document.page_content)
+            entry = fused.setdefault(key, [document, 0.0])
+            entry[1] += weight / (rank_constant + rank)
+    results = [(document, score) for document, score in fused.values()]
+    return heapq.nlargest(k, results, key=lambda result: result[1])
+
+
+_lexical_index: Optional[LexicalIndex] = None
+_lexical_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> LexicalIndex:
+    """Return the process-wide lexical index, creating it on first use."""
+    global _lexical_index
+    with _lexical_index_lock:
+        if _lexical_index is None:
+            _lexical_index = LexicalIndex()
+            CACHE_ENTRIES.labels("lexical_index").set_function(
+                lambda: len(_lexical_index._cache)
+            )
+            CACHE_BYTES.labels("lexical_index").set_function(
+                lambda: _lexical_index._cache.total_weight
+            )
+    return _lexical_index
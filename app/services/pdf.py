@@ -1,13 +1,118 @@
 import fitz
+import hashlib
+import math
 import os
-from typing import Tuple
-from fastapi import UploadFile
+import re
+import tempfile
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile
 from app.core.config import get_settings
+from app.core.executors import get_executor, run_cpu, run_io
+from app.core.metrics import stage
+from app.services.text_store import get_text_store
+from app.utils.text_processing import PAGE_SEPARATOR, page_text
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
 settings = get_settings()
-executor = ThreadPoolExecutor()
+
+
+def extract_page_range(
+    file_path: str,
+    start: int = 0,
+    stop: Optional[int] = None
+) -> List[str]:
+    """Extract the text of pages [start, stop) with a dedicated fitz handle.
+
+    Each page is its text blocks in reading order, separated by blank lines,
+    so the chunker can keep blocks together.
+    """
+    with fitz.open(file_path) as pdf_document:
+        stop = pdf_document.page_count if stop is None else stop
+        return [
+            page_text(pdf_document[number].get_text("blocks"))
+            for number in range(start, stop)
+        ]
+
+
+def extract_page_numbers(file_path: str, numbers: List[int]) -> List[str]:
+    """Extract the text of the given pages with a dedicated fitz handle."""
+    with fitz.open(file_path) as pdf_document:
+        return [
+            page_text(pdf_document[number].get_text("blocks"))
+            for number in numbers
+        ]
+
+
+# An indirect reference, "12 0 R"
+_REFERENCE = re.compile(r"(\d+) \d+ R")
+
+
+def _object_digest(pdf_document, xref: int, digests: Dict[int, bytes]) -> bytes:
+    """Hash an object and every object it references, apart from xref numbers.
+
+    Covers Form XObject content, ToUnicode CMaps and embedded font files,
+    which decide a page's text without appearing in its content stream.
+    Image data is skipped: it has no text. Digests are memoised per root
+    object, since fonts are shared by many pages.
+    """
+    digest = digests.get(xref)
+    if digest is not None:
+        return digest
+    hasher = hashlib.blake2b(digest_size=16)
+    seen = set()
+    stack = [xref]
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            hasher.update(b"seen")
+            continue
+        seen.add(current)
+        source = pdf_document.xref_object(current, compressed=True)
+        hasher.update(_REFERENCE.sub("R", source).encode())
+        if pdf_document.xref_is_stream(current) and "/Subtype/Image" not in source:
+            hasher.update(pdf_document.xref_stream_raw(current) or b"")
+        # Depth-first in order of appearance, so equal structures hash alike
+        stack.extend(reversed([int(number) for number in _REFERENCE.findall(source)]))
+    digest = digests[xref] = hasher.digest()
+    return digest
+
+
+def page_fingerprints(file_path: str) -> List[str]:
+    """Hash each page's content streams, resources and rotation.
+
+    Resources are the page's fonts and Form XObjects with everything they
+    reference, see ``_object_digest``. Pages with the same fingerprint
+    extract to the same text, so a revised PDF can reuse the text of its
+    unchanged pages without extracting them. Reading the raw streams is
+    much cheaper than text extraction.
+    """
+    fingerprints = []
+    digests: Dict[int, bytes] = {}
+    with fitz.open(file_path) as pdf_document:
+        for page in pdf_document:
+            hasher = hashlib.blake2b(digest_size=16)
+            hasher.update(page.read_contents())
+            # Ordered by resource name: xrefs differ between files
+            for font in sorted(page.get_fonts(), key=lambda font: font[4]):
+                hasher.update(repr(font[1:]).encode())
+                if font[0]:
+                    hasher.update(_object_digest(pdf_document, font[0], digests))
+            for xobject in sorted(page.get_xobjects(), key=lambda xobject: xobject[1]):
+                hasher.update(xobject[1].encode())
+                hasher.update(_object_digest(pdf_document, xobject[0], digests))
+            hasher.update(str(page.rotation).encode())
+            fingerprints.append(hasher.hexdigest())
+    return fingerprints
+
+
+def page_ranges(page_count: int, shards: int) -> List[Tuple[int, int]]:
+    """Split page numbers into contiguous, roughly equal ranges."""
+    size = max(1, math.ceil(page_count / max(shards, 1)))
+    return [
+        (start, min(start + size, page_count))
+        for start in range(0, page_count, size)
+    ]
+
 
 class PDFService:
     def __init__(self):
@@ -18,51 +123,146 @@ class PDFService:
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.extracted_text_dir, exist_ok=True)
 
-    async def save_uploaded_file(self, file: UploadFile) -> Tuple[str, int]:
-        """Save the uploaded PDF file and return its path and size."""
-        file_path = os.path.join(self.upload_dir, file.filename)
-        
+    async def save_uploaded_file(self, file: UploadFile) -> Tuple[str, int, str]:
+        """Stream an upload to a temporary file, hashing it while writing.
+
+        Returns the temporary path, the size in bytes and the SHA-256 hex
+        digest. Uploads larger than MAX_UPLOAD_SIZE are rejected with 413.
+        """
+        async def chunks() -> AsyncIterator[bytes]:
+            while content := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                yield content
+
+        return await self.save_stream(chunks())
+
+    async def save_stream(self, chunks: AsyncIterator[bytes]) -> Tuple[str, int, str]:
+        """Write a file arriving in chunks like ``save_uploaded_file``."""
+        fd, temp_path = tempfile.mkstemp(dir=self.upload_dir, suffix=".part")
+        hasher = hashlib.sha256()
         size = 0
-        with open(file_path, "wb") as buffer:
-            while content := await file.read(1024 * 1024):  # Read in 1MB chunks
-                size += len(content)
-                buffer.write(content)
-        
-        return file_path, size
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                async for content in chunks:
+                    size += len(content)
+                    if size > settings.MAX_UPLOAD_SIZE:
+                        raise HTTPException(
+                            413,
+                            f"File exceeds the maximum upload size of "
+                            f"{settings.MAX_UPLOAD_SIZE} bytes"
+                        )
+                    hasher.update(content)
+                    buffer.write(content)
+        except BaseException:
+            self.discard_upload(temp_path)
+            raise
+
+        return temp_path, size, hasher.hexdigest()
+
+    def upload_path(self, content_hash: str) -> str:
+        """Content-addressed path of a stored upload."""
+        return os.path.join(self.upload_dir, f"{content_hash}.pdf")
+
+    def commit_upload(self, temp_path: str, content_hash: str) -> str:
+        """Atomically move a streamed upload to its content-addressed path.
+
+        A file already at that path has the same content, so it is kept and
+        the upload discarded.
+        """
+        file_path = self.upload_path(content_hash)
+        if os.path.exists(file_path):
+            self.discard_upload(temp_path)
+        else:
+            os.replace(temp_path, file_path)
+        return file_path
+
+    def discard_upload(self, temp_path: str):
+        """Remove a streamed upload that will not be kept."""
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+    async def extract_text(
+        self,
+        file_path: str,
+        document_id: int,
+        known_pages: Optional[Dict[int, str]] = None
+    ) -> str:
+        """Extract text from PDF and save it to a file.
 
-    async def extract_text(self, file_path: str, document_id: int) -> str:
-        """Extract text from PDF and save it to a file."""
+        Pages in ``known_pages`` (0-based page number to text) are taken as
+        given instead of being extracted again.
+        """
         try:
-            # Run PDF processing in thread pool
-            loop = asyncio.get_event_loop()
-            text = await loop.run_in_executor(
-                executor,
-                self._extract_text_sync,
-                file_path
-            )
-            
-            # Save extracted text
-            text_path = os.path.join(self.extracted_text_dir, f"{document_id}.txt")
-            await loop.run_in_executor(
-                executor,
-                self._save_text,
-                text_path,
-                text
-            )
-            
+            with stage("pdf", "extract"):
+                pages = await self.extract_pages(file_path, known_pages)
+
+            # Save extracted text, indexed by page
+            text_path = os.path.join(self.extracted_text_dir, f"{document_id}.pages")
+            with stage("pdf", "write"):
+                await run_io(get_text_store().write, text_path, pages)
+            # Drop text extracted in the plain format before re-ingestion
+            legacy_path = os.path.join(self.extracted_text_dir, f"{document_id}.txt")
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+
             return text_path
         except Exception as e:
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
 
+    async def page_hashes(self, file_path: str) -> List[str]:
+        """Per-page fingerprints, see ``page_fingerprints``."""
+        with stage("pdf", "fingerprint"):
+            return await run_cpu(page_fingerprints, file_path)
+
+    async def extract_pages(
+        self,
+        file_path: str,
+        known_pages: Optional[Dict[int, str]] = None
+    ) -> List[str]:
+        """Extract per-page text, sharding large documents across processes."""
+        page_count = await run_io(self._page_count, file_path)
+        if known_pages:
+            return await self._extract_missing_pages(file_path, page_count, known_pages)
+
+        workers = get_executor("cpu").workers
+        if page_count < settings.PDF_PARALLEL_PAGE_THRESHOLD or workers < 2:
+            return await run_cpu(extract_page_range, file_path)
+
+        # Each worker opens its own handle for one page range
+        shards = await asyncio.gather(*[
+            run_cpu(extract_page_range, file_path, start, stop)
+            for start, stop in page_ranges(page_count, workers * 2)
+        ])
+        return [page for shard in shards for page in shard]
+
+    async def _extract_missing_pages(
+        self,
+        file_path: str,
+        page_count: int,
+        known_pages: Dict[int, str]
+    ) -> List[str]:
+        """Extract only the pages missing from ``known_pages``."""
+        missing = [number for number in range(page_count) if number not in known_pages]
+
+        workers = get_executor("cpu").workers
+        if len(missing) < settings.PDF_PARALLEL_PAGE_THRESHOLD or workers < 2:
+            extracted = await run_cpu(extract_page_numbers, file_path, missing)
+        else:
+            shards = await asyncio.gather(*[
+                run_cpu(extract_page_numbers, file_path, missing[start:stop])
+                for start, stop in page_ranges(len(missing), workers * 2)
+            ])
+            extracted = [page for shard in shards for page in shard]
+
+        pages = dict(known_pages)
+        pages.update(zip(missing, extracted))
+        return [pages[number] for number in range(page_count)]
+
     def _extract_text_sync(self, file_path: str) -> str:
         """Synchronous PDF text extraction."""
-        pdf_document = fitz.open(file_path)
-        text = ""
-        for page in pdf_document:
-            text += page.get_text()
-        return text
+        return PAGE_SEPARATOR.join(extract_page_range(file_path))
 
-    def _save_text(self, text_path: str, text: str):
-        """Synchronous text saving."""
-        with open(text_path, "w", encoding="utf-8") as f:
-            f.write(text)
\ No newline at end of file
+    def _page_count(self, file_path: str) -> int:
+        with fitz.open(file_path) as pdf_document:
+            return pdf_document.page_count
@@ -0,0 +1,129 @@
+# app/services/providers.py
+"""Process-wide services, built on first use or by the startup warm-up.
+
+The service modules pull in LangChain, Chroma, PyMuPDF and the OpenAI
+client, which take seconds to import and construct. Endpoints therefore
+get their services through these providers (as FastAPI dependencies), and
+nothing heavy is imported until a provider is first called. The app's
+lifespan runs ``warm_up`` in the background at startup, so workers come up
+immediately and report ready once the heavy components are built.
+"""
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from sqlalchemy import text
+from app.core.executors import shutdown_executors
+from app.core.metrics import stage
+from app.database.base import get_async_session_local
+import asyncio
+import logging
+import threading
+
+if TYPE_CHECKING:
+    from app.services.qa import QAService
+    from app.services.storage import StorageService
+
+logger = logging.getLogger(__name__)
+
+# Components reported by readiness, in warm-up order
+COMPONENTS = ("database", "storage", "qa")
+
+_qa_service: Optional["QAService"] = None
+_storage_service: Optional["StorageService"] = None
+_lock = threading.Lock()
+
+
+def get_storage_service() -> "StorageService":
+    """The shared StorageService, created on first use."""
+    global _storage_service
+    if _storage_service is None:
+        with _lock:
+            if _storage_service is None:
+                from app.services.storage import StorageService
+                _storage_service = StorageService()
+    return _storage_service
+
+
+def get_qa_service() -> "QAService":
+    """The shared QAService, created on first use.
+
+    One instance serves HTTP, WebSocket and ingestion, so they share its
+    per-document index build locks.
+    """
+    global _qa_service
+    if _qa_service is None:
+        with _lock:
+            if _qa_service is None:
+                from app.services.qa import QAService
+                _qa_service = QAService()
+    return _qa_service
+
+
+class Readiness:
+    """Warm-up state of each heavy component, and the task warming them."""
+
+    def __init__(self):
+        self.warm: Dict[str, bool] = {name: False for name in COMPONENTS}
+        # Last failure per component, kept until it warms up successfully
+        self.errors: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return all(self.warm.values())
+
+    def start(self) -> asyncio.Task:
+        """Start warming up in the background unless it is running or done."""
+        if self._task is None or (self._task.done() and not self.ready):
+            self._task = asyncio.create_task(warm_up())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def report(self) -> Dict[str, Any]:
+        report: Dict[str, Any] = {"ready": self.ready, "components": dict(self.warm)}
+        if self.errors:
+            report["errors"] = dict(self.errors)
+        return report
+
+
+readiness = Readiness()
+
+
+async def _ping_database():
+    async with get_async_session_local()() as db:
+        await db.execute(text("SELECT 1"))
+
+
+async def warm_up():
+    """Connect to the database and build every heavy component.
+
+    Imports and client construction are blocking, so they run in a worker
+    thread and the event loop keeps serving meanwhile. A component that
+    fails is retried by the next call.
+    """
+    steps = {
+        "database": _ping_database,
+        # Loads PyMuPDF and Chroma
+        "storage": lambda: asyncio.to_thread(get_storage_service),
+        # Builds the LLM client, embedder, vector and BM25 indexes
+        "qa": lambda: asyncio.to_thread(get_qa_service),
+    }
+    for name in COMPONENTS:
+        if readiness.warm[name]:
+            continue
+        try:
+            with stage("startup", name):
+                await steps[name]()
+        except Exception as e:
+            readiness.errors[name] = str(e)
+            logger.exception("Warm-up of %s failed", name)
+            continue
+        readiness.warm[name] = True
+        readiness.errors.pop(name, None)
+
+
+def shutdown():
+    """Release what the services hold open at exit."""
+    shutdown_executors()
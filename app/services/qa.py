@@ -1,118 +1,752 @@
 # app/services/qa.py
-from typing import Optional, Dict, Any
-from langchain import hub
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Chroma
-from langchain.embeddings import OpenAIEmbeddings
+from typing import Optional, Dict, Any, Iterable, List, AsyncIterator, Awaitable, Callable, Tuple, Union
 from langchain.chat_models import ChatOpenAI
-from langchain.chains import RetrievalQA
-from sqlalchemy.orm import Session
-from app.models.document import Document
-from app.schemas.message import AnswerMessage
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+from langchain.schema import Document as LCDocument
+from langchain.schema.prompt import PromptValue
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.executors import BULK, priority, run_cpu, run_io
+from app.core.metrics import (
+    ANSWER_SECONDS,
+    PROMPT_TOKENS,
+    QA_QUESTIONS,
+    current_trace,
+    stage,
+    start_trace
+)
+from app.models.document import READY_STATUSES, Document
+from app.schemas.message import AnswerMessage, RetrievalOptions
+from app.services.answer_cache import answer_cache, normalize_question
+from app.services.conversation_store import get_conversation_store
+from app.services.embeddings import create_embeddings
+from app.services.lexical_index import (
+    get_lexical_index,
+    reciprocal_rank_fusion,
+    term_coverage
+)
+from app.services.reranker import create_reranker, estimate_tokens
+from app.services.text_store import split_stored_text
+from app.services.vector_index import get_vector_index
+from app.utils.text_processing import Chunk, PageChunker, chunks_path, load_chunks
+from contextlib import asynccontextmanager
+import asyncio
+import functools
 import os
 import json
+import time
+
+settings = get_settings()
+
+
+class RelevanceStats:
+    """How often retrieval found nothing relevant and the LLM call was skipped."""
+
+    def __init__(self):
+        self.questions = 0
+        self.short_circuited = 0
+        self.top_relevance_total = 0.0
+
+    def record(self, relevant: bool, top_relevance: float):
+        self.questions += 1
+        self.short_circuited += not relevant
+        self.top_relevance_total += top_relevance
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "questions": self.questions,
+            "short_circuited": self.short_circuited,
+            "short_circuit_rate": (
+                self.short_circuited / self.questions if self.questions else 0.0
+            ),
+            "mean_top_relevance": (
+                self.top_relevance_total / self.questions if self.questions else 0.0
+            ),
+            "threshold": settings.QA_NO_CONTEXT_THRESHOLD
+        }
+
+
+relevance_stats = RelevanceStats()
+
 
 class QAService:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        self.embeddings = OpenAIEmbeddings()
+        self.chunker = PageChunker()
+        self.embeddings = create_embeddings()
+        self.vector_index = get_vector_index()
+        self.lexical_index = get_lexical_index()
+        self.reranker = create_reranker()
         self.llm = ChatOpenAI(
             temperature=0,
             model_name="gpt-3.5-turbo"
         )
-        self.conversations: Dict[str, list] = {}
+        self.conversation_store = get_conversation_store()
+        # key -> (lock, holders and waiters); dropped when the last one leaves
+        self._build_locks: Dict[int, Tuple[asyncio.Lock, int]] = {}
+        self._conversation_locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+        self.answer_cache = answer_cache if settings.ANSWER_CACHE_ENABLED else None
         
     async def get_answer(
         self,
-        db: Session,
-        document_id: int,
+        db: AsyncSession,
+        document_id: Optional[int],
         question: str,
-        conversation_id: Optional[str] = None
+        conversation_id: Optional[str] = None,
+        document_ids: Optional[List[int]] = None,
+        retrieval: Optional[RetrievalOptions] = None
     ) -> AnswerMessage:
-        # Get document
-        document = db.query(Document).filter(Document.id == document_id).first()
-        if not document:
-            raise ValueError("Document not found")
-            
-        # Load document text
-        with open(document.extracted_text_path, 'r', encoding='utf-8') as f:
-            text = f.read()
+        async with self._conversation_turn(conversation_id):
+            documents = await self._get_ready_documents(
+                db, document_ids or [document_id]
+            )
+            context = await self._get_conversation_context(conversation_id)
+
+            # Serve repeated and near-duplicate questions from the cache
+            cached, question_embedding = await self._lookup_cached_answer(
+                documents, context, question, retrieval
+            )
+            if cached:
+                QA_QUESTIONS.labels("cached").inc()
+                await self._update_conversation_history(
+                    conversation_id, question, cached.answer
+                )
+                return self._reuse_answer(cached, conversation_id)
+
+            started = time.perf_counter()
+            full_question, source_documents, scores, usage = await self._retrieve(
+                documents, question, context, retrieval
+            )
+
+            if not self._has_relevant_context(scores):
+                answer = self._no_context_answer(scores, conversation_id)
+            else:
+                # Get answer
+                with stage("qa", "llm"):
+                    result = await self.llm.ainvoke(
+                        self._build_prompt(full_question, source_documents, usage)
+                    )
+                QA_QUESTIONS.labels("answered").inc()
+                latency = time.perf_counter() - started
+                answer = self._build_answer(
+                    getattr(result, "content", result),
+                    source_documents,
+                    scores,
+                    conversation_id,
+                    usage,
+                    latency
+                )
+                await self._store_answer(
+                    documents, context, question, answer,
+                    latency, question_embedding, retrieval
+                )
             
-        # Split text and create/get vectorstore
-        texts = self.text_splitter.split_text(text)
-        vectorstore = await self._get_or_create_vectorstore(
-            texts,
-            document_id
-        )
+            # Update conversation history
+            await self._update_conversation_history(
+                conversation_id,
+                question,
+                answer.answer
+            )
         
-        # Create QA chain
-        qa_chain = RetrievalQA.from_chain_type(
-            self.llm,
-            retriever=vectorstore.as_retriever(
-                search_kwargs={"k": 3}
+        return answer
+
+    async def stream_answer(
+        self,
+        db: AsyncSession,
+        document_id: Optional[int],
+        question: str,
+        conversation_id: Optional[str] = None,
+        document_ids: Optional[List[int]] = None,
+        retrieval: Optional[RetrievalOptions] = None
+    ) -> AsyncIterator[Union[str, AnswerMessage]]:
+        """Yield answer tokens as the LLM produces them, then the final AnswerMessage."""
+        async with self._conversation_turn(conversation_id):
+            documents = await self._get_ready_documents(
+                db, document_ids or [document_id]
+            )
+            context = await self._get_conversation_context(conversation_id)
+
+            cached, question_embedding = await self._lookup_cached_answer(
+                documents, context, question, retrieval
+            )
+            if cached:
+                QA_QUESTIONS.labels("cached").inc()
+                await self._update_conversation_history(
+                    conversation_id, question, cached.answer
+                )
+                yield cached.answer
+                yield self._reuse_answer(cached, conversation_id)
+                return
+
+            started = time.perf_counter()
+            full_question, source_documents, scores, usage = await self._retrieve(
+                documents, question, context, retrieval
+            )
+
+            if not self._has_relevant_context(scores):
+                answer = self._no_context_answer(scores, conversation_id)
+                yield answer.answer
+            else:
+                parts = []
+                with stage("qa", "llm"):
+                    async for chunk in self.llm.astream(
+                        self._build_prompt(full_question, source_documents, usage)
+                    ):
+                        delta = getattr(chunk, "content", chunk)
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+                QA_QUESTIONS.labels("answered").inc()
+
+                latency = time.perf_counter() - started
+                answer = self._build_answer(
+                    "".join(parts), source_documents, scores, conversation_id,
+                    usage, latency
+                )
+                await self._store_answer(
+                    documents, context, question, answer,
+                    latency, question_embedding, retrieval
+                )
+            await self._update_conversation_history(
+                conversation_id, question, answer.answer
             )
+
+        yield answer
+
+    async def answer_batch(
+        self,
+        document: Document,
+        questions: List[str],
+        retrieval: Optional[RetrievalOptions] = None,
+        concurrency: int = settings.QA_BATCH_CONCURRENCY
+    ) -> AsyncIterator[Tuple[int, Union[AnswerMessage, Exception]]]:
+        """Answer independent questions about a ready document as each one finishes.
+
+        Yields (position in ``questions``, answer or error). The questions
+        are embedded in one batch call, repeated questions are answered once,
+        retrieval runs for all of them at once and at most ``concurrency``
+        LLM calls are in flight. Batch questions have no conversation.
+
+        As in ``get_answer``, the answer cache gets the vector of the
+        normalized question and vector search that of the question itself.
+        """
+        await self._ensure_indexed(document)
+        unique = list(dict.fromkeys(questions))
+        normalized = [normalize_question(question) for question in unique]
+
+        _, vector_weight, _ = self._retrieval_settings(retrieval)
+        texts: List[str] = []
+        if self.answer_cache and not retrieval:
+            texts.extend(normalized)
+        if vector_weight > 0:
+            texts.extend(unique)
+        vectors: Dict[str, List[float]] = {}
+        if texts:
+            texts = list(dict.fromkeys(texts))
+            with stage("qa", "embed_questions"):
+                vectors = dict(zip(texts, await self.embeddings.aembed_documents(texts)))
+
+        llm_limit = asyncio.Semaphore(concurrency)
+        traced = current_trace() is not None
+
+        async def answer(number: int) -> Tuple[int, Union[AnswerMessage, Exception]]:
+            # Each question runs in its own task, so it can have its own trace
+            trace = start_trace() if traced else None
+            try:
+                # Batch questions queue behind interactive ones for the executors
+                with priority(BULK):
+                    result = await self._answer_batch_question(
+                        document,
+                        unique[number],
+                        vectors.get(normalized[number]),
+                        vectors.get(unique[number]),
+                        retrieval,
+                        llm_limit
+                    )
+            except Exception as e:
+                return number, e
+            if trace:
+                result.metadata = {**(result.metadata or {}), "trace": trace.to_list()}
+            return number, result
+
+        positions: Dict[str, List[int]] = {}
+        for index, question in enumerate(questions):
+            positions.setdefault(question, []).append(index)
+
+        tasks = [asyncio.create_task(answer(number)) for number in range(len(unique))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                number, result = await finished
+                for index in positions[unique[number]]:
+                    yield index, result
+        finally:
+            # The client went away or the caller stopped reading
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _answer_batch_question(
+        self,
+        document: Document,
+        question: str,
+        question_embedding: Optional[List[float]],
+        search_embedding: Optional[List[float]],
+        retrieval: Optional[RetrievalOptions],
+        llm_limit: asyncio.Semaphore
+    ) -> AnswerMessage:
+        embed = None
+        if question_embedding is not None:
+            async def embed(_: str) -> List[float]:
+                return question_embedding
+
+        cached, _ = await self._lookup_cached_answer(
+            [document], [], question, retrieval, embed
         )
-        
-        # Get context from conversation history
-        context = self._get_conversation_context(conversation_id)
-        
+        if cached:
+            QA_QUESTIONS.labels("cached").inc()
+            return self._reuse_answer(cached, None)
+
+        started = time.perf_counter()
+        full_question, source_documents, scores, usage = await self._retrieve(
+            [document], question, [], retrieval, search_embedding
+        )
+        if not self._has_relevant_context(scores):
+            return self._no_context_answer(scores, None)
+
+        async with llm_limit:
+            with stage("qa", "llm"):
+                result = await self.llm.ainvoke(
+                    self._build_prompt(full_question, source_documents, usage)
+                )
+        QA_QUESTIONS.labels("answered").inc()
+        latency = time.perf_counter() - started
+        answer = self._build_answer(
+            getattr(result, "content", result), source_documents, scores, None,
+            usage, latency
+        )
+        await self._store_answer(
+            [document], [], question, answer, latency, question_embedding, retrieval
+        )
+        return answer
+
+    @asynccontextmanager
+    async def _conversation_turn(self, conversation_id: Optional[str]):
+        """Serialize questions within a conversation, in the order they arrive.
+
+        Each turn reads the history and appends to it, so concurrent turns of
+        the same conversation wait for each other; other conversations run
+        in parallel.
+        """
+        if not conversation_id:
+            yield
+            return
+
+        async with self._keyed_lock(self._conversation_locks, conversation_id):
+            yield
+
+    @asynccontextmanager
+    async def _keyed_lock(self, locks: Dict[Any, Tuple[asyncio.Lock, int]], key: Any):
+        """Hold the lock of ``key``, shared by everyone holding or awaiting it.
+
+        The entry is removed only when the last of them leaves, so a late
+        arrival never gets a fresh lock while others still wait on the old one.
+        """
+        lock, waiters = locks.get(key, (asyncio.Lock(), 0))
+        locks[key] = (lock, waiters + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, waiters = locks[key]
+            if waiters == 1:
+                del locks[key]
+            else:
+                locks[key] = (lock, waiters - 1)
+
+    async def _get_ready_documents(
+        self,
+        db: AsyncSession,
+        document_ids: List[int]
+    ) -> List[Document]:
+        # Get documents
+        with stage("qa", "db_lookup"):
+            result = await db.execute(
+                select(Document).where(Document.id.in_(document_ids))
+            )
+            documents = list(result.scalars())
+            # End the read transaction so the pooled connection is not held
+            # while retrieval and the LLM call run
+            await db.commit()
+        found = {document.id for document in documents}
+        missing = [str(id) for id in document_ids if id not in found]
+        if missing:
+            raise ValueError(f"Document not found: {', '.join(missing)}")
+        for document in documents:
+            if document.status not in READY_STATUSES:
+                raise ValueError(
+                    f"Document {document.id} is not ready for questions "
+                    f"(status: {document.status})"
+                )
+        return documents
+
+    async def _retrieve(
+        self,
+        documents: List[Document],
+        question: str,
+        context: list,
+        retrieval: Optional[RetrievalOptions] = None,
+        embedding: Optional[List[float]] = None
+    ) -> Tuple[str, List[LCDocument], List[float], Dict[str, Any]]:
+        """Fetch the chunks relevant to the question across the given documents.
+
+        Vector search and BM25 run side by side and their rankings are fused
+        by reciprocal rank; a weight of 0 skips that retriever. ``embedding``
+        is the precomputed vector of the full question, if any. With a
+        reranker, RERANK_CANDIDATES chunks are fetched and it keeps up to k.
+
+        Returns the question with its context, the chunks, a relevance in
+        [0, 1] per chunk (the best of its vector similarity and the share of
+        question terms it contains) and the context usage for the answer.
+        """
+        for document in documents:
+            await self._ensure_indexed(document)
+
         # Prepare the question with context
         full_question = self._prepare_question_with_context(
             question,
             context
         )
-        
-        # Get answer
-        result = await qa_chain.ainvoke({"query": full_question})
-        
-        # Update conversation history
-        self._update_conversation_history(
-            conversation_id,
-            question,
-            result["result"]
+
+        k, vector_weight, lexical_weight = self._retrieval_settings(retrieval)
+        fetch = max(k, settings.RERANK_CANDIDATES) if self.reranker else k
+        searches = [
+            (functools.partial(self._vector_search, embedding=embedding), vector_weight),
+            (self._lexical_search, lexical_weight),
+        ]
+        active = [(search, weight) for search, weight in searches if weight > 0]
+        if not active:
+            raise ValueError("Retrieval needs a vector or lexical weight above 0")
+        if len(active) == 1:
+            results = await active[0][0](documents, full_question, question, fetch)
+        else:
+            results = await self._hybrid_search(
+                documents, full_question, question, fetch, active
+            )
+
+        results, usage = await self._rerank(question, results, k)
+        return (
+            full_question,
+            [document for document, _ in results],
+            [score for _, score in results],
+            usage
         )
-        
+
+    async def _hybrid_search(
+        self,
+        documents: List[Document],
+        full_question: str,
+        question: str,
+        k: int,
+        searches: List[Tuple[Callable[..., Awaitable[Any]], float]]
+    ) -> List[Tuple[LCDocument, float]]:
+        """Fuse the rankings of weighted searches, scoring chunks by relevance."""
+        candidates = max(k, settings.RETRIEVAL_CANDIDATES)
+        rankings = await asyncio.gather(*[
+            search(documents, full_question, question, candidates)
+            for search, _ in searches
+        ])
+        fused = reciprocal_rank_fusion(
+            [(results, weight) for results, (_, weight) in zip(rankings, searches)],
+            k
+        )
+
+        # Fusion ranks by position only; keep each chunk's best relevance
+        relevance: Dict[Tuple[Any, str], float] = {}
+        for results in rankings:
+            for document, score in results:
+                key = (document.metadata.get("document_id"), document.page_content)
+                relevance[key] = max(relevance.get(key, 0.0), score)
+        return [
+            (
+                document,
+                relevance[(document.metadata.get("document_id"), document.page_content)]
+            )
+            for document, _ in fused
+        ]
+
+    async def _rerank(
+        self,
+        question: str,
+        results: List[Tuple[LCDocument, float]],
+        k: int
+    ) -> Tuple[List[Tuple[LCDocument, float]], Dict[str, Any]]:
+        """Keep the retrieved chunks the reranker picks, and measure the context."""
+        usage: Dict[str, Any] = {
+            "candidates": len(results),
+            "candidate_tokens": sum(
+                estimate_tokens(document.page_content) for document, _ in results
+            ),
+        }
+        if self.reranker:
+            started = time.perf_counter()
+            with stage("qa", "rerank"):
+                # Scored on the question alone, like BM25
+                results = await self.reranker.select(question, results, k)
+            usage["rerank_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        usage["context_tokens"] = sum(
+            estimate_tokens(document.page_content) for document, _ in results
+        )
+        PROMPT_TOKENS.labels("candidates").observe(usage["candidate_tokens"])
+        PROMPT_TOKENS.labels("context").observe(usage["context_tokens"])
+        return results, usage
+
+    def _retrieval_settings(
+        self,
+        retrieval: Optional[RetrievalOptions]
+    ) -> Tuple[int, float, float]:
+        """k, vector weight and lexical weight, per-question values first."""
+        options = retrieval or RetrievalOptions()
+        return (
+            options.k or settings.RETRIEVAL_K,
+            settings.RETRIEVAL_VECTOR_WEIGHT if options.vector_weight is None
+            else options.vector_weight,
+            settings.RETRIEVAL_LEXICAL_WEIGHT if options.lexical_weight is None
+            else options.lexical_weight,
+        )
+
+    async def _vector_search(
+        self,
+        documents: List[Document],
+        full_question: str,
+        question: str,
+        k: int,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[LCDocument, float]]:
+        if embedding is None:
+            with stage("qa", "embed_query"):
+                embedding = await self.embeddings.aembed_query(full_question)
+        with stage("qa", "vector_search"):
+            return await run_io(
+                self.vector_index.search,
+                documents,
+                embedding,
+                k
+            )
+
+    async def _lexical_search(
+        self,
+        documents: List[Document],
+        full_question: str,
+        question: str,
+        k: int
+    ) -> List[Tuple[LCDocument, float]]:
+        """BM25 ranking, scored by the share of question terms in each chunk."""
+        # Only the question itself: terms of earlier turns would dilute exact matches
+        with stage("qa", "lexical_search"):
+            results = await run_io(
+                self.lexical_index.search,
+                [document.id for document in documents],
+                question,
+                k
+            )
+        return [
+            (document, term_coverage(question, document.page_content))
+            for document, _ in results
+        ]
+
+    async def _lookup_cached_answer(
+        self,
+        documents: List[Document],
+        context: list,
+        question: str,
+        retrieval: Optional[RetrievalOptions] = None,
+        embed: Optional[Callable[[str], Awaitable[List[float]]]] = None
+    ) -> Tuple[Optional[AnswerMessage], Optional[List[float]]]:
+        # Answers spanning several documents or with custom retrieval are not cached
+        if not self.answer_cache or len(documents) != 1 or retrieval:
+            return None, None
+        with stage("qa", "cache_lookup"):
+            return await self.answer_cache.lookup(
+                documents[0].id,
+                documents[0].content_hash,
+                context,
+                question,
+                embed or self.embeddings.aembed_query
+            )
+
+    async def _store_answer(
+        self,
+        documents: List[Document],
+        context: list,
+        question: str,
+        answer: AnswerMessage,
+        latency: float,
+        question_embedding: Optional[List[float]],
+        retrieval: Optional[RetrievalOptions] = None
+    ):
+        if not self.answer_cache or len(documents) != 1 or retrieval:
+            return
+        with stage("qa", "cache_store"):
+            await self.answer_cache.store(
+                documents[0].id,
+                documents[0].content_hash,
+                context,
+                question,
+                answer,
+                latency,
+                self.embeddings.aembed_query,
+                question_embedding
+            )
+
+    def _reuse_answer(
+        self,
+        cached: AnswerMessage,
+        conversation_id: Optional[str]
+    ) -> AnswerMessage:
+        cached.conversation_id = conversation_id or self._generate_conversation_id()
+        return cached
+
+    def _build_prompt(
+        self,
+        question: str,
+        source_documents: List[LCDocument],
+        usage: Dict[str, Any]
+    ) -> PromptValue:
+        """Build the "stuff" prompt used by RetrievalQA for the retrieved chunks.
+
+        Its estimated size is recorded in ``usage``.
+        """
+        prompt = PROMPT_SELECTOR.get_prompt(self.llm).format_prompt(
+            context="\n\n".join(doc.page_content for doc in source_documents),
+            question=question
+        )
+        usage["prompt_tokens"] = estimate_tokens(prompt.to_string())
+        PROMPT_TOKENS.labels("prompt").observe(usage["prompt_tokens"])
+        return prompt
+
+    def _build_answer(
+        self,
+        answer: str,
+        source_documents: List[LCDocument],
+        scores: List[float],
+        conversation_id: Optional[str],
+        usage: Dict[str, Any],
+        latency: float
+    ) -> AnswerMessage:
+        ANSWER_SECONDS.observe(latency)
         return AnswerMessage(
-            answer=result["result"],
-            confidence=self._calculate_confidence(result),
-            context=self._format_context(result.get("source_documents", [])),
-            conversation_id=conversation_id or self._generate_conversation_id()
+            answer=answer,
+            confidence=self._calculate_confidence(scores),
+            context=self._format_context(source_documents, scores),
+            conversation_id=conversation_id or self._generate_conversation_id(),
+            metadata={
+                "citations": self._citations(source_documents, scores),
+                "usage": {**usage, "latency_ms": round(latency * 1000, 1)}
+            }
         )
-        
-    async def _get_or_create_vectorstore(
+
+    def _has_relevant_context(self, scores: List[float]) -> bool:
+        """Whether retrieval found enough to be worth an LLM call."""
+        threshold = settings.QA_NO_CONTEXT_THRESHOLD
+        relevant = threshold <= 0 or (bool(scores) and max(scores) >= threshold)
+        relevance_stats.record(relevant, max(scores, default=0.0))
+        if not relevant:
+            QA_QUESTIONS.labels("no_context").inc()
+        return relevant
+
+    def _no_context_answer(
         self,
-        texts: list,
-        document_id: int
-    ) -> Chroma:
-        """Get existing vectorstore or create new one."""
-        persist_directory = f"storage/vectorstore/{document_id}"
+        scores: List[float],
+        conversation_id: Optional[str]
+    ) -> AnswerMessage:
+        """Answer without calling the LLM when nothing relevant was retrieved."""
+        return AnswerMessage(
+            answer=settings.QA_NO_CONTEXT_ANSWER,
+            confidence=self._calculate_confidence(scores),
+            context="",
+            conversation_id=conversation_id or self._generate_conversation_id(),
+            metadata={"citations": [], "no_relevant_context": True}
+        )
         
-        if os.path.exists(persist_directory):
-            return Chroma(
-                persist_directory=persist_directory,
-                embedding_function=self.embeddings
-            )
-            
-        vectorstore = Chroma.from_texts(
-            texts,
-            self.embeddings,
-            persist_directory=persist_directory
+    async def _ensure_indexed(self, document: Document):
+        """Index documents that predate the ingestion pipeline on first use.
+
+        Documents indexed before hybrid retrieval only get their BM25 index.
+        """
+        with stage("qa", "index_check"):
+            indexed = await run_io(self._is_indexed, document)
+        if indexed:
+            return
+
+        async with self._keyed_lock(self._build_locks, document.id):
+            # Another request may have indexed it while we waited
+            if await run_io(self._is_indexed, document):
+                return
+
+            chunks = await self.load_or_split_chunks(document.extracted_text_path)
+            with stage("qa", "index_build"):
+                if await run_io(self.vector_index.contains, document):
+                    await run_io(self.lexical_index.add_document, document.id, chunks)
+                else:
+                    vectors = await self.embed_texts([chunk.text for chunk in chunks])
+                    await run_io(self.persist_vectorstore, document.id, chunks, vectors)
+
+    def _is_indexed(self, document: Document) -> bool:
+        return (
+            self.vector_index.contains(document)
+            and self.lexical_index.contains(document.id)
         )
-        vectorstore.persist()
-        return vectorstore
+
+    def split_text(self, text: str) -> List[Chunk]:
+        """Split extracted document text into page-local chunks."""
+        return self.chunker.split_text(text)
+
+    def split_pages(self, pages: Iterable[str]) -> List[Chunk]:
+        """Split the pages of extracted document text into page-local chunks."""
+        return self.chunker.split_pages(pages)
+
+    async def load_or_split_chunks(self, text_path: str) -> List[Chunk]:
+        """Read the chunk sidecar of an extracted text file, creating it if missing."""
+        path = chunks_path(text_path)
+        if os.path.exists(path):
+            with stage("qa", "chunks_load"):
+                return await run_io(load_chunks, path)
+        # Splitting is CPU-bound, so it runs in the process pool
+        with stage("qa", "split"):
+            return await run_cpu(split_stored_text, text_path, self.chunker)
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Compute embeddings for document chunks."""
+        return await self.embeddings.aembed_documents(texts)
+
+    def persist_vectorstore(
+        self,
+        document_id: int,
+        chunks: List[Chunk],
+        vectors: List[List[float]]
+    ):
+        """Write precomputed chunk embeddings to the vector index, and the BM25 index."""
+        self.vector_index.add_document(
+            document_id,
+            [chunk.text for chunk in chunks],
+            vectors,
+            [chunk.metadata() for chunk in chunks]
+        )
+        self.lexical_index.add_document(document_id, chunks)
+
+        # Re-ingested content invalidates cached answers
+        answer_cache.invalidate(document_id)
         
-    def _get_conversation_context(
+    async def _get_conversation_context(
         self,
         conversation_id: Optional[str]
     ) -> list:
-        """Get conversation history for context."""
+        """Get the summary and recent turns of a conversation for context."""
         if not conversation_id:
             return []
-        return self.conversations.get(conversation_id, [])
+        with stage("qa", "conversation_load"):
+            conversation = await self.conversation_store.get(conversation_id)
+        return conversation.context()
         
     def _prepare_question_with_context(
         self,
@@ -123,9 +757,10 @@ class QAService:
         if not context:
             return question
             
+        # A None question marks the summary of earlier turns
         context_str = "\n".join([
-            f"Q: {q}\nA: {a}"
-            for q, a in context[-3:]  # Use last 3 exchanges
+            f"Summary of earlier conversation: {a}" if q is None else f"Q: {q}\nA: {a}"
+            for q, a in context
         ])
         
         return f"""
@@ -135,7 +770,7 @@ class QAService:
         Current question: {question}
         """
         
-    def _update_conversation_history(
+    async def _update_conversation_history(
         self,
         conversation_id: Optional[str],
         question: str,
@@ -144,32 +779,77 @@ class QAService:
         """Update conversation history."""
         if not conversation_id:
             return
+
+        # The store bounds the history, summarizing older turns if enabled
+        summarize = (
+            self._summarize_history
+            if settings.CONVERSATION_SUMMARIZER == "llm" else None
+        )
+        with stage("qa", "conversation_save"):
+            await self.conversation_store.append(
+                conversation_id, question, answer, summarize
+            )
+
+    async def _summarize_history(self, summary: str, turns: list) -> str:
+        """Fold older turns into the running summary with the LLM."""
+        transcript = "\n".join(f"Q: {q}\nA: {a}" for q, a in turns)
+        result = await self.llm.ainvoke(
+            "Update the summary of a conversation about a document with the "
+            "new exchanges. Keep facts the user may refer back to and stay "
+            f"under {settings.CONVERSATION_SUMMARY_MAX_CHARS} characters.\n\n"
+            f"Current summary:\n{summary or '(none)'}\n\n"
+            f"New exchanges:\n{transcript}\n\nUpdated summary:"
+        )
+        content = getattr(result, "content", result)
+        return content.strip()[:settings.CONVERSATION_SUMMARY_MAX_CHARS]
             
-        if conversation_id not in self.conversations:
-            self.conversations[conversation_id] = []
-            
-        self.conversations[conversation_id].append((question, answer))
-        
-        # Keep only last 10 exchanges
-        self.conversations[conversation_id] = \
-            self.conversations[conversation_id][-10:]
-            
-    def _calculate_confidence(self, result: Dict[str, Any]) -> float:
-        """Calculate confidence score for the answer."""
-        # Implement your confidence calculation logic here
-        return 0.9  # Placeholder
+    def _calculate_confidence(self, scores: List[float]) -> float:
+        """Confidence from the relevance of the retrieved chunks.
+
+        Dominated by the best chunk, pulled down when the rest of the
+        context is weak.
+        """
+        if not scores:
+            return 0.0
+        confidence = 0.7 * max(scores) + 0.3 * sum(scores) / len(scores)
+        return round(min(max(confidence, 0.0), 1.0), 4)
         
-    def _format_context(self, source_documents: list) -> str:
+    def _format_context(self, source_documents: list, scores: List[float]) -> str:
         """Format source documents into readable context."""
         if not source_documents:
             return ""
             
+        several = len({doc.metadata.get("document_id") for doc in source_documents}) > 1
         context_parts = []
-        for doc in source_documents:
+        for doc, score in zip(source_documents, scores):
             page_content = doc.page_content[:200] + "..."  # Truncate long content
-            context_parts.append(page_content)
+            label = self._citation_label(doc.metadata, several)
+            label = f"{label}, relevance {score:.2f}" if label else f"relevance {score:.2f}"
+            context_parts.append(f"[{label}] {page_content}")
             
         return "\n\n".join(context_parts)
+
+    def _citation_label(self, metadata: Dict[str, Any], with_document: bool) -> str:
+        # Chunks indexed before page-aware chunking have no page number
+        if "page" not in metadata:
+            return ""
+        if with_document:
+            return f"Document {metadata['document_id']}, page {metadata['page']}"
+        return f"Page {metadata['page']}"
+
+    def _citations(self, source_documents: list, scores: List[float]) -> List[Dict[str, Any]]:
+        """Where each retrieved chunk comes from, for clients to link to."""
+        return [
+            {
+                "document_id": doc.metadata.get("document_id"),
+                "page": doc.metadata["page"],
+                "start": doc.metadata["start"],
+                "end": doc.metadata["end"],
+                "relevance": round(score, 4)
+            }
+            for doc, score in zip(source_documents, scores)
+            if "page" in doc.metadata
+        ]
         
     def _generate_conversation_id(self) -> str:
         """Generate a new conversation ID."""
@@ -0,0 +1,137 @@
+# app/services/reranker.py
+"""Rescore retrieved chunks and keep the ones worth their prompt tokens.
+
+Retrieval over-fetches RERANK_CANDIDATES chunks. The reranker scores each
+one against the question, and the best are kept in score order while they
+stay within RERANK_TOKEN_BUDGET, score at least RERANK_MIN_RELATIVE_SCORE of
+the best one and number at most k.
+
+``LexicalReranker`` is CPU-only and needs no model files or network calls.
+Heavier scorers (cross-encoders, hosted rerank APIs) subclass ``Reranker``,
+implement ``score`` and are registered in ``RERANKERS`` under the name that
+RERANKER selects. Blocking ones should run through ``run_cpu`` or ``run_io``.
+"""
+from collections import Counter
+from typing import Callable, Dict, List, Sequence, Tuple
+from langchain.schema import Document as LCDocument
+from app.core.config import get_settings
+from app.services.lexical_index import tokenize
+import math
+
+settings = get_settings()
+
+# OpenAI's rule of thumb for English text; no tokenizer download needed
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class Reranker:
+    """Scores candidate chunks for a question; higher is more relevant."""
+
+    name = ""
+
+    async def score(
+        self,
+        question: str,
+        candidates: Sequence[Tuple[LCDocument, float]]
+    ) -> List[float]:
+        """One score per (chunk, retrieval relevance) candidate."""
+        raise NotImplementedError
+
+    async def select(
+        self,
+        question: str,
+        candidates: Sequence[Tuple[LCDocument, float]],
+        k: int,
+        token_budget: int = settings.RERANK_TOKEN_BUDGET,
+        min_relative_score: float = settings.RERANK_MIN_RELATIVE_SCORE
+    ) -> List[Tuple[LCDocument, float]]:
+        """The candidates to put in the prompt, best first.
+
+        The best chunk is always kept, even when it alone exceeds the budget.
+        Chunks that do not fit the remaining budget are skipped, so a shorter
+        one further down can still be used.
+        """
+        if not candidates:
+            return []
+        scores = await self.score(question, candidates)
+        ranked = sorted(zip(candidates, scores), key=lambda item: item[1], reverse=True)
+        cutoff = ranked[0][1] * min_relative_score
+
+        selected: List[Tuple[LCDocument, float]] = []
+        remaining = token_budget
+        for candidate, score in ranked:
+            if len(selected) >= k or score < cutoff:
+                break
+            tokens = estimate_tokens(candidate[0].page_content)
+            if selected and tokens > remaining:
+                continue
+            selected.append(candidate)
+            remaining -= tokens
+        return selected
+
+
+class LexicalReranker(Reranker):
+    """TF-IDF cosine between question and chunk, blended with retrieval relevance.
+
+    Question terms are weighted by IDF over the candidates themselves: a
+    term found in every candidate says nothing about which one answers the
+    question. Chunk terms use log term frequency. Cosines are scaled so the
+    best candidate gets 1 before blending.
+
+    Retrieval relevance is the embedding cosine for vector hits and the
+    question term coverage for BM25 hits, so no chunk is embedded again.
+    """
+
+    name = "lexical"
+
+    def __init__(self, lexical_weight: float = settings.RERANK_LEXICAL_WEIGHT):
+        self.lexical_weight = lexical_weight
+
+    async def score(
+        self,
+        question: str,
+        candidates: Sequence[Tuple[LCDocument, float]]
+    ) -> List[float]:
+        # A few dozen chunks take a few milliseconds, less than a pool hop
+        terms = Counter(tokenize(question))
+        counts = [Counter(tokenize(document.page_content)) for document, _ in candidates]
+        frequency = Counter(term for chunk in counts for term in terms if term in chunk)
+        weights = {
+            term: count * math.log(1 + len(candidates) / (1 + frequency[term]))
+            for term, count in terms.items()
+        }
+
+        cosines = []
+        for chunk in counts:
+            dot = sum(
+                weight * (1 + math.log(chunk[term]))
+                for term, weight in weights.items() if term in chunk
+            )
+            norm = math.sqrt(sum((1 + math.log(count)) ** 2 for count in chunk.values()))
+            cosines.append(dot / norm if dot else 0.0)
+        best = max(cosines) or 1.0
+
+        return [
+            self.lexical_weight * cosine / best + (1 - self.lexical_weight) * relevance
+            for cosine, (_, relevance) in zip(cosines, candidates)
+        ]
+
+
+# RERANKER name -> factory; "none" sends retrieval's top k unchanged
+RERANKERS: Dict[str, Callable[[], Reranker]] = {
+    "lexical": LexicalReranker,
+}
+
+
+def create_reranker():
+    """Build the reranker selected by RERANKER, or None when disabled."""
+    if settings.RERANKER == "none":
+        return None
+    try:
+        return RERANKERS[settings.RERANKER]()
+    except KeyError:
+        raise ValueError(f"Unknown reranker: {settings.RERANKER}") from None
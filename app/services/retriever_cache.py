@@ -0,0 +1,84 @@
+from typing import Any, Dict, Optional
+from app.core.config import get_settings
+from app.core.metrics import CACHE_BYTES, CACHE_ENTRIES
+from app.utils.cache import LRUCache
+import os
+
+settings = get_settings()
+
+
+class RetrieverEntry:
+    """Open, ready-to-query vector store for one document."""
+
+    def __init__(self, vectorstore: Any, size_bytes: int):
+        self.vectorstore = vectorstore
+        self.size_bytes = size_bytes
+
+
+class RetrieverCache:
+    """LRU cache of open per-document retrievers, bounded by count and bytes."""
+
+    def __init__(
+        self,
+        max_entries: int = settings.RETRIEVER_CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.RETRIEVER_CACHE_MAX_BYTES
+    ):
+        self._cache = LRUCache(max_entries=max_entries, max_weight=max_bytes)
+
+    def get(
+        self,
+        document_id: int,
+        content_hash: Optional[str]
+    ) -> Optional[RetrieverEntry]:
+        return self._cache.get((document_id, content_hash))
+
+    def peek(
+        self,
+        document_id: int,
+        content_hash: Optional[str]
+    ) -> Optional[RetrieverEntry]:
+        """Look up an entry without counting a hit or miss."""
+        return self._cache.peek((document_id, content_hash))
+
+    def put(
+        self,
+        document_id: int,
+        content_hash: Optional[str],
+        entry: RetrieverEntry
+    ):
+        # Drop stale entries for older content of the same document
+        self.invalidate(document_id)
+        self._cache.put(
+            (document_id, content_hash),
+            entry,
+            weight=max(entry.size_bytes, 1)
+        )
+
+    def invalidate(self, document_id: int) -> int:
+        """Remove all cached retrievers for a document."""
+        return self._cache.discard_where(lambda key: key[0] == document_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of all files below a directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+retriever_cache = RetrieverCache()
+CACHE_ENTRIES.labels("retriever_cache").set_function(lambda: len(retriever_cache._cache))
+CACHE_BYTES.labels("retriever_cache").set_function(
+    lambda: retriever_cache._cache.total_weight
+)
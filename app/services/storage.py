@@ -1,85 +1,315 @@
-from app.models.document import Document
-from app.schemas.document import DocumentCreate, DocumentUpdate
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from sqlalchemy import func, insert, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.executors import run_io
+from app.models.document import SUMMARY_COLUMNS, Document
+from app.schemas.document import BulkUploadItem, DocumentCreate, DocumentUpdate
 from app.services.pdf import PDFService
+from app.services.answer_cache import answer_cache
+from app.services.lexical_index import get_lexical_index
+from app.services.text_store import get_text_store
+from app.services.vector_index import get_vector_index
+from app.utils.text_processing import chunks_path
 from fastapi import UploadFile, HTTPException
 import os
 import json
 
+class StagedUpload:
+    """A file streamed to a temporary path, not yet stored as a document."""
+
+    def __init__(self, filename: str, temp_path: str, file_size: int, content_hash: str):
+        self.filename = filename
+        self.temp_path = temp_path
+        self.file_size = file_size
+        self.content_hash = content_hash
+
+
 class StorageService:
     def __init__(self):
         self.pdf_service = PDFService()
 
     async def store_document(
         self,
-        db: Session,
+        db: AsyncSession,
         file: UploadFile,
         document_in: DocumentCreate,
-        content_hash: str
+        parent: Optional[Document] = None
     ) -> Document:
-        """Store document and its metadata in database."""
-        # Save file and get path
-        file_path, file_size = await self.pdf_service.save_uploaded_file(file)
+        """Store document and its metadata in database.
+
+        With ``parent`` the upload is stored as the next version of that
+        document, in the same lineage.
+        """
+        # Stream the file to disk, hashing it on the way
+        temp_path, file_size, content_hash = \
+            await self.pdf_service.save_uploaded_file(file)
+
+        # Check if document already exists
+        if await self.get_by_hash(db, content_hash):
+            self.pdf_service.discard_upload(temp_path)
+            raise HTTPException(400, "Document already exists")
 
-        # Create document record
+        # Create document record; the upload moves to this path only once
+        # the insert has committed, so a failed insert leaves no stray file
         db_document = Document(
             filename=document_in.filename,
-            file_path=file_path,
+            file_path=self.pdf_service.upload_path(content_hash),
             file_size=file_size,
             status="pending",
             content_hash=content_hash,
             mime_type="application/pdf",
-            metadata=json.dumps({"original_filename": file.filename})
+            doc_metadata=json.dumps({"original_filename": file.filename})
         )
+        if parent is not None:
+            db_document.parent_id = parent.id
+            db_document.lineage_id = parent.lineage_id or parent.id
+            db_document.version = (parent.version or 1) + 1
         db.add(db_document)
-        db.commit()
-        db.refresh(db_document)
-
         try:
-            # Extract text
-            extracted_text_path = await self.pdf_service.extract_text(
-                file_path, db_document.id
-            )
-            
-            # Update document with extracted text path
-            db_document.extracted_text_path = extracted_text_path
-            db_document.status = "processed"
-            db.commit()
-            db.refresh(db_document)
-
-        except Exception as e:
-            db_document.status = "failed"
-            db.commit()
-            raise HTTPException(500, f"Failed to process document: {str(e)}")
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            self.pdf_service.discard_upload(temp_path)
+            if parent is not None and await self.get_next_version(db, parent.id):
+                # A concurrent upload already replaced this version
+                raise HTTPException(409, "Document already has a newer version")
+            # A concurrent upload of the same content won the insert
+            raise HTTPException(400, "Document already exists")
+        except BaseException:
+            self.pdf_service.discard_upload(temp_path)
+            raise
+        self.pdf_service.commit_upload(temp_path, content_hash)
+        await db.refresh(db_document)
 
+        # Extraction and embedding run in the background ingestion pipeline
         return db_document
 
-    def get_by_hash(self, db: Session, content_hash: str) -> Optional[Document]:
+    async def store_documents(
+        self,
+        db: AsyncSession,
+        uploads: List[StagedUpload]
+    ) -> List[BulkUploadItem]:
+        """Store many staged uploads with one lookup and one insert.
+
+        Content already stored, or repeated within ``uploads``, is discarded
+        and reported as a duplicate of the document holding it. Items are
+        returned in the order of ``uploads``.
+
+        Files are moved to their stored paths only once the insert has
+        committed: a retried insert finds every upload still at its temporary
+        path, and a failed one discards them.
+        """
+        hashes = list(dict.fromkeys(upload.content_hash for upload in uploads))
+        stored: Dict[str, int] = {}
+        inserted: Dict[str, int] = {}
+        for attempt in range(2):
+            result = await db.execute(
+                select(Document.content_hash, Document.id)
+                .where(Document.content_hash.in_(hashes))
+            )
+            stored = dict(result.all())
+
+            new: Dict[str, StagedUpload] = {}
+            for upload in uploads:
+                if upload.content_hash not in stored:
+                    new.setdefault(upload.content_hash, upload)
+            if not new:
+                break
+            rows = [
+                {
+                    "filename": os.path.basename(upload.filename),
+                    "file_path": self.pdf_service.upload_path(upload.content_hash),
+                    "file_size": upload.file_size,
+                    "status": "pending",
+                    "content_hash": upload.content_hash,
+                    "mime_type": "application/pdf",
+                    "doc_metadata": json.dumps({"original_filename": upload.filename}),
+                }
+                for upload in new.values()
+            ]
+            try:
+                result = await db.execute(
+                    insert(Document).returning(Document.content_hash, Document.id), rows
+                )
+                inserted = dict(result.all())
+                await db.commit()
+                break
+            except IntegrityError:
+                # A concurrent upload stored some of this content first: look again
+                await db.rollback()
+                if attempt:
+                    for upload in uploads:
+                        self.pdf_service.discard_upload(upload.temp_path)
+                    raise HTTPException(409, "Concurrent uploads of the same content")
+
+        items = []
+        for upload in uploads:
+            document_id = inserted.pop(upload.content_hash, None)
+            if document_id is not None:
+                self.pdf_service.commit_upload(upload.temp_path, upload.content_hash)
+                stored[upload.content_hash] = document_id
+                items.append(BulkUploadItem(
+                    filename=upload.filename,
+                    status="queued",
+                    document_id=document_id,
+                    content_hash=upload.content_hash
+                ))
+                continue
+            self.pdf_service.discard_upload(upload.temp_path)
+            items.append(BulkUploadItem(
+                filename=upload.filename,
+                status="duplicate",
+                document_id=stored.get(upload.content_hash),
+                content_hash=upload.content_hash,
+                detail="Document already exists"
+            ))
+        return items
+
+    async def get_by_hash(
+        self, db: AsyncSession, content_hash: str
+    ) -> Optional[Document]:
         """Get document by content hash."""
-        return db.query(Document).filter(Document.content_hash == content_hash).first()
+        result = await db.execute(
+            select(Document).where(Document.content_hash == content_hash)
+        )
+        return result.scalars().first()
 
-    def get_documents(
-        self, db: Session, skip: int = 0, limit: int = 10
-    ) -> List[Document]:
-        """Get all documents with pagination."""
-        return db.query(Document).offset(skip).limit(limit).all()
+    async def list_documents(
+        self,
+        db: AsyncSession,
+        limit: int = 10,
+        after: Optional[Tuple[datetime, int]] = None,
+        status: Optional[str] = None,
+        filename_prefix: Optional[str] = None
+    ) -> Tuple[List[Mapping[str, Any]], bool]:
+        """One page of document summaries, newest first, and whether more follow.
 
-    def get_document(self, db: Session, document_id: int) -> Optional[Document]:
+        Pages continue after the (uploaded_at, id) key of the previous page's
+        last row, so deep pages cost the same as the first one. Only the
+        summary columns are selected.
+        """
+        query = (
+            select(*(getattr(Document, name) for name in SUMMARY_COLUMNS))
+            .where(*self._listing_filters(status, filename_prefix))
+            .order_by(Document.uploaded_at.desc(), Document.id.desc())
+            .limit(limit + 1)
+        )
+        if after is not None:
+            query = query.where(tuple_(Document.uploaded_at, Document.id) < after)
+        rows = list((await db.execute(query)).mappings())
+        return rows[:limit], len(rows) > limit
+
+    async def estimate_count(
+        self,
+        db: AsyncSession,
+        status: Optional[str] = None,
+        filename_prefix: Optional[str] = None
+    ) -> Optional[int]:
+        """Approximate number of documents matching the listing filters.
+
+        PostgreSQL answers from planner statistics via EXPLAIN. Elsewhere only
+        the unfiltered total is estimated, from the highest id; filtered
+        estimates return None rather than scanning.
+        """
+        filters = self._listing_filters(status, filename_prefix)
+        dialect = db.get_bind().dialect
+        if dialect.name == "postgresql":
+            query = select(Document.id).where(*filters).compile(
+                dialect=dialect, compile_kwargs={"literal_binds": True}
+            )
+            connection = await db.connection()
+            plan = (
+                await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {query}")
+            ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+        if filters:
+            return None
+        return (await db.execute(select(func.max(Document.id)))).scalar() or 0
+
+    def _listing_filters(
+        self, status: Optional[str], filename_prefix: Optional[str]
+    ) -> list:
+        filters = []
+        if status is not None:
+            filters.append(Document.status == status)
+        if filename_prefix:
+            filters.append(Document.filename.startswith(filename_prefix, autoescape=True))
+        return filters
+
+    async def get_document(
+        self, db: AsyncSession, document_id: int
+    ) -> Optional[Document]:
         """Get specific document by ID."""
-        return db.query(Document).filter(Document.id == document_id).first()
+        return await db.get(Document, document_id)
+
+    async def get_next_version(
+        self, db: AsyncSession, document_id: int
+    ) -> Optional[Document]:
+        """The version uploaded to replace a document, if any."""
+        result = await db.execute(
+            select(Document).where(Document.parent_id == document_id)
+        )
+        return result.scalars().first()
+
+    async def get_versions(
+        self, db: AsyncSession, document: Document
+    ) -> List[Document]:
+        """Every version in a document's lineage, oldest first."""
+        lineage_id = document.lineage_id or document.id
+        result = await db.execute(
+            select(Document)
+            .where(or_(Document.id == lineage_id, Document.lineage_id == lineage_id))
+            .order_by(Document.version, Document.id)
+        )
+        return list(result.scalars())
 
-    def delete_document(self, db: Session, document_id: int) -> bool:
+    async def update_status(
+        self, db: AsyncSession, document_id: int, status: str, **fields
+    ) -> Optional[Document]:
+        """Update a document's processing status and any extra columns."""
+        document = await self.get_document(db, document_id)
+        if not document:
+            return None
+        document.status = status
+        for name, value in fields.items():
+            setattr(document, name, value)
+        await db.commit()
+        return document
+
+    async def delete_document(self, db: AsyncSession, document_id: int) -> bool:
         """Delete a document and its associated files."""
-        document = self.get_document(db, document_id)
+        document = await self.get_document(db, document_id)
         if not document:
             raise HTTPException(404, "Document not found")
 
+        # Drop the document's vectors, BM25 index and cached answers
+        await run_io(get_vector_index().delete_document, document_id)
+        await run_io(get_lexical_index().delete_document, document_id)
+        answer_cache.invalidate(document_id)
+
         # Delete files
         if os.path.exists(document.file_path):
             os.remove(document.file_path)
-        if os.path.exists(document.extracted_text_path):
-            os.remove(document.extracted_text_path)
+        if document.extracted_text_path:
+            get_text_store().discard(document.extracted_text_path)
+            for path in (
+                document.extracted_text_path,
+                chunks_path(document.extracted_text_path)
+            ):
+                if os.path.exists(path):
+                    os.remove(path)
 
-        # Delete from database
-        db.delete(document)
-        db.commit()
+        # Delete from database; SQLite does not enforce the foreign key, so
+        # the next version's link is cleared here rather than by ON DELETE
+        await db.execute(
+            update(Document)
+            .where(Document.parent_id == document_id)
+            .values(parent_id=None)
+        )
+        await db.delete(document)
+        await db.commit()
         return True
\ No newline at end of file
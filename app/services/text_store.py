@@ -0,0 +1,243 @@
+# app/services/text_store.py
+"""Page-indexed extracted text, read through mmap.
+
+Each document's text is one file under EXTRACTED_TEXT_DIR holding a JSON
+header followed by flat little-endian arrays and the page bodies:
+
+    byte_offsets  uint64[pages + 1]  stored bytes of page p are [offsets[p], offsets[p + 1])
+    char_offsets  uint64[pages + 1]  page p starts at character char_offsets[p] of the
+                                     document text, pages joined by PAGE_SEPARATOR
+    pages         UTF-8 page bodies, each zlib-compressed when compression is "zlib"
+
+Readers of a document share one read-only mapping, so resident memory does
+not grow with the number of readers; uncompressed pages are returned as
+slices of the mapping without copying. Plain ``.txt`` files written before
+this format are mapped the same way, with the page index built on open.
+"""
+from array import array
+from bisect import bisect_right
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+from app.core.config import get_settings
+from app.core.metrics import CACHE_ENTRIES
+from app.utils.cache import LRUCache
+from app.utils.text_processing import (
+    PAGE_SEPARATOR,
+    Chunk,
+    PageChunker,
+    chunks_path,
+    save_chunks
+)
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+
+settings = get_settings()
+
+MAGIC = b"PTXT\x00\x00\x00\x01"
+COMPRESSIONS = ("none", "zlib")
+
+
+def _offsets(values: Sequence[int] = ()) -> array:
+    return array("Q", values)
+
+
+def write_pages(path: str, pages: Sequence[str], compression: str = "none"):
+    """Write a document's page texts, replacing the file atomically."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown extracted text compression: {compression}")
+
+    bodies = [page.encode("utf-8") for page in pages]
+    if compression == "zlib":
+        bodies = [zlib.compress(body) for body in bodies]
+    byte_offsets, char_offsets = _offsets([0]), _offsets([0])
+    for page, body in zip(pages, bodies):
+        byte_offsets.append(byte_offsets[-1] + len(body))
+        char_offsets.append(char_offsets[-1] + len(page) + len(PAGE_SEPARATOR))
+
+    header = json.dumps({"pages": len(pages), "compression": compression}).encode("utf-8")
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for values in (byte_offsets, char_offsets):
+            if sys.byteorder == "big":
+                values.byteswap()
+            values.tofile(f)
+        for body in bodies:
+            f.write(body)
+    os.replace(temp_path, path)
+
+
+class PageText:
+    """Read-only mapping of one document's extracted text.
+
+    Page numbers are 1-based, like ``Chunk.page``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            # Python keeps its own descriptor for the mapping
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) \
+                if stat.st_size else b""
+
+        if self._map[:len(MAGIC)] == MAGIC:
+            self._read_index()
+        else:
+            self._index_plain_text()
+
+    @property
+    def page_count(self) -> int:
+        return len(self.byte_offsets) - 1
+
+    def raw_page(self, number: int) -> Union[memoryview, bytes]:
+        """UTF-8 bytes of a page; a view into the mapping unless compressed."""
+        if not 1 <= number <= self.page_count:
+            raise IndexError(f"Page {number} out of range 1..{self.page_count}")
+        start = self.body_base + self.byte_offsets[number - 1]
+        end = self.body_base + self.byte_offsets[number] - self._gap
+        view = memoryview(self._map)[start:end]
+        if self.compression == "zlib":
+            return zlib.decompress(view)
+        return view
+
+    def page(self, number: int) -> str:
+        return str(self.raw_page(number), "utf-8")
+
+    def pages(self) -> Iterator[str]:
+        for number in range(1, self.page_count + 1):
+            yield self.page(number)
+
+    def text(self) -> str:
+        """The whole document text, pages joined by PAGE_SEPARATOR."""
+        return PAGE_SEPARATOR.join(self.pages())
+
+    def span(self, start: int, end: int) -> str:
+        """Text of a character range of the document text, e.g. a chunk's source.
+
+        The range must lie within one page, as chunk spans do.
+        """
+        number = bisect_right(self.char_offsets, start)
+        if not 1 <= number <= self.page_count:
+            raise IndexError(f"Offset {start} is outside the document text")
+        page_start = self.char_offsets[number - 1]
+        local_start, local_end = start - page_start, end - page_start
+        raw = self.raw_page(number)
+        if self._is_ascii(number, raw):
+            # One byte per character: slice the bytes before decoding
+            return str(raw[local_start:local_end], "utf-8")
+        return str(raw, "utf-8")[local_start:local_end]
+
+    def _is_ascii(self, number: int, raw) -> bool:
+        characters = self.char_offsets[number] - self.char_offsets[number - 1]
+        return len(raw) == characters - len(PAGE_SEPARATOR)
+
+    def _read_index(self):
+        position = len(MAGIC)
+        (header_size,) = struct.unpack_from("<Q", self._map, position)
+        position += 8
+        header = json.loads(self._map[position:position + header_size])
+        position += header_size
+        self.compression = header["compression"]
+
+        arrays = []
+        for _ in range(2):
+            values = _offsets()
+            size = (header["pages"] + 1) * values.itemsize
+            values.frombytes(self._map[position:position + size])
+            if sys.byteorder == "big":
+                values.byteswap()
+            arrays.append(values)
+            position += size
+        self.byte_offsets, self.char_offsets = arrays
+        self.body_base = position
+        self._gap = 0
+
+    def _index_plain_text(self):
+        """Page index of a plain text file with PAGE_SEPARATOR between pages."""
+        self.compression = "none"
+        self.body_base = 0
+        separator = PAGE_SEPARATOR.encode("utf-8")
+        # Each page is followed by a separator, except the last
+        self._gap = len(separator)
+        self.byte_offsets, self.char_offsets = _offsets([0]), _offsets([0])
+        position = self._map.find(separator)
+        while True:
+            end = len(self._map) if position == -1 else position
+            start = self.byte_offsets[-1]
+            self.byte_offsets.append(end + len(separator))
+            characters = len(str(self._map[start:end], "utf-8"))
+            self.char_offsets.append(self.char_offsets[-1] + characters + len(PAGE_SEPARATOR))
+            if position == -1:
+                break
+            position = self._map.find(separator, position + len(separator))
+
+
+class TextStore:
+    """Open extracted-text files, each mapped once and shared by every reader."""
+
+    def __init__(self, max_open: int = settings.EXTRACTED_TEXT_MAX_OPEN):
+        # Evicted mappings close once the last reader drops them
+        self._cache = LRUCache(max_entries=max_open)
+        self._lock = threading.Lock()
+
+    def open(self, path: str) -> PageText:
+        """The mapping of a text file, reopened if the file was replaced."""
+        text = self._cache.get(path)
+        if text is not None and text.identity == self._identity(path):
+            return text
+        with self._lock:
+            text = self._cache.get(path)
+            if text is None or text.identity != self._identity(path):
+                text = PageText(path)
+                self._cache.put(path, text)
+        return text
+
+    def write(self, path: str, pages: Sequence[str]) -> str:
+        write_pages(path, pages, settings.EXTRACTED_TEXT_COMPRESSION)
+        self._cache.pop(path)
+        return path
+
+    def discard(self, path: str):
+        self._cache.pop(path)
+
+    def clear(self):
+        self._cache.clear()
+
+    def _identity(self, path: str) -> Tuple[int, int, int]:
+        stat = os.stat(path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def split_stored_text(text_path: str, chunker: PageChunker) -> List[Chunk]:
+    """Chunk a stored text file and write its chunk sidecar.
+
+    A module-level function of picklable arguments, so it can run in the
+    CPU process pool.
+    """
+    chunks = chunker.split_pages(get_text_store().open(text_path).pages())
+    save_chunks(chunks_path(text_path), chunks)
+    return chunks
+
+
+_text_store: Optional[TextStore] = None
+_text_store_lock = threading.Lock()
+
+
+def get_text_store() -> TextStore:
+    """Return the process-wide text store, creating it on first use."""
+    global _text_store
+    with _text_store_lock:
+        if _text_store is None:
+            _text_store = TextStore()
+            CACHE_ENTRIES.labels("text_store").set_function(
+                lambda: len(_text_store._cache)
+            )
+    return _text_store
@@ -0,0 +1,440 @@
+# app/services/vector_index.py
+"""Vector index layouts.
+
+``per_document`` keeps one persisted Chroma directory per document under
+VECTORSTORE_DIR/{document_id}. ``shared`` keeps every chunk in a single
+collection under VECTORSTORE_DIR/_shared with the document id as metadata,
+so one retrieval can span several documents.
+"""
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import fcntl
+import os
+import shutil
+import sys
+import threading
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+from chromadb.telemetry.product import ProductTelemetryClient, ProductTelemetryEvent
+from overrides import override
+from langchain.schema import Document as LCDocument
+from langchain.schema.embeddings import Embeddings
+from langchain.vectorstores import Chroma
+from app.core.config import get_settings
+from app.core.metrics import stage
+from app.models.document import Document
+from app.services.retriever_cache import (
+    RetrieverEntry,
+    directory_size,
+    retriever_cache
+)
+
+settings = get_settings()
+
+SHARED_COLLECTION = "documents"
+COLLECTION_METADATA = {"hnsw:space": "cosine"}
+
+
+class NoopTelemetry(ProductTelemetryClient):
+    """Drop Chroma product telemetry events.
+
+    Chroma's default client batches events in an unlocked dict even when
+    telemetry is disabled, which raises KeyError under concurrent queries.
+    """
+
+    @override
+    def capture(self, event: ProductTelemetryEvent) -> None:
+        pass
+
+
+TELEMETRY_SETTINGS = {
+    "anonymized_telemetry": False,
+    "chroma_product_telemetry_impl": f"{__name__}.NoopTelemetry",
+}
+
+
+class _PrecomputedEmbeddings(Embeddings):
+    """Serve already computed chunk vectors to Chroma during persistence."""
+
+    def __init__(
+        self,
+        texts: List[str],
+        vectors: List[List[float]],
+        query_embeddings: Embeddings
+    ):
+        self.vectors = dict(zip(texts, vectors))
+        self.query_embeddings = query_embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.query_embeddings.embed_query(text)
+
+
+def chunk_metadatas(
+    document_id: int,
+    count: int,
+    metadatas: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    metadatas = metadatas or [{} for _ in range(count)]
+    return [
+        {**metadata, "document_id": document_id, "chunk": number}
+        for number, metadata in enumerate(metadatas)
+    ]
+
+
+def search_by_vector(
+    vectorstore: Chroma,
+    embedding: List[float],
+    k: int,
+    where: Optional[Dict[str, Any]] = None
+) -> List[Tuple[LCDocument, float]]:
+    """Similarity search returning relevance scores in [0, 1], higher is better.
+
+    Chroma's by-vector search returns raw distances. Stores built before the
+    shared layout use squared L2 and newer ones use cosine distance; for
+    unit-length embeddings both map to cosine similarity.
+    """
+    results = vectorstore.similarity_search_by_vector_with_relevance_scores(
+        embedding, k=k, filter=where
+    )
+    metadata = vectorstore._collection.metadata or {}
+    if metadata.get("hnsw:space") == "cosine":
+        scores = [1.0 - distance for _, distance in results]
+    else:
+        scores = [1.0 - distance / 2 for _, distance in results]
+    return [
+        (document, min(max(score, 0.0), 1.0))
+        for (document, _), score in zip(results, scores)
+    ]
+
+
+def vectors_by_text(found: Dict[str, Any]) -> Dict[str, List[float]]:
+    """Map chunk text to vector in a collection ``get`` result."""
+    return {
+        text: list(vector)
+        for text, vector in zip(found["documents"], found["embeddings"])
+    }
+
+
+def chunk_ids(document_id: int, count: int) -> List[str]:
+    return [f"{document_id}:{number}" for number in range(count)]
+
+
+class PerDocumentIndex:
+    """One persisted Chroma directory per document, opened through the retriever cache."""
+
+    layout = "per_document"
+
+    def __init__(self, embeddings: Embeddings, root: str = settings.VECTORSTORE_DIR):
+        self.embeddings = embeddings
+        self.root = root
+
+    def contains(self, document: Document) -> bool:
+        return os.path.exists(self.persist_directory(document.id))
+
+    def add_document(
+        self,
+        document_id: int,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Write (or replace) the vectors of one document."""
+        persist_directory = self.persist_directory(document_id)
+        if os.path.exists(persist_directory):
+            shutil.rmtree(persist_directory)
+
+        vectorstore = Chroma.from_texts(
+            texts,
+            _PrecomputedEmbeddings(texts, vectors, self.embeddings),
+            metadatas=chunk_metadatas(document_id, len(texts), metadatas),
+            ids=chunk_ids(document_id, len(texts)),
+            persist_directory=persist_directory,
+            client_settings=self._client_settings(),
+            collection_metadata=COLLECTION_METADATA
+        )
+        vectorstore.persist()
+        retriever_cache.invalidate(document_id)
+
+    def get_vectors(self, document: Document) -> Dict[str, List[float]]:
+        """Stored vectors of one document, keyed by chunk text."""
+        if not self.contains(document):
+            return {}
+        found = self.open(document)._collection.get(include=["documents", "embeddings"])
+        return vectors_by_text(found)
+
+    def delete_document(self, document_id: int):
+        retriever_cache.invalidate(document_id)
+        persist_directory = self.persist_directory(document_id)
+        if os.path.exists(persist_directory):
+            shutil.rmtree(persist_directory)
+
+    def search(
+        self,
+        documents: Sequence[Document],
+        embedding: List[float],
+        k: int
+    ) -> List[Tuple[LCDocument, float]]:
+        """Top-k chunks over the given documents, merged by relevance score."""
+        results: List[Tuple[LCDocument, float]] = []
+        for document in documents:
+            results.extend(search_by_vector(self.open(document), embedding, k))
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results[:k]
+
+    def open(self, document: Document) -> Chroma:
+        """Return the document's open vectorstore, using the retriever cache."""
+        entry = retriever_cache.get(document.id, document.content_hash)
+        if entry:
+            return entry.vectorstore
+
+        persist_directory = self.persist_directory(document.id)
+        with stage("qa", "vector_store_open"):
+            vectorstore = Chroma(
+                persist_directory=persist_directory,
+                embedding_function=self.embeddings,
+                client_settings=self._client_settings()
+            )
+        retriever_cache.put(
+            document.id,
+            document.content_hash,
+            RetrieverEntry(vectorstore, directory_size(persist_directory))
+        )
+        return vectorstore
+
+    def persist_directory(self, document_id: int) -> str:
+        return os.path.join(self.root, str(document_id))
+
+    def _client_settings(self) -> ChromaSettings:
+        return ChromaSettings(is_persistent=True, **TELEMETRY_SETTINGS)
+
+
+class SharedIndex:
+    """All chunks in one collection, filtered by document id at query time.
+
+    Deleted vectors leave tombstones in the HNSW index; ``compact`` rebuilds
+    the collection into a new generation directory and switches CURRENT to
+    it, usually from another process than the servers using the index.
+
+    Writes hold a shared lock on the LOCK file and compaction an exclusive
+    one, so no write lands in a generation while it is being copied. Every
+    call checks CURRENT and reopens the collection once it has changed. An
+    old generation is removed by the compaction after the one that replaced
+    it, when no reader can still be using it.
+    """
+
+    layout = "shared"
+
+    def __init__(self, embeddings: Embeddings, root: str = settings.VECTORSTORE_DIR):
+        self.embeddings = embeddings
+        self.root = os.path.join(root, "_shared")
+        self._lock = threading.RLock()
+        self._known: set = set()
+        self._generation: Optional[int] = None
+        # Identity of the CURRENT file the open generation was read from
+        self._current_key: Optional[Tuple[int, int]] = None
+        os.makedirs(self.root, exist_ok=True)
+        self._refresh()
+
+    def contains(self, document: Document) -> bool:
+        self._refresh()
+        if document.id in self._known:
+            return True
+        found = self._collection.get(
+            where={"document_id": document.id}, limit=1, include=[]
+        )
+        if found["ids"]:
+            self._known.add(document.id)
+            return True
+        return False
+
+    def add_document(
+        self,
+        document_id: int,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Replace the vectors of one document in the shared collection."""
+        ids = chunk_ids(document_id, len(texts))
+        metadatas = chunk_metadatas(document_id, len(texts), metadatas)
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._refresh()
+            self._collection.delete(where={"document_id": document_id})
+            for start in range(0, len(texts), settings.VECTOR_INDEX_WRITE_BATCH):
+                stop = start + settings.VECTOR_INDEX_WRITE_BATCH
+                self._collection.add(
+                    ids=ids[start:stop],
+                    embeddings=vectors[start:stop],
+                    documents=texts[start:stop],
+                    metadatas=metadatas[start:stop]
+                )
+            self._known.add(document_id)
+
+    def get_vectors(self, document: Document) -> Dict[str, List[float]]:
+        """Stored vectors of one document, keyed by chunk text."""
+        self._refresh()
+        found = self._collection.get(
+            where={"document_id": document.id},
+            include=["documents", "embeddings"]
+        )
+        return vectors_by_text(found)
+
+    def delete_document(self, document_id: int):
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._refresh()
+            self._collection.delete(where={"document_id": document_id})
+            self._known.discard(document_id)
+
+    def search(
+        self,
+        documents: Sequence[Document],
+        embedding: List[float],
+        k: int
+    ) -> List[Tuple[LCDocument, float]]:
+        """Top-k chunks over the given documents in a single query."""
+        self._refresh()
+        ids = [document.id for document in documents]
+        where = {"document_id": ids[0]} if len(ids) == 1 else {"document_id": {"$in": ids}}
+        return search_by_vector(self._vectorstore, embedding, k, where)
+
+    def compact(self) -> Dict[str, int]:
+        """Rebuild the collection without tombstones and switch to it."""
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            # Another compaction may have switched generations meanwhile
+            self._refresh()
+            old_generation = self._generation
+            new_generation = old_generation + 1
+            new_directory = self._generation_directory(new_generation)
+            if os.path.exists(new_directory):
+                shutil.rmtree(new_directory)
+
+            client = self._client_for(new_directory)
+            collection = client.get_or_create_collection(
+                SHARED_COLLECTION, metadata=COLLECTION_METADATA
+            )
+            copied = 0
+            while True:
+                batch = self._collection.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=settings.VECTOR_INDEX_WRITE_BATCH,
+                    offset=copied
+                )
+                if not batch["ids"]:
+                    break
+                collection.add(
+                    ids=batch["ids"],
+                    embeddings=batch["embeddings"],
+                    documents=batch["documents"],
+                    metadatas=batch["metadatas"]
+                )
+                copied += len(batch["ids"])
+
+            self._write_current_generation(new_generation)
+            self._refresh()
+            # Servers may still be reading the old generation until their next
+            # call; the ones before it have been unused since the last compaction
+            removed = 0
+            for name in os.listdir(self.root):
+                if name.startswith("gen-") and int(name[4:]) < old_generation:
+                    shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                    removed += 1
+            return {"generation": new_generation, "vectors": copied, "removed": removed}
+
+    def _refresh(self):
+        """Reopen the collection if CURRENT names another generation."""
+        try:
+            stat = os.stat(os.path.join(self.root, "CURRENT"))
+            key: Optional[Tuple[int, int]] = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            key = None
+        if key == self._current_key and self._generation is not None:
+            return
+        with self._lock:
+            generation = self._current_generation()
+            if generation != self._generation:
+                self._open(generation)
+            self._current_key = key
+
+    @contextmanager
+    def _file_lock(self, operation: int) -> Iterator[None]:
+        """Hold the index's LOCK file, shared or exclusive, across processes."""
+        with open(os.path.join(self.root, "LOCK"), "a") as f:
+            fcntl.flock(f, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _open(self, generation: int):
+        # Other processes may have added or deleted documents in the meantime
+        self._known = set()
+        self._generation = generation
+        self._client = self._client_for(self._generation_directory(generation))
+        self._collection = self._client.get_or_create_collection(
+            SHARED_COLLECTION, metadata=COLLECTION_METADATA
+        )
+        self._vectorstore = Chroma(
+            client=self._client,
+            collection_name=SHARED_COLLECTION,
+            embedding_function=self.embeddings,
+            collection_metadata=COLLECTION_METADATA
+        )
+
+    def _client_for(self, directory: str):
+        return chromadb.PersistentClient(
+            path=directory,
+            settings=ChromaSettings(**TELEMETRY_SETTINGS)
+        )
+
+    def _generation_directory(self, generation: int) -> str:
+        return os.path.join(self.root, f"gen-{generation:06d}")
+
+    def _current_generation(self) -> int:
+        try:
+            with open(os.path.join(self.root, "CURRENT"), encoding="utf-8") as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return 0
+
+    def _write_current_generation(self, generation: int):
+        temp_path = os.path.join(self.root, "CURRENT.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(str(generation))
+        os.replace(temp_path, os.path.join(self.root, "CURRENT"))
+
+
+def create_vector_index(embeddings: Embeddings):
+    """Build the index selected by VECTOR_INDEX_LAYOUT."""
+    if settings.VECTOR_INDEX_LAYOUT == "per_document":
+        return PerDocumentIndex(embeddings)
+    if settings.VECTOR_INDEX_LAYOUT == "shared":
+        return SharedIndex(embeddings)
+    raise ValueError(f"Unknown vector index layout: {settings.VECTOR_INDEX_LAYOUT}")
+
+
+_vector_index = None
+_vector_index_lock = threading.Lock()
+
+
+def get_vector_index():
+    """Return the process-wide vector index, creating it on first use."""
+    global _vector_index
+    with _vector_index_lock:
+        if _vector_index is None:
+            from app.services.embeddings import create_embeddings
+            _vector_index = create_vector_index(create_embeddings())
+    return _vector_index
+
+
+if __name__ == "__main__":
+    # python -m app.services.vector_index compact
+    if sys.argv[1:] == ["compact"]:
+        index = get_vector_index()
+        if not isinstance(index, SharedIndex):
+            sys.exit("Compaction only applies to VECTOR_INDEX_LAYOUT=shared")
+        print(index.compact())
+    else:
+        sys.exit("usage: python -m app.services.vector_index compact")
@@ -0,0 +1,141 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import threading
+import time
+
+
+class LRUCache:
+    """Bounded LRU cache limited by entry count, total entry weight and age."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_weight: Optional[int] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+        ttl: Optional[float] = None
+    ):
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.on_evict = on_evict
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._weights: Dict[Hashable, int] = {}
+        self._expires: Dict[Hashable, float] = {}
+        self._lock = threading.RLock()
+        self.total_weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value and mark it as recently used."""
+        with self._lock:
+            if key not in self._entries or self._expire(key):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value without touching recency or counters."""
+        with self._lock:
+            if key not in self._entries or self._expire(key):
+                return None
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any, weight: int = 1):
+        """Insert a value, evicting least recently used entries as needed."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = value
+            self._weights[key] = weight
+            if self.ttl is not None:
+                self._expires[key] = time.monotonic() + self.ttl
+            self.total_weight += weight
+            self._evict()
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove a single entry without counting it as an eviction."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            return self._remove(key)
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key matches the predicate."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._entries)
+
+    def values(self) -> List[Any]:
+        """Unexpired values, dropping the expired ones on the way."""
+        with self._lock:
+            for key in list(self._expires):
+                self._expire(key)
+            return list(self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weights.clear()
+            self._expires.clear()
+            self.total_weight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "weight": self.total_weight,
+            "max_entries": self.max_entries,
+            "max_weight": self.max_weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _remove(self, key: Hashable) -> Any:
+        value = self._entries.pop(key)
+        self.total_weight -= self._weights.pop(key)
+        self._expires.pop(key, None)
+        return value
+
+    def _expire(self, key: Hashable) -> bool:
+        """Drop the entry if its TTL has passed."""
+        expires_at = self._expires.get(key)
+        if expires_at is None or expires_at > time.monotonic():
+            return False
+        value = self._remove(key)
+        self.expirations += 1
+        if self.on_evict:
+            self.on_evict(key, value)
+        return True
+
+    def _evict(self):
+        # Never evict the entry that was just inserted
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.max_weight is not None and self.total_weight > self.max_weight)
+        ):
+            key, _ = next(iter(self._entries.items()))
+            value = self._remove(key)
+            self.evictions += 1
+            if self.on_evict:
+                self.on_evict(key, value)
@@ -0,0 +1,25 @@
+"""Opaque cursors for keyset pagination.
+
+A cursor is the sort key of the last row on a page, as URL-safe base64 JSON,
+so clients pass it back unchanged and never build one themselves.
+"""
+from datetime import datetime
+from typing import Tuple
+import base64
+import binascii
+import json
+
+
+def encode_cursor(uploaded_at: datetime, document_id: int) -> str:
+    payload = json.dumps([uploaded_at.isoformat(), document_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse a cursor from ``encode_cursor``; raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        uploaded_at, document_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(uploaded_at), int(document_id)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
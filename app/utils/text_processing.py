@@ -0,0 +1,158 @@
+"""Page- and block-aware chunking of extracted PDF text.
+
+Extracted text keeps the layout PyMuPDF reports: text blocks of a page are
+separated by a blank line and pages by PAGE_SEPARATOR. Chunks never cross a
+page, prefer to end on block boundaries and record their page number and
+character offsets into the extracted text.
+"""
+from typing import Any, Dict, Iterable, List, Tuple
+from app.core.config import get_settings
+import json
+import os
+
+settings = get_settings()
+
+# Separator placed between pages of the extracted text
+PAGE_SEPARATOR = "\f"
+# Separator placed between text blocks within a page
+BLOCK_SEPARATOR = "\n\n"
+
+
+def page_text(blocks: Iterable[tuple]) -> str:
+    """Join the text blocks of a PyMuPDF ``page.get_text("blocks")`` result."""
+    # Block tuples are (x0, y0, x1, y1, text, block_no, block_type); type 1 is an image
+    return BLOCK_SEPARATOR.join(
+        block[4].strip() for block in blocks
+        if block[6] == 0 and block[4].strip()
+    )
+
+
+class Chunk:
+    def __init__(self, text: str, page: int, start: int, end: int):
+        self.text = text
+        self.page = page  # 1-based page number
+        self.start = start  # offsets into the extracted text
+        self.end = end
+
+    def metadata(self) -> Dict[str, Any]:
+        return {"page": self.page, "start": self.start, "end": self.end}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"text": self.text, **self.metadata()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Chunk":
+        return cls(data["text"], data["page"], data["start"], data["end"])
+
+
+class PageChunker:
+    """Pack whole blocks into chunks of at most ``chunk_size`` characters.
+
+    Consecutive chunks of a page share trailing blocks up to ``chunk_overlap``
+    characters. Blocks longer than a chunk are split into windows that end
+    on whitespace and overlap by ``chunk_overlap`` characters.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = settings.CHUNK_SIZE,
+        chunk_overlap: int = settings.CHUNK_OVERLAP
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_text(self, text: str) -> List[Chunk]:
+        """Chunk extracted text, pages separated by PAGE_SEPARATOR."""
+        return self.split_pages(text.split(PAGE_SEPARATOR))
+
+    def split_pages(self, pages: Iterable[str]) -> List[Chunk]:
+        """Chunk the pages of a document; offsets are into the joined text."""
+        chunks: List[Chunk] = []
+        offset = 0
+        for number, page in enumerate(pages, start=1):
+            chunks.extend(self.split_page(page, number, offset))
+            offset += len(page) + len(PAGE_SEPARATOR)
+        return chunks
+
+    def split_page(self, text: str, page: int, offset: int = 0) -> List[Chunk]:
+        """Chunk one page whose first character is at ``offset`` in the document."""
+        spans = self._block_spans(text)
+        chunks: List[Chunk] = []
+        first = 0
+        while first < len(spans):
+            start = spans[first][0]
+            last = first
+            while last + 1 < len(spans) and spans[last + 1][1] - start <= self.chunk_size:
+                last += 1
+            end = spans[last][1]
+            chunks.append(Chunk(text[start:end], page, offset + start, offset + end))
+            if last + 1 == len(spans):
+                break
+
+            # Start the next chunk at the earliest block inside the overlap
+            following = last + 1
+            while following - 1 > first and end - spans[following - 1][0] <= self.chunk_overlap:
+                following -= 1
+            first = following
+        return chunks
+
+    def _block_spans(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) of each block, long blocks replaced by windows."""
+        spans = []
+        position = 0
+        for block in text.split(BLOCK_SEPARATOR):
+            stripped = block.strip()
+            if stripped:
+                start = position + block.index(stripped[0])
+                end = start + len(stripped)
+                if end - start <= self.chunk_size:
+                    spans.append((start, end))
+                else:
+                    spans.extend(self._windows(text, start, end))
+            position += len(block) + len(BLOCK_SEPARATOR)
+        return spans
+
+    def _windows(self, text: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """Overlapping windows over text[start:end] that end on whitespace."""
+        windows = []
+        window_start = start
+        while True:
+            window_end = min(window_start + self.chunk_size, end)
+            if window_end < end:
+                # Back off to a word boundary in the second half of the window
+                cut = max(
+                    text.rfind(" ", window_start + self.chunk_size // 2, window_end),
+                    text.rfind("\n", window_start + self.chunk_size // 2, window_end)
+                )
+                if cut > window_start:
+                    window_end = cut
+            windows.append((window_start, window_end))
+            if window_end == end:
+                return windows
+
+            next_start = max(window_end - self.chunk_overlap, window_start + 1)
+            # Begin the next window at the start of a word
+            boundary = text.find(" ", next_start, window_end)
+            window_start = boundary + 1 if boundary != -1 else next_start
+
+
+def chunks_path(text_path: str) -> str:
+    """Sidecar holding the chunks of an extracted text file."""
+    return os.path.splitext(text_path)[0] + ".chunks.jsonl"
+
+
+def save_chunks(path: str, chunks: List[Chunk]):
+    """Write chunks as JSON lines, replacing the file atomically."""
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk.to_dict(), ensure_ascii=False))
+            f.write("\n")
+    os.replace(temp_path, path)
+
+
+def load_chunks(path: str) -> List[Chunk]:
+    with open(path, encoding="utf-8") as f:
+        return [Chunk.from_dict(json.loads(line)) for line in f if line.strip()]
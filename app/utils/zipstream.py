@@ -0,0 +1,275 @@
+"""Read ZIP archives from a stream, one entry at a time.
+
+``zipfile`` needs the central directory at the end of the archive, so the
+whole archive would have to be on disk first. This reader follows the
+local file headers instead, decompressing each entry as its bytes arrive.
+Stored and deflated entries are supported, including entries whose sizes
+follow the data in a data descriptor (as streaming zip tools write them)
+and ZIP64 sizes. A stored entry with a data descriptor has no end marker
+of its own; it ends at the first descriptor signature whose CRC and size
+match the data before it. Encrypted entries and other compression methods are
+reported with ``UnsupportedEntry`` and skipped when their size is known.
+"""
+from typing import AsyncIterator, Optional
+import struct
+import zlib
+
+LOCAL_HEADER = b"PK\x03\x04"
+CENTRAL_HEADER = b"PK\x01\x02"
+END_OF_CENTRAL_DIRECTORY = b"PK\x05\x06"
+DATA_DESCRIPTOR = b"PK\x07\x08"
+
+# signature, version, flags, method, time, date, crc, sizes, name and extra lengths
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+
+_ENCRYPTED = 0x1
+_HAS_DATA_DESCRIPTOR = 0x8
+_UTF8_NAME = 0x800
+_STORED, _DEFLATED = 0, 8
+_ZIP64_EXTRA = 0x0001
+_ZIP64_MARKER = 0xFFFFFFFF
+
+READ_SIZE = 64 * 1024
+
+
+class ZipStreamError(ValueError):
+    """The stream is not a readable ZIP archive."""
+
+
+class UnsupportedEntry(ValueError):
+    """An entry that cannot be decompressed; the reader has skipped it."""
+
+
+class _Reader:
+    """Buffered reads from an async iterator of byte chunks."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._buffer = bytearray()
+        self._eof = False
+
+    async def _fill(self, size: int):
+        while len(self._buffer) < size and not self._eof:
+            try:
+                self._buffer += await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._eof = True
+
+    async def read_exactly(self, size: int) -> bytes:
+        await self._fill(size)
+        if len(self._buffer) < size:
+            raise ZipStreamError("The archive is truncated")
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    async def read_some(self, limit: int = READ_SIZE) -> bytes:
+        """Up to ``limit`` buffered or newly arrived bytes; empty at the end."""
+        await self._fill(1)
+        data = bytes(self._buffer[:limit])
+        del self._buffer[:limit]
+        return data
+
+    async def peek(self, size: int) -> bytes:
+        await self._fill(size)
+        return bytes(self._buffer[:size])
+
+    def unread(self, data: bytes):
+        self._buffer[:0] = data
+
+
+class ZipEntry:
+    """One file of the archive; read ``chunks()`` or ``skip()`` it before the next."""
+
+    def __init__(
+        self,
+        reader: _Reader,
+        name: str,
+        flags: int,
+        method: int,
+        crc: int,
+        compressed_size: Optional[int],
+        zip64: bool
+    ):
+        self.name = name
+        self.method = method
+        self._reader = reader
+        self._flags = flags
+        self._crc = crc
+        # None when the sizes follow the data
+        self._compressed_size = compressed_size
+        self._zip64 = zip64
+        # Set once a stored entry's data descriptor has been read with it
+        self._descriptor_crc: Optional[int] = None
+        self._stream = self._read()
+
+    @property
+    def is_dir(self) -> bool:
+        return self.name.endswith("/")
+
+    def chunks(self) -> AsyncIterator[bytes]:
+        """The decompressed content; resumes where an earlier read stopped."""
+        return self._stream
+
+    async def skip(self):
+        """Consume whatever of the entry has not been read."""
+        try:
+            async for _ in self._stream:
+                pass
+        except UnsupportedEntry:
+            # Its data has been discarded already
+            pass
+
+    async def _read(self) -> AsyncIterator[bytes]:
+        supported = self.method in (_STORED, _DEFLATED) and not self._flags & _ENCRYPTED
+        if not supported:
+            if self._compressed_size is None:
+                raise ZipStreamError(f"Cannot skip unsupported entry {self.name}")
+            await self._discard(self._compressed_size)
+            raise UnsupportedEntry(
+                f"Entry {self.name} is encrypted or uses compression method {self.method}"
+            )
+
+        if self.method == _DEFLATED:
+            data_stream = self._inflate()
+        elif self._compressed_size is None:
+            data_stream = self._read_until_descriptor()
+        else:
+            data_stream = self._read_stored(self._compressed_size)
+
+        crc = 0
+        async for data in data_stream:
+            crc = zlib.crc32(data, crc)
+            yield data
+
+        expected = self._crc
+        if self._descriptor_crc is not None:
+            expected = self._descriptor_crc
+        elif self._flags & _HAS_DATA_DESCRIPTOR:
+            expected = await self._read_data_descriptor()
+        if crc != expected:
+            raise ZipStreamError(f"Entry {self.name} failed its CRC check")
+
+    async def _read_stored(self, size: int) -> AsyncIterator[bytes]:
+        while size:
+            data = await self._reader.read_some(min(size, READ_SIZE))
+            if not data:
+                raise ZipStreamError("The archive is truncated")
+            size -= len(data)
+            yield data
+
+    async def _inflate(self) -> AsyncIterator[bytes]:
+        # Deflate streams mark their own end, so the size is not needed
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        while not decompressor.eof:
+            data = await self._reader.read_some()
+            if not data:
+                raise ZipStreamError("The archive is truncated")
+            try:
+                output = decompressor.decompress(data)
+            except zlib.error as e:
+                raise ZipStreamError(f"Entry {self.name} is corrupt: {e}") from e
+            if decompressor.unused_data:
+                self._reader.unread(decompressor.unused_data)
+            if output:
+                yield output
+
+    async def _read_until_descriptor(self) -> AsyncIterator[bytes]:
+        """Stored data up to its data descriptor, which is consumed with it.
+
+        The signature can occur inside the data, so a candidate only ends
+        the entry when the CRC and size it records match the data before it.
+        Bytes that could still start a descriptor are held back.
+        """
+        size_format = "<Q" if self._zip64 else "<I"
+        descriptor_size = 8 + struct.calcsize(size_format) * 2
+        buffer = bytearray()
+        emitted, crc = 0, 0
+        while True:
+            data = await self._reader.read_some()
+            if not data:
+                raise ZipStreamError("The archive is truncated")
+            buffer += data
+
+            position = buffer.find(DATA_DESCRIPTOR)
+            while position != -1 and position + descriptor_size <= len(buffer):
+                (recorded_crc,) = struct.unpack_from("<I", buffer, position + 4)
+                (recorded_size,) = struct.unpack_from(size_format, buffer, position + 8)
+                if (recorded_size == emitted + position
+                        and recorded_crc == zlib.crc32(buffer[:position], crc)):
+                    if position:
+                        yield bytes(buffer[:position])
+                    self._reader.unread(bytes(buffer[position + descriptor_size:]))
+                    self._descriptor_crc = recorded_crc
+                    return
+                position = buffer.find(DATA_DESCRIPTOR, position + 1)
+
+            # Up to an unchecked candidate, or all but a descriptor's length
+            keep = position if position != -1 else max(len(buffer) - descriptor_size + 1, 0)
+            if keep:
+                chunk = bytes(buffer[:keep])
+                del buffer[:keep]
+                emitted += len(chunk)
+                crc = zlib.crc32(chunk, crc)
+                yield chunk
+
+    async def _read_data_descriptor(self) -> int:
+        if await self._reader.peek(4) == DATA_DESCRIPTOR:
+            await self._reader.read_exactly(4)
+        (crc,) = struct.unpack("<I", await self._reader.read_exactly(4))
+        await self._reader.read_exactly(16 if self._zip64 else 8)
+        return crc
+
+    async def _discard(self, size: int):
+        while size:
+            data = await self._reader.read_some(min(size, READ_SIZE))
+            if not data:
+                raise ZipStreamError("The archive is truncated")
+            size -= len(data)
+
+
+async def read_zip(chunks: AsyncIterator[bytes]) -> AsyncIterator[ZipEntry]:
+    """Yield the entries of a ZIP archive arriving as ``chunks``.
+
+    Each entry must be read or skipped before the next is requested; an
+    entry left partly read is skipped automatically.
+    """
+    reader = _Reader(chunks)
+    entry: Optional[ZipEntry] = None
+    while True:
+        if entry is not None:
+            await entry.skip()
+
+        signature = await reader.peek(4)
+        if signature in (CENTRAL_HEADER, END_OF_CENTRAL_DIRECTORY):
+            return
+        if signature != LOCAL_HEADER:
+            raise ZipStreamError(
+                "Not a ZIP archive" if entry is None else "Unexpected data in the archive"
+            )
+
+        (_, _, flags, method, _, _, crc, compressed_size, uncompressed_size,
+         name_length, extra_length) = _LOCAL_HEADER.unpack(
+            await reader.read_exactly(_LOCAL_HEADER.size)
+        )
+        raw_name = await reader.read_exactly(name_length)
+        extra = await reader.read_exactly(extra_length)
+        name = raw_name.decode("utf-8" if flags & _UTF8_NAME else "cp437")
+
+        zip64 = False
+        position = 0
+        while position + 4 <= len(extra):
+            field, size = struct.unpack_from("<HH", extra, position)
+            if field == _ZIP64_EXTRA:
+                zip64 = True
+                # Only the sizes marked in the header are present, in this order
+                offset = position + 4
+                if uncompressed_size == _ZIP64_MARKER:
+                    offset += 8
+                if compressed_size == _ZIP64_MARKER and offset + 8 <= position + 4 + size:
+                    (compressed_size,) = struct.unpack_from("<Q", extra, offset)
+            position += 4 + size
+
+        known_size = None if flags & _HAS_DATA_DESCRIPTOR else compressed_size
+        entry = ZipEntry(reader, name, flags, method, crc, known_size, zip64)
+        yield entry
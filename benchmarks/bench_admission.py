@@ -0,0 +1,180 @@
+"""Interactive latency while bulk ingestion saturates the executors.
+
+Runs the app under uvicorn in-process against a temporary SQLite database,
+with small executor pools (--cpu-workers, --io-workers). One document is
+ingested up front; then --readers clients read random pages of it, first
+with the server idle and then while a burst of --documents uploads of
+--pages pages each is ingested. Uploads beyond INGESTION_MAX_PENDING
+(--max-pending) are refused with 503 and Retry-After.
+
+Reports page read latency idle and under load, the uploads admitted and
+refused, and the mean executor wait by pool and priority from /metrics:
+interactive reads should wait for at most one running task, not for the
+ingestion backlog.
+
+Usage: python -m benchmarks.bench_admission [--documents 24] [--pages 60] [--readers 8]
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import socket
+import statistics
+import time
+
+from benchmarks.fakes import configure_environment
+
+ROOT = configure_environment(
+    "bench_admission_", EMBEDDING_CACHE_ENABLED="false", STARTUP_WARMUP="false"
+)
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from app.core.config import get_settings  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.fakes import create_schema, install_fakes  # noqa: E402
+from benchmarks.synthetic import make_pdf  # noqa: E402
+
+WAIT_SUM = re.compile(
+    r'pdfqa_executor_wait_seconds_(sum|count)\{pool="(\w+)",priority="(\w+)"\} (\S+)'
+)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def upload(client: httpx.AsyncClient, path: str) -> httpx.Response:
+    with open(path, "rb") as f:
+        return await client.post(
+            "/api/v1/documents/upload",
+            files={"file": (os.path.basename(path), f.read(), "application/pdf")}
+        )
+
+
+async def wait_ready(client: httpx.AsyncClient, document_ids):
+    for document_id in document_ids:
+        while True:
+            status = (await client.get(f"/api/v1/documents/{document_id}/status")).json()
+            if status["status"] in ("ready", "failed"):
+                break
+            await asyncio.sleep(0.05)
+
+
+async def read_pages(client, document_id: int, pages: int, stop: asyncio.Event, seed: int):
+    """Page read latencies in milliseconds until ``stop`` is set."""
+    rng = random.Random(seed)
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get(
+            f"/api/v1/documents/{document_id}/pages/{rng.randint(1, pages)}"
+        )
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def measure(client, document_id: int, pages: int, readers: int, during):
+    """Run the readers for the duration of ``await during()``."""
+    stop = asyncio.Event()
+    tasks = [
+        asyncio.create_task(read_pages(client, document_id, pages, stop, seed))
+        for seed in range(readers)
+    ]
+    result = await during()
+    stop.set()
+    latencies = [value for task in tasks for value in await task]
+    return latencies, result
+
+
+def mean_waits(metrics: str):
+    totals = {}
+    for kind, pool, level, value in WAIT_SUM.findall(metrics):
+        totals.setdefault((pool, level), {})[kind] = float(value)
+    return {
+        key: (value["sum"] / value["count"] * 1000, int(value["count"]))
+        for key, value in sorted(totals.items()) if value.get("count")
+    }
+
+
+async def run(args):
+    create_schema()
+    install_fakes()
+    # The pools are created on first use, after these are set
+    settings = get_settings()
+    settings.EXECUTOR_CPU_WORKERS = args.cpu_workers
+    settings.EXECUTOR_IO_WORKERS = args.io_workers
+    settings.INGESTION_MAX_PENDING = args.max_pending
+    paths = [
+        make_pdf(os.path.join(ROOT, f"{number}.pdf"), args.pages, seed=args.seed + number)
+        for number in range(args.documents + 1)
+    ]
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=None
+        ) as client:
+            document_id = (await upload(client, paths[0])).json()["id"]
+            await wait_ready(client, [document_id])
+
+            idle, _ = await measure(
+                client, document_id, args.pages, args.readers,
+                lambda: asyncio.sleep(args.idle_seconds)
+            )
+
+            async def flood():
+                started = time.perf_counter()
+                responses = await asyncio.gather(*[upload(client, path) for path in paths[1:]])
+                admitted = [r.json()["id"] for r in responses if r.status_code == 202]
+                refused = [r for r in responses if r.status_code == 503]
+                await wait_ready(client, admitted)
+                return time.perf_counter() - started, admitted, refused
+
+            loaded, (elapsed, admitted, refused) = await measure(
+                client, document_id, args.pages, args.readers, flood
+            )
+            metrics = (await client.get("/metrics")).text
+    finally:
+        server.should_exit = True
+        await serving
+
+    print(f"{args.documents} uploads of {args.pages} pages, cpu workers "
+          f"{args.cpu_workers}, io workers {args.io_workers}, {args.readers} page readers")
+    print(f"  admitted {len(admitted)}, refused {len(refused)} with 503 "
+          f"(Retry-After {refused[0].headers['retry-after'] + 's' if refused else '-'}), "
+          f"ingested in {elapsed:.1f}s")
+    print(f"\n{'page reads':<16}{'reads':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, latencies in (("idle", idle), ("under ingestion", loaded)):
+        print(f"{name:<16}{len(latencies):>8}{statistics.median(latencies):>10.2f}"
+              f"{percentile(latencies, 0.99):>10.2f}")
+    print(f"\n{'executor wait':<24}{'tasks':>8}{'mean ms':>10}")
+    for (pool, level), (wait_ms, count) in mean_waits(metrics).items():
+        print(f"{pool + ' ' + level:<24}{count:>8}{wait_ms:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=24)
+    parser.add_argument("--pages", type=int, default=60, help="pages per uploaded PDF")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--cpu-workers", type=int, default=2)
+    parser.add_argument("--io-workers", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=8)
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Documents/minute through single uploads against the bulk endpoint.
+
+Runs the app under uvicorn in-process against a temporary SQLite database
+with the fake embedder. Each mode uploads --documents distinct PDFs of
+--pages pages and waits until all are ingested:
+  single      one POST /documents/upload per file, sequentially
+  multipart   one POST /documents/bulk with every file as a form part
+  zip         one POST /documents/bulk streaming a ZIP archive of the files
+
+Reports the time until the uploads were accepted and until every document
+was ready, as documents per minute.
+
+Usage: python -m benchmarks.bench_bulk_upload [--documents 300] [--pages 2]
+"""
+import argparse
+import asyncio
+import io
+import socket
+import time
+import zipfile
+
+from benchmarks.fakes import configure_environment
+
+ROOT = configure_environment("bench_bulk_upload_", STARTUP_WARMUP="false")
+
+import fitz  # noqa: E402
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+from app.core.config import get_settings  # noqa: E402
+from app.database.base import get_async_session_local  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.document import Document  # noqa: E402
+from benchmarks.fakes import create_schema, install_fakes  # noqa: E402
+from benchmarks.synthetic import make_text  # noqa: E402
+
+FINISHED = ("ready", "failed")
+
+
+def make_pdfs(count: int, pages: int, seed: int):
+    """(filename, bytes) of ``count`` distinct PDFs, built in memory."""
+    import random
+    rng = random.Random(seed)
+    files = []
+    for number in range(count):
+        document = fitz.open()
+        for page_number in range(pages):
+            page = document.new_page()
+            lines = [f"Document {seed}-{number} page {page_number + 1}"]
+            lines += [make_text(rng, 12) for _ in range(40)]
+            page.insert_text((50, 50), "\n".join(lines), fontsize=9)
+        files.append((f"doc-{seed}-{number:05d}.pdf", document.tobytes()))
+        document.close()
+    return files
+
+
+def make_zip(files) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+async def upload_single(client: httpx.AsyncClient, files):
+    for name, data in files:
+        response = await client.post(
+            "/api/v1/documents/upload", files={"file": (name, data, "application/pdf")}
+        )
+        response.raise_for_status()
+
+
+async def upload_multipart(client: httpx.AsyncClient, files):
+    response = await client.post(
+        "/api/v1/documents/bulk",
+        files=[("files", (name, data, "application/pdf")) for name, data in files]
+    )
+    response.raise_for_status()
+    assert response.json()["queued"] == len(files), response.json()
+
+
+async def upload_zip(client: httpx.AsyncClient, files):
+    archive = make_zip(files)
+
+    async def body():
+        # Sent in pieces, as a client streaming the archive would
+        for start in range(0, len(archive), 256 * 1024):
+            yield archive[start:start + 256 * 1024]
+
+    response = await client.post(
+        "/api/v1/documents/bulk",
+        content=body(),
+        headers={"content-type": "application/zip"}
+    )
+    response.raise_for_status()
+    assert response.json()["queued"] == len(files), response.json()
+
+
+async def wait_ingested(expected: int):
+    """Wait until ``expected`` documents in total are ready or failed."""
+    async with get_async_session_local()() as db:
+        while True:
+            finished = (await db.execute(
+                select(func.count()).select_from(Document)
+                .where(Document.status.in_(FINISHED))
+            )).scalar()
+            if finished >= expected:
+                return
+            await asyncio.sleep(0.1)
+
+
+async def run(args):
+    create_schema()
+    install_fakes()
+    # Throughput, not admission: let a whole upload wait in the ingestion queue
+    settings = get_settings()
+    settings.INGESTION_MAX_PENDING = max(settings.INGESTION_MAX_PENDING, args.documents)
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    modes = {"single": upload_single, "multipart": upload_multipart, "zip": upload_zip}
+    print(f"{args.documents} documents of {args.pages} pages per mode\n")
+    print(f"{'mode':<12}{'accepted s':>12}{'docs/min':>12}{'ingested s':>12}{'docs/min':>12}")
+    total = 0
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=None
+        ) as client:
+            for seed, (name, upload) in enumerate(modes.items()):
+                files = make_pdfs(args.documents, args.pages, args.seed + seed)
+                total += len(files)
+                started = time.perf_counter()
+                await upload(client, files)
+                accepted = time.perf_counter() - started
+                await wait_ingested(total)
+                ingested = time.perf_counter() - started
+                print(f"{name:<12}{accepted:>12.2f}{len(files) / accepted * 60:>12,.0f}"
+                      f"{ingested:>12.2f}{len(files) / ingested * 60:>12,.0f}")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Chunks/second of the page-aware chunker against the flat text splitter.
+
+Usage: python -m benchmarks.bench_chunking [--pages 100 1000 5000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.utils.text_processing import PageChunker, load_chunks, save_chunks
+from benchmarks.synthetic import make_document_text
+
+
+def timed(func, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", " ", ""]
+    )
+    chunker = PageChunker(chunk_size=1000, chunk_overlap=200)
+
+    for pages in args.pages:
+        text = make_document_text(random.Random(pages), pages)
+        megabytes = len(text) / 1e6
+        print(f"{pages} pages, {megabytes:.1f} MB of text")
+
+        seconds, chunks = timed(lambda: splitter.split_text(text), args.repeat)
+        print(f"  flat splitter:   {len(chunks) / seconds:>10,.0f} chunks/s "
+              f"{megabytes / seconds:6.1f} MB/s ({len(chunks)} chunks)")
+
+        seconds, chunks = timed(lambda: chunker.split_text(text), args.repeat)
+        print(f"  page chunker:    {len(chunks) / seconds:>10,.0f} chunks/s "
+              f"{megabytes / seconds:6.1f} MB/s ({len(chunks)} chunks)")
+
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "document.chunks.jsonl")
+            seconds, _ = timed(lambda: save_chunks(path, chunks), args.repeat)
+            size = os.path.getsize(path) / 1e6
+            print(f"  sidecar write:   {len(chunks) / seconds:>10,.0f} chunks/s ({size:.1f} MB)")
+            seconds, _ = timed(lambda: load_chunks(path), args.repeat)
+            print(f"  sidecar read:    {len(chunks) / seconds:>10,.0f} chunks/s")
+
+
+if __name__ == "__main__":
+    main()
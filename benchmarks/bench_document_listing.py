@@ -0,0 +1,163 @@
+"""Document listing latency: OFFSET over full rows against keyset pages of summaries.
+
+Fills a temporary SQLite database with --rows documents (schema and indexes
+from the models, metadata blobs of --metadata-bytes) and times, at several
+depths into the listing:
+  offset   the previous listing: full Document rows through OFFSET/LIMIT,
+           serialized as DocumentInDB
+  keyset   StorageService.list_documents from the cursor at that depth,
+           serialized as DocumentSummary
+plus filtered pages (status, filename prefix) and the total count as
+COUNT(*) against StorageService.estimate_count.
+
+Usage: python -m benchmarks.bench_document_listing [--rows 1000000] [--limit 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.fakes import configure_environment
+
+ROOT = configure_environment("bench_listing_")
+
+from sqlalchemy import func, select  # noqa: E402
+from app.database.base import get_async_session_local  # noqa: E402
+from app.models.document import Document  # noqa: E402
+from app.schemas.document import DocumentInDB, DocumentSummary  # noqa: E402
+from app.services.storage import StorageService  # noqa: E402
+from benchmarks.fakes import create_schema  # noqa: E402
+
+STATUSES = ["ready"] * 18 + ["failed", "pending"]
+
+
+def fill(path: str, rows: int, metadata_bytes: int, seed: int):
+    """Bulk insert synthetic documents straight through sqlite3."""
+    rng = random.Random(seed)
+    started = datetime(2024, 1, 1)
+    metadata = json.dumps({"original_filename": "x", "notes": "n" * metadata_bytes})
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=OFF")
+    connection.execute("PRAGMA synchronous=OFF")
+    batch = 50_000
+    for start in range(1, rows + 1, batch):
+        connection.executemany(
+            """
+            INSERT INTO documents (id, filename, file_path, extracted_text_path,
+                uploaded_at, file_size, status, content_hash, mime_type, metadata, version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            """,
+            [
+                (
+                    number,
+                    f"report-{rng.randrange(10_000):04d}-{number}.pdf",
+                    f"storage/pdfs/{number:064x}.pdf",
+                    f"storage/extracted_text/{number}.txt",
+                    # Several uploads share a second, so ties on uploaded_at occur
+                    (started + timedelta(seconds=number // 3)).isoformat(sep=" "),
+                    rng.randrange(10_000, 10_000_000),
+                    rng.choice(STATUSES),
+                    f"{number:064x}",
+                    "application/pdf",
+                    metadata,
+                )
+                for number in range(start, min(start + batch, rows + 1))
+            ]
+        )
+    connection.commit()
+    connection.execute("ANALYZE")
+    connection.close()
+
+
+async def timed(func, repeat: int) -> float:
+    """Median milliseconds of ``await func()``."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def run(args):
+    create_schema()
+    path = os.path.join(ROOT, "bench.db")
+    print(f"filling {args.rows} rows")
+    started = time.perf_counter()
+    fill(path, args.rows, args.metadata_bytes, args.seed)
+    print(f"  {time.perf_counter() - started:.1f}s, {os.path.getsize(path) / 2**20:.0f} MiB")
+
+    storage = StorageService()
+    newest_first = (Document.uploaded_at.desc(), Document.id.desc())
+    depths = [depth for depth in (0, 10_000, 100_000, 500_000, 900_000) if depth < args.rows]
+
+    async with get_async_session_local()() as db:
+        async def offset_page(depth):
+            result = await db.execute(
+                select(Document).order_by(*newest_first).offset(depth).limit(args.limit)
+            )
+            items = [DocumentInDB.model_validate(row) for row in result.scalars()]
+            db.expunge_all()
+            return items
+
+        async def keyset_page(after, **filters):
+            rows, _ = await storage.list_documents(
+                db, limit=args.limit, after=after, **filters
+            )
+            return [DocumentSummary.model_validate(row) for row in rows]
+
+        print(f"\n{'page at depth':<28}{'offset ms':>12}{'keyset ms':>12}")
+        for depth in depths:
+            after = None
+            if depth:
+                row = (await db.execute(
+                    select(Document.uploaded_at, Document.id)
+                    .order_by(*newest_first).offset(depth - 1).limit(1)
+                )).one()
+                after = (row.uploaded_at, row.id)
+            offset_ms = await timed(lambda: offset_page(depth), args.repeat)
+            keyset_ms = await timed(lambda: keyset_page(after), args.repeat)
+            print(f"{depth:<28,}{offset_ms:>12.2f}{keyset_ms:>12.2f}")
+
+        print(f"\n{'filtered first page':<28}{'keyset ms':>24}")
+        for label, filters in (
+            ("status=failed", {"status": "failed"}),
+            ("filename_prefix=report-42", {"filename_prefix": "report-42"}),
+        ):
+            print(f"{label:<28}{await timed(lambda: keyset_page(None, **filters), args.repeat):>24.2f}")
+
+        count_ms = await timed(
+            lambda: db.execute(select(func.count()).select_from(Document)), args.repeat
+        )
+        estimate = await storage.estimate_count(db)
+        estimate_ms = await timed(lambda: storage.estimate_count(db), args.repeat)
+        print(f"\n{'total count':<28}{'ms':>12}")
+        print(f"{'COUNT(*)':<28}{count_ms:>12.2f}")
+        print(f"{f'estimate ({estimate})':<28}{estimate_ms:>12.2f}")
+
+        connection = await db.connection()
+        plan = await connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT id FROM documents WHERE (uploaded_at, id) < (?, ?) "
+            "ORDER BY uploaded_at DESC, id DESC LIMIT 50",
+            (datetime(2024, 1, 2).isoformat(sep=" "), 1)
+        )
+        print("\nkeyset plan:", "; ".join(row[-1] for row in plan))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--metadata-bytes", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
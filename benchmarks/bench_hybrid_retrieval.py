@@ -0,0 +1,149 @@
+"""Query latency and recall@k of vector, BM25 and hybrid retrieval.
+
+The fixture corpus is synthetic chunks drawn from a Zipf-distributed
+vocabulary, with clause numbers and part numbers planted in some of them.
+"exact" queries ask for one of those identifiers, "topical" queries reuse
+a handful of words from one chunk. A query counts as
+recalled when its source chunk is among the top k. Vectors come from the
+local hash embedder, so absolute recall differs from a real embedding model;
+the gap on exact identifiers is the point of the comparison.
+
+Usage: python -m benchmarks.bench_hybrid_retrieval [--documents 20] [--k 1 3 5]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from app.services.embeddings import HashEmbeddings
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.services.vector_index import PerDocumentIndex
+from app.utils.text_processing import Chunk
+
+
+def make_vocabulary(rng, size: int):
+    syllables = ["ka", "lo", "ri", "mes", "tan", "vo", "del", "sur", "pe", "gin", "ot", "ba"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    weights = [1 / rank for rank in range(1, size + 1)]
+    return words, weights
+
+
+class FakeDocument:
+    def __init__(self, document_id: int):
+        self.id = document_id
+        self.content_hash = str(document_id)
+
+
+def build_corpus(args, rng):
+    """Chunks per document, plus (document, chunk number, query, kind) tuples."""
+    words, weights = make_vocabulary(rng, args.vocabulary)
+    corpus, queries = {}, []
+    for document_id in range(1, args.documents + 1):
+        chunks = []
+        for number in range(args.chunks):
+            text = " ".join(rng.choices(words, weights, k=150))
+            if rng.random() < 0.3:
+                identifier = rng.choice([
+                    f"clause {rng.randint(1, 40)}.{rng.randint(1, 9)}",
+                    f"part PN-{rng.randint(10000, 99999)}",
+                ])
+                text = f"{text[:400]} {identifier} {text[400:]}"
+                queries.append((document_id, number, f"What does {identifier} say?", "exact"))
+            else:
+                query = " ".join(rng.sample(text.split(), 6))
+                queries.append((document_id, number, query, "topical"))
+            chunks.append(Chunk(text, number // 4 + 1, number * 1000, number * 1000 + len(text)))
+        corpus[document_id] = chunks
+    rng.shuffle(queries)
+    return corpus, queries[:args.queries]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--dimensions", type=int, default=1024,
+                        help="hash embedding size; fewer dimensions mean more collisions")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus, queries = build_corpus(args, rng)
+    embeddings = HashEmbeddings(args.dimensions)
+    root = tempfile.mkdtemp(prefix="bench_hybrid_")
+    vector_index = PerDocumentIndex(embeddings, root=root)
+    lexical_index = LexicalIndex(root=f"{root}/_lexical")
+    started = time.perf_counter()
+    for document_id, chunks in corpus.items():
+        texts = [chunk.text for chunk in chunks]
+        vector_index.add_document(
+            document_id, texts, embeddings.embed_documents(texts),
+            [chunk.metadata() for chunk in chunks]
+        )
+    vector_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for document_id, chunks in corpus.items():
+        lexical_index.add_document(document_id, chunks)
+    lexical_seconds = time.perf_counter() - started
+    print(f"{args.documents} documents x {args.chunks} chunks, {len(queries)} queries")
+    print(f"  build: vector {vector_seconds:.2f}s, BM25 {lexical_seconds:.2f}s")
+
+    depth = max(max(args.k), args.candidates)
+
+    def vector(document, query):
+        return vector_index.search([document], embeddings.embed_query(query), depth)
+
+    def lexical(document, query):
+        return lexical_index.search([document.id], query, depth)
+
+    def hybrid(vector_weight, lexical_weight):
+        def search(document, query):
+            return reciprocal_rank_fusion(
+                [
+                    (vector(document, query), vector_weight),
+                    (lexical(document, query), lexical_weight),
+                ],
+                depth
+            )
+        return search
+
+    for name, search in (
+        ("vector", vector),
+        ("bm25", lexical),
+        ("hybrid 1:1", hybrid(1.0, 1.0)),
+        ("hybrid 1:2", hybrid(1.0, 2.0)),
+    ):
+        latencies, hits = [], {kind: {k: 0 for k in args.k} for kind in ("exact", "topical")}
+        totals = {"exact": 0, "topical": 0}
+        for document_id, number, query, kind in queries:
+            started = time.perf_counter()
+            results = search(FakeDocument(document_id), query)
+            latencies.append((time.perf_counter() - started) * 1000)
+            ranked = [document.metadata["chunk"] for document, _ in results]
+            totals[kind] += 1
+            for k in args.k:
+                hits[kind][k] += number in ranked[:k]
+
+        recall = "  ".join(
+            f"{kind} " + " ".join(
+                f"R@{k}={hits[kind][k] / max(totals[kind], 1):.2f}" for k in args.k
+            )
+            for kind in ("exact", "topical")
+        )
+        print(f"  {name:<10} p50={statistics.median(latencies):6.2f}ms "
+              f"p95={percentile(latencies, 0.95):6.2f}ms  {recall}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Import-time budget for ``import app.main``, measured with ``-X importtime``.
+
+Imports the app in fresh interpreters, reports the best total and the
+slowest modules, and exits 1 if the total exceeds --budget-ms or if any
+heavy dependency (LangChain, Chroma, PyMuPDF, OpenAI, DB drivers) was
+imported; those belong to the lazily built services.
+
+Usage: python -m benchmarks.bench_import_time [--budget-ms 1500] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = (
+    "langchain", "chromadb", "fitz", "openai", "tiktoken",
+    "numpy", "psycopg2", "asyncpg", "aiosqlite", "redis"
+)
+
+SCRIPT = "import app.main, json, sys; print(json.dumps(sorted(sys.modules)))"
+
+
+def import_once(env) -> tuple:
+    """Cumulative microseconds per module and the modules loaded."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines()
+                  if not line.startswith("import time:")]
+        sys.exit("import app.main failed:\n" + "\n".join(errors[-10:]))
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # import time:  self [us] | cumulative | imported package
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative, json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_import_time_")
+    env = {**os.environ, "DATABASE_URI": f"sqlite:///{root}/bench.db"}
+    runs = [import_once(env) for _ in range(args.repeat)]
+    cumulative, modules = min(runs, key=lambda run: run[0]["app.main"])
+    total_ms = cumulative["app.main"] / 1000
+
+    print(f"import app.main: best {total_ms:.0f}ms of {args.repeat} "
+          f"(budget {args.budget_ms:.0f}ms)")
+    print(f"\n{'module':<48}{'cumulative ms':>14}")
+    top_level = sorted(
+        ((name, us) for name, us in cumulative.items() if "." not in name),
+        key=lambda item: item[1], reverse=True
+    )
+    for name, us in top_level[:args.top]:
+        print(f"{name:<48}{us / 1000:>14.1f}")
+
+    heavy = sorted(
+        name for name in modules
+        if name.split(".")[0] in HEAVY_MODULES and "." not in name
+    )
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.0f}ms, over the {args.budget_ms:.0f}ms budget")
+    if heavy:
+        failures.append(f"heavy modules imported eagerly: {', '.join(heavy)}")
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
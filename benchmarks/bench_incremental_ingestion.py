@@ -0,0 +1,96 @@
+"""Ingestion time of a revised PDF uploaded as a new version against a full ingest.
+
+Runs the app under uvicorn in-process against a temporary SQLite database,
+with the fake embedder costing --embedding-ms-per-text for every text it
+embeds. A --pages PDF is uploaded and ingested in full, then a copy with
+--changed pages rewritten is uploaded to POST .../{id}/versions. The
+embedding cache is disabled so only the version reuse saves work.
+
+Usage: python -m benchmarks.bench_incremental_ingestion [--pages 300] [--changed 2]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import time
+
+from benchmarks.fakes import configure_environment
+
+ROOT = configure_environment("bench_incremental_", EMBEDDING_CACHE_ENABLED="false")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.fakes import create_schema, install_fakes  # noqa: E402
+from benchmarks.synthetic import make_pdf  # noqa: E402
+
+
+async def ingest(client: httpx.AsyncClient, url: str, path: str) -> tuple:
+    """Upload a PDF and wait for it; seconds taken and the final status."""
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        response = await client.post(
+            url, files={"file": (os.path.basename(path), f.read(), "application/pdf")}
+        )
+    response.raise_for_status()
+    document_id = response.json()["id"]
+    while True:
+        status = (await client.get(f"/api/v1/documents/{document_id}/status")).json()
+        if status["status"] == "ready":
+            return time.perf_counter() - started, status
+        if status["status"] == "failed":
+            raise RuntimeError(f"Ingestion of document {document_id} failed: {status['error']}")
+        await asyncio.sleep(0.02)
+
+
+async def run(args):
+    create_schema()
+    install_fakes(embedding_text_latency=args.embedding_ms_per_text / 1000)
+    revised = random.Random(args.seed).sample(range(args.pages), args.changed)
+    original = make_pdf(os.path.join(ROOT, "v1.pdf"), args.pages, seed=args.seed)
+    revision = make_pdf(
+        os.path.join(ROOT, "v2.pdf"), args.pages, seed=args.seed, revised=revised
+    )
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=None
+        ) as client:
+            full, status = await ingest(client, "/api/v1/documents/upload", original)
+            incremental, status = await ingest(
+                client, f"/api/v1/documents/{status['document_id']}/versions", revision
+            )
+    finally:
+        server.should_exit = True
+        await serving
+
+    reuse = status["reuse"]
+    print(f"{args.pages} pages, {args.changed} changed, "
+          f"{args.embedding_ms_per_text}ms embedding per chunk")
+    print(f"  full ingest         {full:8.2f}s")
+    print(f"  new version         {incremental:8.2f}s  ({full / incremental:.1f}x faster)")
+    print(f"  pages reused        {reuse['pages_reused']}/{reuse['pages']}")
+    print(f"  chunks reused       {reuse['chunks_reused']}/{reuse['chunks']} "
+          f"({reuse['reused_fraction']:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--changed", type=int, default=2)
+    parser.add_argument("--embedding-ms-per-text", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Overhead of the metrics instrumentation: stage spans, counters and /metrics.
+
+Usage: python -m benchmarks.bench_metrics [--iterations 200000] [--series 500]
+"""
+import argparse
+import time
+from app.core import metrics
+
+
+def per_call_ns(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--series", type=int, default=500)
+    args = parser.parse_args()
+
+    def empty():
+        pass
+
+    def span():
+        with metrics.stage("bench", "span"):
+            pass
+
+    counter = metrics.QA_QUESTIONS.labels("bench")
+    histogram = metrics.STAGE_SECONDS.labels("bench", "observe")
+
+    baseline = per_call_ns(empty, args.iterations)
+    print(f"{'operation':<24}{'ns/call':>10}")
+    print(f"{'counter.inc':<24}{per_call_ns(counter.inc, args.iterations) - baseline:>10.0f}")
+    print(f"{'histogram.observe':<24}"
+          f"{per_call_ns(lambda: histogram.observe(0.01), args.iterations) - baseline:>10.0f}")
+    print(f"{'stage() untraced':<24}{per_call_ns(span, args.iterations) - baseline:>10.0f}")
+    metrics.start_trace()
+    # Keep the trace from growing without bound across iterations
+    traced_iterations = min(args.iterations, 50000)
+    print(f"{'stage() traced':<24}{per_call_ns(span, traced_iterations) - baseline:>10.0f}")
+
+    for index in range(args.series):
+        metrics.STAGE_SECONDS.labels("bench", f"stage_{index}").observe(0.01)
+    started = time.perf_counter()
+    body = metrics.registry.render()
+    elapsed = time.perf_counter() - started
+    print(f"\nrender: {len(body.splitlines())} lines, {len(body) / 1024:.0f} KiB "
+          f"in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Questions/second of the batch endpoint against sequential WebSocket calls.
+
+Runs the app under uvicorn in-process against a temporary SQLite database,
+with the hash embedder and a fake LLM that takes --llm-seconds per call.
+The same checklist of distinct questions is sent once as sequential
+WebSocket questions and once as a single POST .../qa:batch, with the answer
+cache disabled so every question reaches the LLM.
+
+Usage: python -m benchmarks.bench_qa_batch [--questions 200] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import socket
+import time
+
+from benchmarks.fakes import configure_environment
+
+configure_environment("bench_qa_batch_")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+from app.database.base import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.document import Document  # noqa: E402
+from app.services.providers import get_qa_service  # noqa: E402
+from benchmarks.fakes import FakeChatModel  # noqa: E402
+from benchmarks.synthetic import make_text  # noqa: E402
+
+
+def seed(rng) -> int:
+    Base.metadata.create_all(engine)
+    os.makedirs(os.environ["EXTRACTED_TEXT_DIR"], exist_ok=True)
+    with SessionLocal() as db:
+        document = Document(filename="bench.pdf", file_path="bench.pdf",
+                            status="ready", content_hash="bench")
+        db.add(document)
+        db.commit()
+        path = os.path.join(os.environ["EXTRACTED_TEXT_DIR"], f"{document.id}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\f".join(make_text(rng, 300) for _ in range(50)))
+        document.extracted_text_path = path
+        db.commit()
+        return document.id
+
+
+async def sequential_ws(url: str, document_id: int, questions) -> int:
+    answers = 0
+    async with websockets.connect(url, max_queue=None) as ws:
+        for number, question in enumerate(questions):
+            await ws.send(json.dumps({
+                "document_id": document_id,
+                "question": question,
+                "request_id": str(number)
+            }))
+            message = json.loads(await ws.recv())
+            answers += "answer" in message
+    return answers
+
+
+async def batch(base_url: str, document_id: int, questions) -> int:
+    answers = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        async with client.stream(
+            "POST",
+            f"/api/v1/documents/{document_id}/qa:batch",
+            json={"questions": questions}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    answers += "answer" in json.loads(line)
+    return answers
+
+
+async def run(args):
+    rng = random.Random(0)
+    document_id = seed(rng)
+    questions = [f"{make_text(rng, 6)} ({number})?" for number in range(args.questions)]
+    qa_service = get_qa_service()
+    qa_service.llm = FakeChatModel(latency=args.llm_seconds)
+    qa_service.answer_batch = functools.partial(
+        qa_service.answer_batch, concurrency=args.concurrency
+    )
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    # Build the document's indexes before measuring
+    await sequential_ws(f"ws://127.0.0.1:{port}/ws/qa/warmup", document_id, ["warm up"])
+
+    print(f"{args.questions} questions, {args.llm_seconds * 1000:.0f}ms per LLM call, "
+          f"batch concurrency {args.concurrency}")
+    for name, coroutine in (
+        ("sequential websocket", sequential_ws(
+            f"ws://127.0.0.1:{port}/ws/qa/bench", document_id, questions
+        )),
+        ("batch endpoint", batch(f"http://127.0.0.1:{port}", document_id, questions)),
+    ):
+        started = time.perf_counter()
+        answers = await coroutine
+        elapsed = time.perf_counter() - started
+        print(f"  {name:<22} {answers} answers in {elapsed:6.2f}s  "
+              f"{answers / elapsed:7.1f} questions/s")
+
+    server.should_exit = True
+    await serving
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-seconds", type=float, default=0.1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Checks/sec and memory per key of the sliding-window rate limiter.
+
+Compares the previous per-key timestamp log with the sliding-window counter
+backends. Redis is measured only when --redis-url is given.
+
+Usage: python -m benchmarks.bench_rate_limiter [--keys 10000] [--limit 600]
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+from app.core.rate_limiter import (
+    InMemoryRateLimitBackend,
+    RateLimiter,
+    RedisRateLimitBackend
+)
+
+
+class TimestampLogLimiter:
+    """The previous limiter: a list of request timestamps per key."""
+
+    def __init__(self, window_size: float = 60):
+        self.requests = {}
+        self.window_size = window_size
+
+    def check_rate_limit(self, key: str, max_requests: int) -> bool:
+        now = time.time()
+        log = [t for t in self.requests.get(key, []) if now - t < self.window_size]
+        self.requests[key] = log
+        if len(log) >= max_requests:
+            return False
+        log.append(now)
+        return True
+
+
+def run_sync(check, keys, checks):
+    started = time.perf_counter()
+    for key in keys[:checks]:
+        check(key)
+    return checks / (time.perf_counter() - started)
+
+
+def memory_per_key(make, check, keys):
+    tracemalloc.start()
+    limiter = make()
+    before = tracemalloc.get_traced_memory()[0]
+    for key in keys:
+        check(limiter, key)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / len(set(keys))
+
+
+async def run_async(limiter: RateLimiter, keys, checks, limit):
+    started = time.perf_counter()
+    for key in keys[:checks]:
+        await limiter.check_rate_limit(key, limit)
+    return checks / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--checks", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=600)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # Zipf-like traffic: a few hot keys and a long tail
+    population = [f"client-{n}" for n in range(args.keys)]
+    weights = [1 / (rank + 1) for rank in range(args.keys)]
+    keys = rng.choices(population, weights, k=args.checks)
+
+    log = TimestampLogLimiter()
+    rate = run_sync(lambda k: log.check_rate_limit(k, args.limit), keys, args.checks)
+    print(f"timestamp log:          {rate:>12,.0f} checks/s")
+
+    backend = InMemoryRateLimitBackend()
+    rate = run_sync(lambda k: backend.hit_sync(k, args.limit, 60), keys, args.checks)
+    print(f"sliding window (sync):  {rate:>12,.0f} checks/s")
+
+    limiter = RateLimiter(InMemoryRateLimitBackend())
+    rate = asyncio.run(run_async(limiter, keys, args.checks, args.limit))
+    print(f"sliding window (async): {rate:>12,.0f} checks/s")
+
+    sample = keys[:50000]
+    log_bytes = memory_per_key(
+        TimestampLogLimiter,
+        lambda l, k: l.check_rate_limit(k, args.limit),
+        sample
+    )
+    window_bytes = memory_per_key(
+        InMemoryRateLimitBackend,
+        lambda b, k: b.hit_sync(k, args.limit, 60),
+        sample
+    )
+    print(f"memory per key: timestamp log {log_bytes:,.0f} B, "
+          f"sliding window {window_bytes:,.0f} B")
+
+    if args.redis_url:
+        limiter = RateLimiter(RedisRateLimitBackend(args.redis_url, prefix="bench"))
+        checks = min(args.checks, 20000)
+        rate = asyncio.run(run_async(limiter, keys, checks, args.limit))
+        print(f"sliding window (redis): {rate:>12,.0f} checks/s")
+
+
+if __name__ == "__main__":
+    main()
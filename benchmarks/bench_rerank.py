@@ -0,0 +1,104 @@
+"""Prompt context tokens and recall with and without the reranking stage.
+
+Uses the synthetic corpus and queries of bench_hybrid_retrieval. "top k"
+sends hybrid retrieval's k best chunks to the LLM, as without a reranker.
+"rerank" over-fetches --candidates chunks, rescores them with the lexical
+reranker and keeps up to k within --budget estimated tokens and above
+--min-relative-score of the best. A query counts as recalled when its
+source chunk is in the context sent to the LLM.
+
+Usage: python -m benchmarks.bench_rerank [--documents 20] [--k 3 5 8] [--budget 800]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from app.services.embeddings import HashEmbeddings
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion, term_coverage
+from app.services.reranker import LexicalReranker, estimate_tokens
+from app.services.vector_index import PerDocumentIndex
+from benchmarks.bench_hybrid_retrieval import FakeDocument, build_corpus, percentile
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--candidates", type=int, default=12)
+    parser.add_argument("--budget", type=int, default=800, help="estimated context tokens")
+    parser.add_argument("--min-relative-score", type=float, default=0.6)
+    parser.add_argument("--lexical-weight", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus, queries = build_corpus(args, rng)
+    embeddings = HashEmbeddings(args.dimensions)
+    root = tempfile.mkdtemp(prefix="bench_rerank_")
+    vector_index = PerDocumentIndex(embeddings, root=root)
+    lexical_index = LexicalIndex(root=f"{root}/_lexical")
+    for document_id, chunks in corpus.items():
+        texts = [chunk.text for chunk in chunks]
+        vector_index.add_document(
+            document_id, texts, embeddings.embed_documents(texts),
+            [chunk.metadata() for chunk in chunks]
+        )
+        lexical_index.add_document(document_id, chunks)
+    reranker = LexicalReranker(args.lexical_weight)
+
+    def hybrid(document_id: int, query: str, k: int):
+        """Fused top k with each chunk's best relevance, as QAService retrieves."""
+        depth = max(k, 20)
+        vector = vector_index.search(
+            [FakeDocument(document_id)], embeddings.embed_query(query), depth
+        )
+        lexical = [
+            (document, term_coverage(query, document.page_content))
+            for document, _ in lexical_index.search([document_id], query, depth)
+        ]
+        relevance = {}
+        for document, score in vector + lexical:
+            key = document.page_content
+            relevance[key] = max(relevance.get(key, 0.0), score)
+        fused = reciprocal_rank_fusion([(vector, 1.0), (lexical, 1.0)], k)
+        return [(document, relevance[document.page_content]) for document, _ in fused]
+
+    print(f"{args.documents} documents x {args.chunks} chunks, {len(queries)} queries, "
+          f"rerank from {args.candidates} candidates within {args.budget} tokens\n")
+    print(f"{'context':<14}{'recall':>8}{'chunks':>8}{'tokens':>8}{'saved':>8}"
+          f"{'rerank p50 ms':>15}{'p99 ms':>8}")
+    for k in args.k:
+        rows = {}
+        for mode in ("top k", "rerank"):
+            recalled, chunks, tokens, rerank_ms = 0, [], [], []
+            for document_id, number, query, _ in queries:
+                if mode == "top k":
+                    context = hybrid(document_id, query, k)
+                else:
+                    candidates = hybrid(document_id, query, max(k, args.candidates))
+                    started = time.perf_counter()
+                    context = asyncio.run(reranker.select(
+                        query, candidates, k, args.budget, args.min_relative_score
+                    ))
+                    rerank_ms.append((time.perf_counter() - started) * 1000)
+                recalled += number in [document.metadata["chunk"] for document, _ in context]
+                chunks.append(len(context))
+                tokens.append(sum(estimate_tokens(d.page_content) for d, _ in context))
+            rows[mode] = (recalled / len(queries), statistics.mean(chunks),
+                          statistics.mean(tokens), rerank_ms)
+
+        baseline_tokens = rows["top k"][2]
+        for mode, (recall, chunks, tokens, rerank_ms) in rows.items():
+            timing = (f"{statistics.median(rerank_ms):>15.2f}{percentile(rerank_ms, 0.99):>8.2f}"
+                      if rerank_ms else f"{'-':>15}{'-':>8}")
+            print(f"{mode + f' k={k}':<14}{recall:>8.3f}{chunks:>8.2f}{tokens:>8.0f}"
+                  f"{1 - tokens / baseline_tokens:>8.0%}{timing}")
+
+
+if __name__ == "__main__":
+    main()
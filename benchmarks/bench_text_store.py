@@ -0,0 +1,100 @@
+"""Page reads with concurrent readers: whole-file text reads against the mmap text store.
+
+Writes one synthetic document of --pages pages both as the plain text file
+the service used to keep and in the page-indexed format, then runs
+--readers threads that each fetch --reads random pages:
+  plain   read the whole file and split it into pages, per request
+  store   TextStore.open(path).page(n), one shared mapping
+
+Reports pages/second and the peak growth of anonymous resident memory
+(RssAnon; the mapping itself is file-backed page cache), which should stay
+flat for the store however many readers there are.
+
+Usage: python -m benchmarks.bench_text_store [--pages 2000] [--readers 32]
+"""
+import argparse
+import os
+import random
+import threading
+import time
+
+from benchmarks.fakes import configure_environment
+
+ROOT = configure_environment("bench_text_store_")
+
+from app.services.text_store import TextStore, write_pages  # noqa: E402
+from app.utils.text_processing import PAGE_SEPARATOR  # noqa: E402
+from benchmarks.synthetic import make_document_text  # noqa: E402
+
+
+def rss_anon_kib() -> int:
+    """Anonymous resident memory of this process (Linux)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1])
+    return 0
+
+
+def read_plain(path: str, number: int) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read().split(PAGE_SEPARATOR)[number - 1]
+
+
+def measure(name: str, read, page_count: int, args):
+    peak = [0]
+    stop = threading.Event()
+
+    def monitor():
+        while not stop.is_set():
+            peak[0] = max(peak[0], rss_anon_kib())
+            time.sleep(0.002)
+
+    def reader(seed: int):
+        rng = random.Random(seed)
+        for _ in range(args.reads):
+            read(rng.randint(1, page_count))
+
+    baseline = rss_anon_kib()
+    watcher = threading.Thread(target=monitor)
+    watcher.start()
+    threads = [threading.Thread(target=reader, args=(seed,)) for seed in range(args.readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    watcher.join()
+
+    pages = args.readers * args.reads
+    print(f"  {name:<8} {pages / elapsed:>12,.0f} pages/s  "
+          f"RssAnon +{(peak[0] - baseline) / 1024:>8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--reads", type=int, default=20, help="page reads per reader")
+    parser.add_argument("--compression", choices=["none", "zlib"], default="none")
+    args = parser.parse_args()
+
+    pages = make_document_text(random.Random(0), args.pages).split(PAGE_SEPARATOR)
+    plain_path = os.path.join(ROOT, "document.txt")
+    with open(plain_path, "w", encoding="utf-8") as f:
+        f.write(PAGE_SEPARATOR.join(pages))
+    store_path = os.path.join(ROOT, "document.pages")
+    write_pages(store_path, pages, args.compression)
+    print(f"{args.pages} pages, {os.path.getsize(plain_path) / 2**20:.1f} MiB text "
+          f"({os.path.getsize(store_path) / 2**20:.1f} MiB stored, {args.compression}), "
+          f"{args.readers} readers x {args.reads} reads")
+
+    store = TextStore()
+    measure("store", lambda number: store.open(store_path).page(number), args.pages, args)
+    measure("plain", lambda number: read_plain(plain_path, number), args.pages, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Open+query latency of the per-document and shared vector index layouts.
+
+Usage: python -m benchmarks.bench_vector_layout [--documents 1000 10000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from app.services.embeddings import HashEmbeddings
+from app.services.retriever_cache import retriever_cache
+from app.services.vector_index import PerDocumentIndex, SharedIndex
+from benchmarks.synthetic import make_text
+
+
+class FakeDocument:
+    def __init__(self, document_id: int):
+        self.id = document_id
+        self.content_hash = str(document_id)
+
+
+def build(index, documents: int, chunks: int, embeddings, rng):
+    started = time.perf_counter()
+    for document_id in range(1, documents + 1):
+        texts = [make_text(rng, 60) for _ in range(chunks)]
+        index.add_document(document_id, texts, embeddings.embed_documents(texts))
+    return time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(query, samples: int, documents: int, embeddings, rng):
+    latencies = []
+    for _ in range(samples):
+        document = FakeDocument(rng.randint(1, documents))
+        embedding = embeddings.embed_query(make_text(rng, 8))
+        started = time.perf_counter()
+        query(document, embedding)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def report(name, latencies):
+    print(f"  {name:<28} p50={statistics.median(latencies):7.2f}ms "
+          f"p95={percentile(latencies, 0.95):7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    embeddings = HashEmbeddings()
+    for documents in args.documents:
+        rng = random.Random(documents)
+        print(f"{documents} documents x {args.chunks} chunks")
+        with tempfile.TemporaryDirectory() as root:
+            per_document = PerDocumentIndex(embeddings, root=os.path.join(root, "per"))
+            print(f"  build per_document: {build(per_document, documents, args.chunks, embeddings, rng):.1f}s")
+
+            def cold_per_document(document, embedding):
+                retriever_cache.clear()
+                per_document.search([document], embedding, args.k)
+
+            report("per_document cold open+query",
+                   measure(cold_per_document, args.samples, documents, embeddings, rng))
+            report("per_document warm query",
+                   measure(lambda d, e: per_document.search([d], e, args.k),
+                           args.samples, documents, embeddings, rng))
+            retriever_cache.clear()
+
+            started = time.perf_counter()
+            shared = SharedIndex(embeddings, root=os.path.join(root, "shared"))
+            build(shared, documents, args.chunks, embeddings, rng)
+            print(f"  build shared: {time.perf_counter() - started:.1f}s")
+
+            started = time.perf_counter()
+            shared = SharedIndex(embeddings, root=os.path.join(root, "shared"))
+            print(f"  shared cold open (once): {(time.perf_counter() - started) * 1000:.1f}ms")
+            report("shared query",
+                   measure(lambda d, e: shared.search([d], e, args.k),
+                           args.samples, documents, embeddings, rng))
+            report("shared query over 5 documents",
+                   measure(lambda d, e: shared.search(
+                       [d] + [FakeDocument(rng.randint(1, documents)) for _ in range(4)],
+                       e, args.k
+                   ), args.samples, documents, embeddings, rng))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Event-loop lag and answer latency with many concurrent WebSocket clients.
+
+Runs the app under uvicorn in-process against a temporary SQLite database,
+with the hash embedder and a fake LLM, and adds --db-latency-ms to every
+statement to stand in for a network round trip to Postgres. The delay is
+spent where a real round trip would be: in aiosqlite's worker thread for
+async sessions, on the calling thread for sync ones.
+
+``--mode async`` uses the application's async sessions. ``--mode blocking``
+swaps in a synchronous Session executed on the event loop, the way the
+handlers used the database before the async port, for a before/after run.
+
+Usage: python -m benchmarks.bench_ws_load [--clients 200] [--mode blocking]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import time
+
+from benchmarks.fakes import configure_environment
+
+configure_environment("bench_ws_load_")
+
+import aiosqlite  # noqa: E402
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+from langchain.chat_models.fake import FakeListChatModel  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app.database.base import Base, SessionLocal, engine  # noqa: E402
+from app.database.session import get_session_factory  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.document import Document  # noqa: E402
+from app.services.providers import get_qa_service  # noqa: E402
+from benchmarks.synthetic import make_text  # noqa: E402
+
+
+class BlockingSession:
+    """Sync Session behind the async interface, run directly on the event loop.
+
+    Objects are not expired on commit, as with the async sessions, so both
+    modes hold pooled connections equally long and only differ in blocking.
+    """
+
+    def __init__(self):
+        self.session = SessionLocal(expire_on_commit=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.session.close()
+
+    async def execute(self, *args, **kwargs):
+        return self.session.execute(*args, **kwargs)
+
+    async def commit(self):
+        self.session.commit()
+
+
+def seed(rng) -> int:
+    Base.metadata.create_all(engine)
+    os.makedirs(os.environ["EXTRACTED_TEXT_DIR"], exist_ok=True)
+    with SessionLocal() as db:
+        document = Document(filename="bench.pdf", file_path="bench.pdf",
+                            status="ready", content_hash="bench")
+        db.add(document)
+        db.commit()
+        path = os.path.join(os.environ["EXTRACTED_TEXT_DIR"], f"{document.id}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(make_text(rng, 120) for _ in range(50)))
+        document.extracted_text_path = path
+        db.commit()
+        return document.id
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def monitor_lag(lags, stop: asyncio.Event, interval: float = 0.01):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - started - interval)
+
+
+async def client(url: str, document_id: int, questions: int, latencies, errors, rng):
+    async with websockets.connect(url, max_queue=None) as ws:
+        for number in range(questions):
+            started = time.perf_counter()
+            await ws.send(json.dumps({
+                "document_id": document_id,
+                "question": make_text(rng, 8),
+                "request_id": str(number),
+                "stream": True
+            }))
+            while True:
+                message = json.loads(await ws.recv())
+                if "error" in message:
+                    errors.append(message.get("detail") or message["error"])
+                    break
+                if message["type"] == "answer":
+                    latencies.append(time.perf_counter() - started)
+                    break
+
+
+async def run(args):
+    rng = random.Random(0)
+    document_id = seed(rng)
+
+    latency = args.db_latency_ms / 1000
+    event.listen(engine, "before_cursor_execute", lambda *_: time.sleep(latency))
+    execute = aiosqlite.Cursor.execute
+
+    async def delayed_execute(cursor, *execute_args):
+        await cursor._conn._execute(time.sleep, latency)
+        return await execute(cursor, *execute_args)
+
+    aiosqlite.Cursor.execute = delayed_execute
+    if args.mode == "blocking":
+        app.dependency_overrides[get_session_factory] = lambda: BlockingSession
+    get_qa_service().llm = FakeListChatModel(
+        responses=["A benchmark answer."], sleep=args.llm_seconds
+    )
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    url = f"ws://127.0.0.1:{port}/ws/qa/"
+    # Build the document's index before measuring
+    await client(url + "warmup", document_id, 1, [], [], rng)
+
+    lags, latencies, errors, stop = [], [], [], asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        client(url + f"client-{n}", document_id, args.questions, latencies, errors, rng)
+        for n in range(args.clients)
+    ])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    server.should_exit = True
+    await serving
+
+    print(f"mode={args.mode} clients={args.clients} answers={len(latencies)} "
+          f"errors={len(errors)} db_latency={args.db_latency_ms}ms")
+    if errors:
+        print(f"  first error: {errors[0]}")
+    print(f"  throughput: {len(latencies) / elapsed:.1f} answers/s")
+    print(f"  answer latency p50 {statistics.median(latencies) * 1000:.0f}ms "
+          f"p99 {percentile(latencies, 0.99) * 1000:.0f}ms")
+    print(f"  event-loop lag p50 {statistics.median(lags) * 1000:.1f}ms "
+          f"p99 {percentile(lags, 0.99) * 1000:.1f}ms max {max(lags) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--mode", choices=("async", "blocking"), default="async")
+    parser.add_argument("--db-latency-ms", type=float, default=5.0)
+    parser.add_argument("--llm-seconds", type=float, default=0.01,
+                        help="delay per streamed character of the fake LLM")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare two benchmark suite results and flag regressions.
+
+A metric regresses when it moved in its worse direction by more than
+--threshold (relative to the baseline). Exits with status 1 if any metric
+regressed, so it can gate CI.
+
+Usage: python -m benchmarks.compare baseline.json candidate.json [--threshold 0.1]
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def change(baseline: float, candidate: float) -> float:
+    """Relative change from the baseline; 0 when both are 0."""
+    if baseline == 0:
+        return 0.0 if candidate == 0 else float("inf")
+    return (candidate - baseline) / abs(baseline)
+
+
+def compare(baseline: dict, candidate: dict, threshold: float):
+    """Rows of (name, baseline, candidate, change, verdict) for shared metrics."""
+    rows = []
+    for name in sorted(set(baseline["metrics"]) & set(candidate["metrics"])):
+        before = baseline["metrics"][name]
+        after = candidate["metrics"][name]
+        delta = change(before["value"], after["value"])
+        worse = -delta if before["better"] == "higher" else delta
+        if worse > threshold:
+            verdict = "REGRESSION"
+        elif worse < -threshold:
+            verdict = "improved"
+        else:
+            verdict = ""
+        rows.append((name, before, after, delta, verdict))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change tolerated before flagging")
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    print(f"baseline  {baseline.get('revision')} {baseline.get('started_at')}")
+    print(f"candidate {candidate.get('revision')} {candidate.get('started_at')}")
+    if baseline.get("parameters") != candidate.get("parameters"):
+        print("warning: the runs used different parameters")
+    if baseline.get("environment") != candidate.get("environment"):
+        print("warning: the runs used different environments")
+
+    rows = compare(baseline, candidate, args.threshold)
+    print(f"\n{'metric':<34} {'baseline':>12} {'candidate':>12} {'change':>8}")
+    for name, before, after, delta, verdict in rows:
+        print(f"{name:<34} {before['value']:>12.2f} {after['value']:>12.2f} "
+              f"{delta:>+8.1%} {verdict}")
+    for name in sorted(set(baseline["metrics"]) ^ set(candidate["metrics"])):
+        print(f"{name:<34} only in {'baseline' if name in baseline['metrics'] else 'candidate'}")
+
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Local stand-ins for OpenAI, Postgres and storage, so benchmarks run offline.
+
+``configure_environment`` must run before anything under ``app`` is
+imported: settings, engines and storage directories are read at import.
+It points DATABASE_URI at a SQLite file and every storage directory at a
+temporary root. The sync and async engines, and with them ``get_db``, the
+WebSocket session factory and the ingestion workers, all follow
+DATABASE_URI, so no dependency override is needed.
+
+``install_fakes`` then swaps the OpenAI chat model and embedder of the
+app's QAService for deterministic fakes with a configurable latency, standing in
+for the API round trip.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any, List, Optional
+from langchain.chat_models.fake import FakeListChatModel
+from langchain.schema.embeddings import Embeddings
+
+
+def configure_environment(prefix: str = "bench_", **overrides: Any) -> str:
+    """Send the database and all storage to a new temporary directory."""
+    root = tempfile.mkdtemp(prefix=prefix)
+    environment = {
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "benchmark"),
+        "DATABASE_URI": f"sqlite:///{root}/bench.db",
+        "UPLOAD_DIR": f"{root}/pdfs",
+        "EXTRACTED_TEXT_DIR": f"{root}/extracted_text",
+        "VECTORSTORE_DIR": f"{root}/vectorstore",
+        "EMBEDDING_PROVIDER": "hash",
+        "EMBEDDING_CACHE_PATH": f"{root}/embedding_cache.sqlite3",
+        "INGESTION_QUEUE_PATH": f"{root}/ingestion_queue.sqlite3",
+        "ANSWER_CACHE_ENABLED": "false",
+        "RATE_LIMIT_PER_MINUTE": "1000000",
+        "WS_RATE_LIMIT_PER_MINUTE": "1000000",
+    }
+    environment.update({name: str(value) for name, value in overrides.items()})
+    os.environ.update(environment)
+    for name in ("UPLOAD_DIR", "EXTRACTED_TEXT_DIR", "VECTORSTORE_DIR"):
+        os.makedirs(environment[name], exist_ok=True)
+    return root
+
+
+def create_schema():
+    """Create the tables in the benchmark database."""
+    from app.database.base import Base, engine
+    import app.models.document  # noqa: F401  registers the models
+    Base.metadata.create_all(engine)
+
+
+class FakeChatModel(FakeListChatModel):
+    """Deterministic chat model with a fixed latency per call.
+
+    ``latency`` is spent before the first token, like a remote API's time
+    to first byte; ``sleep`` is spent per streamed character.
+    """
+
+    responses: List = ["A benchmark answer."]
+    latency: float = 0.0
+
+    async def _agenerate(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return await super()._agenerate(*args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        async for chunk in super()._astream(*args, **kwargs):
+            yield chunk
+
+
+class FakeEmbeddings(Embeddings):
+    """Hash embeddings behind a fixed per-request latency, like the OpenAI API.
+
+    Each call is one request regardless of the number of texts, so batching
+    pays off the way it does against the real endpoint; ``text_latency``
+    adds a cost per text on top, for benchmarks of how much is embedded.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        dimensions: Optional[int] = None,
+        text_latency: float = 0.0
+    ):
+        from app.services.embeddings import HashEmbeddings
+        self.latency = latency
+        self.text_latency = text_latency
+        self.base = HashEmbeddings(dimensions) if dimensions else HashEmbeddings()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency + self.text_latency * len(texts))
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency + self.text_latency * len(texts))
+        return self.base.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def install_fakes(
+    llm_latency: float = 0.0,
+    token_latency: Optional[float] = None,
+    embedding_latency: float = 0.0,
+    embedding_text_latency: float = 0.0
+):
+    """Give the app's QAService a fake LLM and a fake embedder.
+
+    The embedder keeps the production on-disk cache in front of it when
+    EMBEDDING_CACHE_ENABLED is set, so cache hits are measured as in
+    production.
+    """
+    from app.core.config import get_settings
+    from app.services.embeddings import CachedEmbeddings, get_embedding_cache
+    from app.services.providers import get_qa_service
+
+    settings = get_settings()
+    embeddings = FakeEmbeddings(embedding_latency, text_latency=embedding_text_latency)
+    if settings.EMBEDDING_CACHE_ENABLED:
+        embeddings = CachedEmbeddings(embeddings, get_embedding_cache(), "fake")
+    service = get_qa_service()
+    service.llm = FakeChatModel(latency=llm_latency, sleep=token_latency)
+    service.embeddings = embeddings
+    service.vector_index.embeddings = embeddings
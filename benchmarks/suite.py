@@ -0,0 +1,301 @@
+"""End-to-end benchmark suite against local fakes, with JSON results.
+
+Runs the app under uvicorn in-process on a temporary SQLite database and
+storage root, with a fake LLM and a fake embedder that each add a fixed
+latency per call in place of the OpenAI round trip (see benchmarks.fakes).
+Synthetic PDFs come from PyMuPDF with fixed seeds, so two runs of the same
+revision on the same machine measure the same work.
+
+Scenarios:
+  extraction  pages/second of PDF text extraction
+  upload      uploads accepted/second, and documents/second through ingestion
+  qa          answer latency cold (indexes closed) and warm, over WebSocket
+  websocket   throughput, latency and event-loop lag with N concurrent clients
+
+Results are written as JSON with a direction per metric; compare two runs
+with benchmarks.compare to catch regressions.
+
+Usage: python -m benchmarks.suite [--scenarios qa websocket] [--output run.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fakes import configure_environment
+
+ROOT = configure_environment("bench_suite_")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.lexical_index import get_lexical_index  # noqa: E402
+from app.core.executors import shutdown_executors  # noqa: E402
+from app.services.pdf import PDFService  # noqa: E402
+from app.services.retriever_cache import retriever_cache  # noqa: E402
+from benchmarks.fakes import create_schema, install_fakes  # noqa: E402
+from benchmarks.synthetic import make_pdf, make_text  # noqa: E402
+
+SCENARIOS = ("extraction", "upload", "qa", "websocket")
+
+
+class Results:
+    """Named measurements with a unit and whether higher or lower is better."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name: str, value: float, unit: str, better: str):
+        self.metrics[name] = {"value": round(value, 4), "unit": unit, "better": better}
+        print(f"  {name:<34} {value:>12.2f} {unit}")
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def extraction(args, results: Results):
+    service = PDFService()
+    path = make_pdf(os.path.join(ROOT, "extraction.pdf"), args.extraction_pages)
+    # Start the process pool outside the measurement
+    await service.extract_pages(path)
+    best = float("inf")
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        await service.extract_pages(path)
+        best = min(best, time.perf_counter() - started)
+    results.add("extraction.pages_per_second", args.extraction_pages / best,
+                "pages/s", "higher")
+
+
+async def wait_ready(client: httpx.AsyncClient, document_id: int) -> float:
+    while True:
+        response = await client.get(f"/api/v1/documents/{document_id}/status")
+        status = response.json()["status"]
+        if status == "ready":
+            return time.perf_counter()
+        if status == "failed":
+            raise RuntimeError(f"Ingestion of document {document_id} failed")
+        await asyncio.sleep(0.02)
+
+
+async def upload(args, results: Results, client: httpx.AsyncClient):
+    paths = [
+        make_pdf(os.path.join(ROOT, f"upload_{number}.pdf"), args.pages, seed=number)
+        for number in range(args.documents)
+    ]
+    limit = asyncio.Semaphore(args.upload_concurrency)
+    accepted, ingested = [], []
+
+    async def send(path: str):
+        async with limit:
+            started = time.perf_counter()
+            with open(path, "rb") as f:
+                response = await client.post(
+                    "/api/v1/documents/upload",
+                    files={"file": (os.path.basename(path), f.read(), "application/pdf")}
+                )
+            response.raise_for_status()
+            accepted.append(time.perf_counter())
+        document_id = response.json()["id"]
+        ingested.append(await wait_ready(client, document_id) - started)
+        return document_id
+
+    started = time.perf_counter()
+    document_ids = await asyncio.gather(*[send(path) for path in paths])
+    elapsed = time.perf_counter() - started
+    results.add("upload.accepted_per_second",
+                len(accepted) / (max(accepted) - started), "uploads/s", "higher")
+    results.add("upload.documents_per_second", len(document_ids) / elapsed,
+                "docs/s", "higher")
+    results.add("upload.ingest_ms_p50", statistics.median(ingested) * 1000, "ms", "lower")
+    return list(document_ids)
+
+
+async def ask(ws, document_id: int, question: str, stream: bool = False) -> float:
+    started = time.perf_counter()
+    await ws.send(json.dumps({
+        "document_id": document_id,
+        "question": question,
+        "stream": stream
+    }))
+    while True:
+        message = json.loads(await ws.recv())
+        if "error" in message:
+            raise RuntimeError(message.get("detail") or message["error"])
+        if message["type"] == "answer":
+            return time.perf_counter() - started
+
+
+async def qa(args, results: Results, base_url: str, document_ids, rng):
+    cold, warm = [], []
+    async with websockets.connect(base_url + "qa-latency", max_queue=None) as ws:
+        for document_id in document_ids:
+            # Close every index so the first question reopens them from disk
+            retriever_cache.clear()
+            get_lexical_index().clear()
+            cold.append(await ask(ws, document_id, make_text(rng, 8)))
+            for _ in range(args.questions):
+                warm.append(await ask(ws, document_id, make_text(rng, 8)))
+    results.add("qa.cold_ms_p50", statistics.median(cold) * 1000, "ms", "lower")
+    results.add("qa.warm_ms_p50", statistics.median(warm) * 1000, "ms", "lower")
+    results.add("qa.warm_ms_p95", percentile(warm, 0.95) * 1000, "ms", "lower")
+
+
+async def monitor_lag(lags, stop: asyncio.Event, interval: float = 0.01):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - started - interval)
+
+
+async def websocket(args, results: Results, base_url: str, document_ids, rng):
+    latencies, errors = [], []
+
+    async def client(number: int):
+        document_id = document_ids[number % len(document_ids)]
+        questions = [make_text(rng, 8) for _ in range(args.ws_questions)]
+        async with websockets.connect(base_url + f"client-{number}", max_queue=None) as ws:
+            for question in questions:
+                try:
+                    latencies.append(await ask(ws, document_id, question, stream=True))
+                except RuntimeError as e:
+                    errors.append(str(e))
+
+    lags, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*[client(number) for number in range(args.clients)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    results.add("websocket.answers_per_second", len(latencies) / elapsed,
+                "answers/s", "higher")
+    results.add("websocket.latency_ms_p50", statistics.median(latencies) * 1000,
+                "ms", "lower")
+    results.add("websocket.latency_ms_p99", percentile(latencies, 0.99) * 1000,
+                "ms", "lower")
+    results.add("websocket.loop_lag_ms_p99", percentile(lags, 0.99) * 1000, "ms", "lower")
+    results.add("websocket.errors", len(errors), "errors", "lower")
+
+
+async def run(args) -> Results:
+    results = Results()
+    create_schema()
+    install_fakes(
+        llm_latency=args.llm_latency,
+        token_latency=args.token_latency,
+        embedding_latency=args.embedding_latency
+    )
+    rng = random.Random(args.seed)
+
+    if "extraction" in args.scenarios:
+        print("extraction")
+        await extraction(args, results)
+    if not set(args.scenarios) - {"extraction"}:
+        return results
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=None
+        ) as client:
+            # QA and WebSocket scenarios ask about the uploaded documents, so
+            # the upload runs either way and is only reported when selected
+            print("upload")
+            document_ids = await upload(
+                args, results if "upload" in args.scenarios else Results(), client
+            )
+        base_url = f"ws://127.0.0.1:{port}/ws/qa/"
+        if "qa" in args.scenarios:
+            print("qa")
+            await qa(args, results, base_url, document_ids, rng)
+        if "websocket" in args.scenarios:
+            print("websocket")
+            await websocket(args, results, base_url, document_ids, rng)
+    finally:
+        server.should_exit = True
+        await serving
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--extraction-pages", type=int, default=200)
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20, help="pages per uploaded PDF")
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=10,
+                        help="warm questions per document")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--ws-questions", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.05,
+                        help="seconds before the fake LLM's first token")
+    parser.add_argument("--token-latency", type=float, default=None,
+                        help="seconds per streamed character of the fake LLM")
+    parser.add_argument("--embedding-latency", type=float, default=0.02,
+                        help="seconds per fake embedding request")
+    args = parser.parse_args()
+
+    started = datetime.now(timezone.utc)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutdown_executors()
+
+    report = {
+        "version": 1,
+        "started_at": started.isoformat(),
+        "revision": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parameters": vars(args),
+        "metrics": results.metrics,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"results written to {args.output}")
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Synthetic PDF generation for benchmarks."""
+import random
+from typing import Collection
+import fitz
+
+WORDS = (
+    "agreement party clause termination notice payment invoice liability "
+    "warranty schedule section delivery service term renewal confidential "
+    "information obligation breach remedy governing law jurisdiction fee"
+).split()
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_pdf(
+    path: str,
+    pages: int,
+    lines_per_page: int = 40,
+    seed: int = 0,
+    revised: Collection[int] = ()
+) -> str:
+    """Write a text-only PDF with the given number of pages.
+
+    Pages listed in ``revised`` (0-based) get different text; every other
+    page is identical to the same seed's PDF without revisions.
+    """
+    rng = random.Random(seed)
+    document = fitz.open()
+    for number in range(pages):
+        page = document.new_page()
+        lines = [f"Section {number + 1}"]
+        lines += [make_text(rng, 12) for _ in range(lines_per_page)]
+        if number in revised:
+            revision_rng = random.Random(f"{seed}:{number}")
+            lines = [f"Section {number + 1} (revised)"]
+            lines += [make_text(revision_rng, 12) for _ in range(lines_per_page)]
+        page.insert_text((50, 50), "\n".join(lines), fontsize=9)
+    document.save(path)
+    document.close()
+    return path
+
+
+def make_document_text(rng: random.Random, pages: int, blocks_per_page: int = 8) -> str:
+    """Extracted-text layout: blocks separated by blank lines, pages by form feeds."""
+    return "\f".join(
+        "\n\n".join(
+            make_text(rng, rng.randint(10, 250)) for _ in range(blocks_per_page)
+        )
+        for _ in range(pages)
+    )
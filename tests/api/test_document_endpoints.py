@@ -0,0 +1,223 @@
+import hashlib
+import io
+import json
+import os
+import uuid
+import zipfile
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.endpoints import documents
+from app.core.config import get_settings
+from app.core.executors import Overloaded
+from app.services.ingestion import ingestion_pipeline
+from tests.conftest import make_pdf
+
+settings = get_settings()
+
+
+def post_batch(client, document_id: int, questions: list):
+    return client.post(
+        f"/api/v1/documents/{document_id}/qa:batch", json={"questions": questions}
+    )
+
+
+def test_batch_answers_every_question(client, document_id, fake_llm):
+    fake_llm.responses = [["Within ", "45 ", "days."]]
+    questions = [
+        "When are invoices due?",
+        "What interest do late payments accrue?",
+        "How much notice does termination need?",
+    ]
+
+    response = post_batch(client, document_id, questions)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    # Lines arrive as answers finish; request_id is the question's position
+    assert sorted(line["request_id"] for line in lines) == ["0", "1", "2"]
+    for line in lines:
+        assert line["type"] == "answer"
+        assert line["answer"] == "Within 45 days."
+        assert line["metadata"]["citations"]
+
+
+def test_batch_rejects_too_many_questions(client, document_id):
+    questions = ["When are invoices due?"] * (settings.QA_BATCH_MAX_QUESTIONS + 1)
+    response = post_batch(client, document_id, questions)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "questions"]
+
+
+def test_batch_rejects_empty_batch(client, document_id):
+    assert post_batch(client, document_id, []).status_code == 422
+
+
+def test_batch_unknown_document(client):
+    assert post_batch(client, 999_999, ["When are invoices due?"]).status_code == 404
+
+
+def unique_pdf(label: str) -> bytes:
+    return make_pdf([f"Bulk upload test document {label} {uuid.uuid4()}"])
+
+
+def post_zip(client, archive: bytes):
+    return client.post(
+        "/api/v1/documents/bulk",
+        content=archive,
+        headers={"content-type": "application/zip"}
+    )
+
+
+def zip_of(files) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_bulk_multipart(client):
+    files = [
+        ("files", ("one.pdf", unique_pdf("one"), "application/pdf")),
+        ("files", ("notes.txt", b"not a pdf", "text/plain")),
+        ("files", ("two.pdf", unique_pdf("two"), "application/pdf")),
+    ]
+    response = client.post("/api/v1/documents/bulk", files=files)
+
+    assert response.status_code == 202, response.text
+    manifest = response.json()
+    assert (manifest["queued"], manifest["duplicates"], manifest["rejected"]) == (2, 0, 1)
+    assert [item["filename"] for item in manifest["items"]] == ["one.pdf", "notes.txt", "two.pdf"]
+    assert [item["status"] for item in manifest["items"]] == ["queued", "rejected", "queued"]
+    for item in (manifest["items"][0], manifest["items"][2]):
+        assert client.get(f"/api/v1/documents/{item['document_id']}").status_code == 200
+
+
+def test_bulk_zip_skips_folders_and_archive_metadata(client):
+    archive = zip_of([
+        ("reports/", b""),
+        ("reports/a.pdf", unique_pdf("a")),
+        ("__MACOSX/reports/._a.pdf", b"resource fork"),
+        ("reports/b.pdf", unique_pdf("b")),
+    ])
+    response = post_zip(client, archive)
+
+    assert response.status_code == 202, response.text
+    manifest = response.json()
+    assert [item["filename"] for item in manifest["items"]] == ["reports/a.pdf", "reports/b.pdf"]
+    assert manifest["queued"] == 2
+
+
+def test_bulk_reports_duplicates(client):
+    existing, new = unique_pdf("existing"), unique_pdf("new")
+    first = post_zip(client, zip_of([("existing.pdf", existing)])).json()["items"][0]
+
+    response = post_zip(client, zip_of([
+        ("again.pdf", existing), ("new.pdf", new), ("new-copy.pdf", new)
+    ]))
+
+    assert response.status_code == 202, response.text
+    items = response.json()["items"]
+    assert [item["status"] for item in items] == ["duplicate", "queued", "duplicate"]
+    assert items[0]["document_id"] == first["document_id"]
+    assert items[2]["document_id"] == items[1]["document_id"]
+
+
+def test_bulk_corrupt_zip(client):
+    response = post_zip(client, b"PK\x03\x04 definitely not an archive")
+    assert response.status_code == 400
+    assert "Invalid ZIP archive" in response.json()["detail"]
+
+    # Files before the damage are kept
+    archive = zip_of([("whole.pdf", unique_pdf("whole")), ("cut.pdf", unique_pdf("cut"))])
+    response = post_zip(client, archive[:len(archive) * 3 // 4])
+    assert response.status_code == 202, response.text
+    manifest = response.json()
+    assert [item["filename"] for item in manifest["items"]] == ["whole.pdf"]
+    assert "truncated" in manifest["error"]
+
+
+def test_bulk_refused_when_ingestion_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTION_MAX_PENDING", 0)
+    response = post_zip(client, zip_of([("refused.pdf", unique_pdf("refused"))]))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(settings.INGESTION_RETRY_AFTER)
+
+
+def test_bulk_refused_batch_keeps_earlier_batches(client, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_UPLOAD_BATCH_SIZE", 2)
+    admission = ingestion_pipeline.admission
+    batches = []
+
+    def refuse_second_batch(count=1):
+        batches.append(count)
+        if len(batches) == 2:
+            raise Overloaded("ingestion", 7)
+        return admission(count)
+
+    monkeypatch.setattr(ingestion_pipeline, "admission", refuse_second_batch)
+    files = [(f"{number}.pdf", unique_pdf(str(number))) for number in range(5)]
+    response = post_zip(client, zip_of(files))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    manifest = response.json()
+    assert [item["status"] for item in manifest["items"]] == ["queued"] * 2 + ["rejected"] * 2
+    assert "ingestion queue is full" in manifest["error"]
+    # The rest of the request was not read
+    assert batches == [2, 2]
+
+
+def test_upload_failed_insert_leaves_no_file(client, monkeypatch):
+    async def failing_commit(self):
+        raise IntegrityError("INSERT INTO documents", {}, Exception("duplicate"))
+
+    monkeypatch.setattr(AsyncSession, "commit", failing_commit)
+    data = unique_pdf("failed insert")
+    before = set(os.listdir(settings.UPLOAD_DIR))
+
+    response = client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("failed.pdf", data, "application/pdf")}
+    )
+
+    assert response.status_code == 400
+    # Neither the stored file nor the temporary upload is left behind
+    assert set(os.listdir(settings.UPLOAD_DIR)) == before
+    stored = os.path.join(settings.UPLOAD_DIR, f"{hashlib.sha256(data).hexdigest()}.pdf")
+    assert not os.path.exists(stored)
+
+
+def test_page_endpoint(client, document_id):
+    response = client.get(f"/api/v1/documents/{document_id}/pages/2")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["x-page-count"] == "2"
+    assert "Invoices are payable within 45 days" in response.text
+
+
+def test_page_endpoint_out_of_range(client, document_id):
+    assert client.get(f"/api/v1/documents/{document_id}/pages/3").status_code == 404
+    assert client.get(f"/api/v1/documents/{document_id}/pages/0").status_code == 422
+    assert client.get("/api/v1/documents/999999/pages/1").status_code == 404
+
+
+def test_upload_refused_when_ingestion_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTION_MAX_PENDING", 0)
+    response = client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("refused.pdf", unique_pdf("refused upload"), "application/pdf")}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(settings.INGESTION_RETRY_AFTER)
+
+
+def test_full_executor_answers_503(client, document_id, monkeypatch):
+    async def overloaded(func, *args):
+        raise Overloaded("io", 7)
+
+    monkeypatch.setattr(documents, "run_io", overloaded)
+    response = client.get(f"/api/v1/documents/{document_id}/pages/1")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
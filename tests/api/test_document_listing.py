@@ -0,0 +1,90 @@
+import uuid
+import pytest
+from tests.conftest import make_pdf, wait_ingested
+
+
+@pytest.fixture(scope="module")
+def listed(client):
+    """Prefix shared by five uploaded documents and their ids, newest first."""
+    prefix = f"listing-{uuid.uuid4().hex[:8]}-"
+    ids = []
+    for i in range(5):
+        response = client.post(
+            "/api/v1/documents/upload",
+            files={"file": (
+                f"{prefix}{i}.pdf",
+                make_pdf([f"Listing test document {prefix}{i}"]),
+                "application/pdf"
+            )}
+        )
+        assert response.status_code == 202
+        ids.append(response.json()["id"])
+    for document_id in ids:
+        wait_ingested(client, document_id)
+    return prefix, ids[::-1]
+
+
+def list_documents(client, **params):
+    response = client.get("/api/v1/documents/", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_cursor_pages_cover_every_document_once(client, listed):
+    prefix, ids = listed
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "filename_prefix": prefix}
+        if cursor:
+            params["cursor"] = cursor
+        page = list_documents(client, **params)
+        assert len(page["items"]) <= 2
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    # Uploads within the same second are ordered by id
+    assert seen == ids
+
+
+def test_last_full_page_has_no_cursor(client, listed):
+    prefix, ids = listed
+    page = list_documents(client, limit=len(ids), filename_prefix=prefix)
+    assert [item["id"] for item in page["items"]] == ids
+    assert page["next_cursor"] is None
+
+
+def test_summaries_carry_no_storage_details(client, listed):
+    prefix, _ = listed
+    item = list_documents(client, limit=1, filename_prefix=prefix)["items"][0]
+    assert set(item) == {"id", "filename", "status", "uploaded_at", "file_size", "version"}
+    assert item["filename"].startswith(prefix)
+
+
+def test_status_filter(client, listed):
+    prefix, ids = listed
+    ready = list_documents(client, limit=100, filename_prefix=prefix, status="ready")
+    assert [item["id"] for item in ready["items"]] == ids
+    failed = list_documents(client, limit=100, filename_prefix=prefix, status="failed")
+    assert failed["items"] == []
+
+
+def test_filename_prefix_is_literal(client, listed):
+    # LIKE wildcards in the prefix match only themselves
+    page = list_documents(client, filename_prefix="listing-%")
+    assert page["items"] == []
+
+
+def test_total_estimate(client, listed):
+    prefix, _ = listed
+    assert list_documents(client)["total_estimate"] is None
+    assert list_documents(client, include_total=True)["total_estimate"] >= 5
+    # SQLite does not estimate filtered listings
+    page = list_documents(client, include_total=True, filename_prefix=prefix)
+    assert page["total_estimate"] is None
+
+
+def test_malformed_cursor(client):
+    response = client.get("/api/v1/documents/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,115 @@
+import uuid
+from app.database.base import SessionLocal
+from app.models.document import Document
+from app.services.providers import get_qa_service
+from tests.conftest import make_pdf, wait_ingested
+
+PAGES = [
+    "Section one. The supplier delivers the goods within ten business days.",
+    "Section two. Payment is due within 30 days of the invoice date.",
+    "Section three. Either party may terminate with 60 days written notice.",
+]
+
+
+def upload(client, pages, parent_id=None):
+    url = (f"/api/v1/documents/{parent_id}/versions" if parent_id
+           else "/api/v1/documents/upload")
+    return client.post(url, files={"file": ("terms.pdf", make_pdf(pages), "application/pdf")})
+
+
+def ingest(client, pages, parent_id=None) -> int:
+    response = upload(client, pages, parent_id)
+    assert response.status_code == 202, response.text
+    document_id = response.json()["id"]
+    assert wait_ingested(client, document_id)["status"] == "ready"
+    return document_id
+
+
+def page_text(client, document_id: int, page: int) -> str:
+    response = client.get(f"/api/v1/documents/{document_id}/pages/{page}")
+    assert response.status_code == 200
+    return response.text
+
+
+def revision(marker: str):
+    """v1 pages, and a v2 with page two changed and a page inserted before three."""
+    pages = [f"{page} Reference {marker}." for page in PAGES]
+    revised = [pages[0], pages[1].replace("30 days", "45 days"),
+               f"Section 2a. A new clause {marker}.", pages[2]]
+    return pages, revised
+
+
+def test_new_version_reuses_unchanged_pages_and_vectors(client, monkeypatch):
+    pages, revised = revision(str(uuid.uuid4()))
+    parent_id = ingest(client, pages)
+
+    service = get_qa_service()
+    embed_texts, embedded = service.embed_texts, []
+
+    async def record(texts):
+        embedded.extend(texts)
+        return await embed_texts(texts)
+
+    monkeypatch.setattr(service, "embed_texts", record)
+    document_id = ingest(client, revised, parent_id)
+
+    status = client.get(f"/api/v1/documents/{document_id}/status").json()
+    reuse = status["reuse"]
+    assert (reuse["pages"], reuse["pages_reused"]) == (4, 2)
+    assert 0 < reuse["chunks_reused"] < reuse["chunks"]
+    assert reuse["reused_fraction"] == reuse["chunks_reused"] / reuse["chunks"]
+    # Reported from the document row too, once the job is gone
+    assert client.get(f"/api/v1/documents/{document_id}").json()["reuse"] == reuse
+
+    # Reused text lands on the new page numbers
+    assert page_text(client, document_id, 1) == page_text(client, parent_id, 1)
+    assert page_text(client, document_id, 4) == page_text(client, parent_id, 3)
+    assert "45 days" in page_text(client, document_id, 2)
+    assert "Section 2a" in page_text(client, document_id, 3)
+
+    # Only chunks of the changed and new pages were embedded again
+    assert embedded
+    assert not any("Section one" in text or "Section three" in text for text in embedded)
+
+    versions = client.get(f"/api/v1/documents/{document_id}/versions").json()
+    assert [(version["id"], version["version"]) for version in versions] == [
+        (parent_id, 1), (document_id, 2)
+    ]
+
+
+def test_version_of_replaced_document_conflicts(client):
+    pages, revised = revision(str(uuid.uuid4()))
+    parent_id = ingest(client, pages)
+    document_id = ingest(client, revised, parent_id)
+
+    response = upload(client, [f"Another revision {uuid.uuid4()}"], parent_id)
+    assert response.status_code == 409
+    assert f"document {document_id}" in response.json()["detail"]
+
+
+def test_version_of_unready_document_conflicts(client):
+    with SessionLocal() as db:
+        document = Document(
+            filename="pending.pdf",
+            file_path="pending.pdf",
+            file_size=1,
+            status="pending",
+            content_hash=str(uuid.uuid4()),
+            mime_type="application/pdf"
+        )
+        db.add(document)
+        db.commit()
+        document_id = document.id
+
+    response = upload(client, [f"Revision {uuid.uuid4()}"], document_id)
+    assert response.status_code == 409
+    assert "not ready" in response.json()["detail"]
+
+
+def test_deleting_a_version_unlinks_its_successor(client):
+    pages, revised = revision(str(uuid.uuid4()))
+    parent_id = ingest(client, pages)
+    document_id = ingest(client, revised, parent_id)
+
+    assert client.delete(f"/api/v1/documents/{parent_id}").status_code == 200
+    assert client.get(f"/api/v1/documents/{document_id}").json()["parent_id"] is None
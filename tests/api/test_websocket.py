@@ -0,0 +1,165 @@
+import asyncio
+import time
+import pytest
+from app.api.websockets.qa import ClientConnection, ConnectionManager, broadcast_message, manager
+from app.core.metrics import WEBSOCKET_CONNECTIONS
+from app.schemas.message import QuestionMessage
+
+
+def receive_until_answer(websocket) -> list:
+    """Frames for one question, up to and including the final answer."""
+    frames = []
+    while not frames or frames[-1]["type"] == "answer_delta":
+        frames.append(websocket.receive_json())
+    return frames
+
+
+def test_streamed_tokens_arrive_in_order_before_answer(client, document_id, fake_llm):
+    tokens = ["Either ", "party ", "may ", "terminate ", "with ", "30 ", "days ", "notice."]
+    fake_llm.responses = [tokens]
+
+    with client.websocket_connect("/ws/qa/stream-client") as websocket:
+        websocket.send_json({
+            "document_id": document_id,
+            "question": "How can the agreement be terminated?",
+            "stream": True,
+            "request_id": "q1"
+        })
+        frames = receive_until_answer(websocket)
+
+    *deltas, answer = frames
+    assert answer["type"] == "answer"
+    assert answer["answer"] == "".join(tokens)
+    assert answer["request_id"] == "q1"
+    assert all(frame["request_id"] == "q1" for frame in deltas)
+
+    # Tokens buffered during a send are coalesced, but never split or reordered
+    assert len(deltas) > 1
+    received = [frame["delta"] for frame in deltas]
+    assert "".join(received) == "".join(tokens)
+    boundaries = {len("".join(tokens[:n])) for n in range(len(tokens) + 1)}
+    offset = 0
+    for delta in received:
+        offset += len(delta)
+        assert offset in boundaries
+
+
+def test_answer_without_stream_has_no_deltas(client, document_id, fake_llm):
+    fake_llm.responses = [["Within ", "45 ", "days."]]
+
+    with client.websocket_connect("/ws/qa/plain-client") as websocket:
+        websocket.send_json({
+            "document_id": document_id,
+            "question": "When are invoices due?"
+        })
+        frames = receive_until_answer(websocket)
+
+    assert [frame["type"] for frame in frames] == ["answer"]
+    assert frames[0]["answer"] == "Within 45 days."
+
+
+class RecordingWebSocket:
+    def __init__(self, fail: bool = False):
+        self.sent = []
+        self.fail = fail
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, payload: dict):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        self.sent.append(payload)
+
+
+def open_connections() -> float:
+    return WEBSOCKET_CONNECTIONS.labels().get()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_task_does_not_forget_reused_request_id(monkeypatch):
+    websocket = RecordingWebSocket()
+    connection = ClientConnection(websocket, None, None)
+    finish_cancelled = asyncio.Event()
+
+    async def answer(message, request_id):
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            # Cleanup outlives the cancel, as a closing LLM stream does
+            await finish_cancelled.wait()
+            raise
+
+    monkeypatch.setattr(connection, "answer", answer)
+    message = QuestionMessage(document_id=1, question="When are invoices due?")
+
+    connection.submit(message, "q1")
+    first = connection.in_flight["q1"]
+    await asyncio.sleep(0)
+    await connection.cancel("q1")
+    connection.submit(message, "q1")
+    second = connection.in_flight["q1"]
+
+    finish_cancelled.set()
+    await asyncio.gather(first, return_exceptions=True)
+    assert connection.in_flight == {"q1": second}
+
+    await connection.cancel("q1")
+    await asyncio.gather(second, return_exceptions=True)
+    assert websocket.sent == [
+        {"type": "cancelled", "request_id": "q1"},
+        {"type": "cancelled", "request_id": "q1"},
+    ]
+    assert connection.in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_connections_sharing_a_client_id_are_counted_once_each():
+    connections = ConnectionManager()
+    first, second = RecordingWebSocket(), RecordingWebSocket()
+    before = open_connections()
+
+    await connections.connect(first, "shared")
+    await connections.connect(second, "shared")
+    assert open_connections() == before + 2
+    await connections.send_personal_message({"type": "ping"}, "shared")
+    assert first.sent == second.sent == [{"type": "ping"}]
+
+    connections.disconnect("shared", first)
+    connections.disconnect("shared", first)
+    assert open_connections() == before + 1
+    assert connections.active_connections == {"shared": {second}}
+    connections.disconnect("shared", second)
+    assert open_connections() == before
+    assert connections.active_connections == {}
+
+
+@pytest.mark.asyncio
+async def test_broadcast_failure_then_endpoint_cleanup_decrements_once(monkeypatch):
+    healthy, broken = RecordingWebSocket(), RecordingWebSocket(fail=True)
+    monkeypatch.setattr(manager, "active_connections", {})
+    before = open_connections()
+    await manager.connect(healthy, "healthy")
+    await manager.connect(broken, "broken")
+
+    await broadcast_message({"type": "notice"})
+    assert healthy.sent == [{"type": "notice"}]
+    assert "broken" not in manager.active_connections
+    # The endpoint's finally block disconnects the failed client again
+    manager.disconnect("broken", broken)
+    assert open_connections() == before + 1
+
+    manager.disconnect("healthy", healthy)
+    assert open_connections() == before
+
+
+def test_gauge_returns_to_zero_after_clients_leave(client):
+    before = open_connections()
+    with client.websocket_connect("/ws/qa/same-id"), client.websocket_connect("/ws/qa/same-id"):
+        assert open_connections() == before + 2
+    # The endpoint cleans up after the socket closes
+    for _ in range(100):
+        if open_connections() == before:
+            break
+        time.sleep(0.01)
+    assert open_connections() == before
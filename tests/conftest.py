@@ -0,0 +1,115 @@
+"""Shared fixtures: the app on a temporary database, with a fake LLM.
+
+The environment is configured before anything under ``app`` is imported,
+since settings, engines and storage directories are read at import.
+Embeddings use the offline hash embedder.
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, List
+from benchmarks.fakes import configure_environment
+
+ROOT = configure_environment(
+    "tests_",
+    STARTUP_WARMUP="false",
+    # Always call the LLM; hash embeddings give no meaningful relevance
+    QA_NO_CONTEXT_THRESHOLD="0"
+)
+
+import fakeredis  # noqa: E402
+import fitz  # noqa: E402
+import pytest  # noqa: E402
+import redis.asyncio  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from langchain.chat_models.fake import FakeListChatModel  # noqa: E402
+from langchain.schema.messages import AIMessageChunk  # noqa: E402
+from langchain.schema.output import ChatGenerationChunk  # noqa: E402
+from benchmarks.fakes import create_schema  # noqa: E402
+
+DOCUMENT_TEXT = [
+    "The termination clause allows either party to end the agreement "
+    "with 30 days written notice.",
+    "Invoices are payable within 45 days of receipt. Late payments accrue "
+    "interest at 2% per month.",
+]
+
+
+class FakeStreamingLLM(FakeListChatModel):
+    """Chat model that streams each response as the given list of tokens.
+
+    ``pause`` is spent before each token, as a remote model would, so each
+    one reaches the client as it is produced.
+    """
+
+    responses: List[List[str]] = [["A ", "fake ", "answer."]]
+    pause: float = 0.02
+
+    def _call(self, *args: Any, **kwargs: Any) -> str:
+        return "".join(super()._call(*args, **kwargs))
+
+    async def _astream(self, *args: Any, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = super()._call(*args, **kwargs)
+        for token in tokens:
+            await asyncio.sleep(self.pause)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    document = fitz.open()
+    for text in pages:
+        document.new_page().insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=11)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def wait_ingested(client, document_id: int, timeout: float = 30) -> dict:
+    """The ingestion status once the document is ready or failed."""
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(f"/api/v1/documents/{document_id}/status").json()
+        if status["status"] in ("ready", "failed") or time.monotonic() > deadline:
+            return status
+        time.sleep(0.05)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+    create_schema()
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def document_id(client) -> int:
+    """A two-page PDF uploaded through the API and ingested."""
+    response = client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("contract.pdf", make_pdf(DOCUMENT_TEXT), "application/pdf")}
+    )
+    assert response.status_code == 202, response.text
+    document_id = response.json()["id"]
+    assert wait_ingested(client, document_id)["status"] == "ready"
+    return document_id
+
+
+@pytest.fixture
+def fake_llm():
+    """Replace the QA service's chat model for the duration of a test."""
+    from app.services.providers import get_qa_service
+    service = get_qa_service()
+    original, service.llm = service.llm, FakeStreamingLLM()
+    yield service.llm
+    service.llm = original
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    """A fakeredis server, with Lua scripting, behind redis.asyncio.from_url."""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis.asyncio, "from_url",
+        lambda url: fakeredis.FakeAsyncRedis(server=server)
+    )
+    return server
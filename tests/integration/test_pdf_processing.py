@@ -0,0 +1,91 @@
+import fitz
+import pytest
+from app.core.config import get_settings
+from app.core.executors import get_executor
+from app.services.pdf import (
+    PDFService,
+    extract_page_numbers,
+    extract_page_range,
+    page_fingerprints,
+    page_ranges
+)
+
+settings = get_settings()
+
+
+def write_pdf(path, pages, form_text=None, rotation=0):
+    """A PDF with one text page per entry, then a page drawing a Form XObject."""
+    document = fitz.open()
+    for text in pages:
+        page = document.new_page()
+        page.insert_text((72, 72), text)
+        page.set_rotation(rotation)
+    if form_text is not None:
+        source = fitz.open()
+        source.new_page().insert_text((72, 72), form_text)
+        page = document.new_page()
+        page.show_pdf_page(page.rect, source, 0)
+    document.save(path)
+    return str(path)
+
+
+def test_fingerprints_match_unchanged_pages(tmp_path):
+    first = page_fingerprints(write_pdf(tmp_path / "1.pdf", ["one", "two"], "form"))
+    second = page_fingerprints(write_pdf(tmp_path / "2.pdf", ["one", "changed"], "form"))
+    assert len(first) == 3
+    assert first[0] == second[0]
+    assert first[1] != second[1]
+    assert first[2] == second[2]
+
+
+def test_fingerprints_follow_form_xobjects(tmp_path):
+    first = page_fingerprints(write_pdf(tmp_path / "1.pdf", ["one"], "Payment in 30 days"))
+    second = page_fingerprints(write_pdf(tmp_path / "2.pdf", ["one"], "Payment in 45 days"))
+    assert first[0] == second[0]
+    assert first[1] != second[1]
+
+
+def test_fingerprints_include_rotation(tmp_path):
+    upright = page_fingerprints(write_pdf(tmp_path / "1.pdf", ["one"]))
+    rotated = page_fingerprints(write_pdf(tmp_path / "2.pdf", ["one"], rotation=90))
+    assert upright != rotated
+
+
+def test_page_ranges_cover_pages_in_order():
+    for page_count, shards in [(10, 3), (10, 4), (3, 8), (1, 1), (7, 0)]:
+        ranges = page_ranges(page_count, shards)
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == page_count
+        assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
+        assert len(ranges) <= max(shards, 1)
+    assert page_ranges(0, 4) == []
+
+
+def test_extract_page_range(tmp_path):
+    path = write_pdf(tmp_path / "1.pdf", [f"page {i}" for i in range(5)])
+    assert extract_page_range(path) == [f"page {i}" for i in range(5)]
+    assert extract_page_range(path, 1, 3) == ["page 1", "page 2"]
+    assert extract_page_numbers(path, [4, 0]) == ["page 4", "page 0"]
+
+
+@pytest.fixture
+def sharded(monkeypatch):
+    """Shard extraction of any document over two workers."""
+    monkeypatch.setattr(settings, "PDF_PARALLEL_PAGE_THRESHOLD", 2)
+    monkeypatch.setattr(get_executor("cpu"), "workers", 2)
+
+
+@pytest.mark.asyncio
+async def test_sharded_extraction_keeps_page_order(tmp_path, sharded):
+    texts = [f"page {i}" for i in range(9)]
+    path = write_pdf(tmp_path / "1.pdf", texts)
+    assert await PDFService().extract_pages(path) == texts
+
+
+@pytest.mark.asyncio
+async def test_sharded_extraction_fills_in_known_pages(tmp_path, sharded):
+    texts = [f"page {i}" for i in range(9)]
+    path = write_pdf(tmp_path / "1.pdf", texts)
+    known = {0: "known 0", 4: "known 4", 8: "known 8"}
+    pages = await PDFService().extract_pages(path, known)
+    assert pages == [known.get(number, text) for number, text in enumerate(texts)]
@@ -0,0 +1,109 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.database.base import SessionLocal
+from app.models.document import Document
+from app.services.answer_cache import AnswerCache
+from app.services.qa import QAService
+from tests.conftest import FakeStreamingLLM
+
+
+class SlowBuilds:
+    """Index builds that take a while, the first one failing."""
+
+    def __init__(self):
+        self.indexed = False
+        self.active = 0
+        self.most_active = 0
+        self.builds = 0
+
+    async def embed_texts(self, texts):
+        self.builds += 1
+        self.active += 1
+        self.most_active = max(self.most_active, self.active)
+        try:
+            await asyncio.sleep(0.05)
+            if self.builds == 1:
+                raise RuntimeError("embedding provider unavailable")
+            return []
+        finally:
+            self.active -= 1
+
+    def persist_vectorstore(self, document_id, chunks, vectors):
+        self.indexed = True
+
+
+@pytest.fixture
+def slow_builds(monkeypatch):
+    service = QAService()
+    builds = SlowBuilds()
+
+    async def no_chunks(text_path):
+        return []
+
+    monkeypatch.setattr(service, "_is_indexed", lambda document: builds.indexed)
+    monkeypatch.setattr(service, "vector_index", SimpleNamespace(contains=lambda d: False))
+    monkeypatch.setattr(service, "load_or_split_chunks", no_chunks)
+    monkeypatch.setattr(service, "embed_texts", builds.embed_texts)
+    monkeypatch.setattr(service, "persist_vectorstore", builds.persist_vectorstore)
+    return service, builds
+
+
+@pytest.mark.asyncio
+async def test_index_builds_of_a_document_never_overlap(slow_builds):
+    service, builds = slow_builds
+    document = SimpleNamespace(id=1, extracted_text_path="1.pages")
+
+    first = asyncio.ensure_future(service._ensure_indexed(document))
+    await asyncio.sleep(0.01)
+    second = asyncio.ensure_future(service._ensure_indexed(document))
+    # Arrives after the first build failed, while the second one runs
+    await asyncio.sleep(0.07)
+    third = asyncio.ensure_future(service._ensure_indexed(document))
+
+    results = await asyncio.gather(first, second, third, return_exceptions=True)
+
+    assert isinstance(results[0], RuntimeError)
+    assert results[1:] == [None, None]
+    assert builds.most_active == 1
+    assert builds.builds == 2
+    assert service._build_locks == {}
+
+
+class RecordingEmbeddings:
+    """Embeddings that remember the texts of each batch call."""
+
+    def __init__(self, base):
+        self.base = base
+        self.batches = []
+
+    async def aembed_documents(self, texts):
+        self.batches.append(list(texts))
+        return await self.base.aembed_documents(texts)
+
+    async def aembed_query(self, text):
+        return await self.base.aembed_query(text)
+
+
+@pytest.mark.asyncio
+async def test_batch_embeds_normalized_questions_for_the_cache(document_id, monkeypatch):
+    service = QAService()
+    service.llm = FakeStreamingLLM()
+    service.answer_cache = AnswerCache()
+    embeddings = RecordingEmbeddings(service.embeddings)
+    monkeypatch.setattr(service, "embeddings", embeddings)
+    with SessionLocal() as db:
+        document = db.get(Document, document_id)
+    questions = ["What's the NOTICE period?", "How late may invoices be paid?"]
+
+    answers = [answer async for answer in service.answer_batch(document, questions)]
+
+    assert sorted(number for number, _ in answers) == [0, 1]
+    assert all(not isinstance(answer, Exception) for _, answer in answers)
+    # One call: cache vectors of the normalized questions, search vectors of the originals
+    assert embeddings.batches == [[
+        "what is the notice period",
+        "how late may invoices be paid",
+        "What's the NOTICE period?",
+        "How late may invoices be paid?",
+    ]]
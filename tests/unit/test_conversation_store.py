@@ -0,0 +1,144 @@
+from types import SimpleNamespace
+import json
+import pytest
+from app.core.config import get_settings
+from app.services import conversation_store
+from app.services.conversation_store import (
+    MemoryConversationStore,
+    RedisConversationStore,
+    extractive_summary
+)
+
+settings = get_settings()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_store(request):
+    """Build a store of either backend with the given limits."""
+    if request.param == "redis":
+        request.getfixturevalue("redis_server")
+
+    def make(max_entries=100, **limits):
+        if request.param == "memory":
+            return MemoryConversationStore(max_entries=max_entries, **limits)
+        return RedisConversationStore("redis://fake", max_entries=max_entries, **limits)
+    return make
+
+
+def payload_size(conversation) -> int:
+    return len(conversation.to_json().encode("utf-8"))
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_conversation_is_evicted(make_store):
+    store = make_store(max_entries=2)
+    await store.append("a", "Question a?", "Answer a.")
+    await store.append("b", "Question b?", "Answer b.")
+    await store.append("a", "Again a?", "Answer again.")
+    await store.append("c", "Question c?", "Answer c.")
+
+    assert (await store.get("b")).turns == []
+    assert (await store.get("a")).turns == [("Question a?", "Answer a."), ("Again a?", "Answer again.")]
+    assert (await store.stats())["conversations"] == 2
+
+
+@pytest.mark.asyncio
+async def test_byte_counter_follows_saves_and_deletes(make_store):
+    store = make_store()
+    first = await store.append("a", "Question a?", "Answer a.")
+    second = await store.append("b", "Question b?", "A longer answer to b.")
+    first = await store.append("a", "Another question?", "Another answer.")
+    assert (await store.stats())["bytes"] == payload_size(first) + payload_size(second)
+
+    await store.delete("a")
+    await store.delete("a")
+    assert (await store.stats())["bytes"] == payload_size(second)
+    await store.delete("b")
+    assert (await store.stats())["bytes"] == 0
+    assert (await store.get("b")).turns == []
+
+
+@pytest.mark.asyncio
+async def test_history_stays_within_max_turns(make_store):
+    store = make_store(max_turns=2)
+    for number in range(4):
+        conversation = await store.append("a", f"Question {number}?", f"Answer {number}.")
+    assert [question for question, _ in conversation.turns] == ["Question 2?", "Question 3?"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("question_size, answer_size", [(10, 5000), (5000, 10), (5000, 5000)])
+async def test_oversized_turn_is_cut_to_max_bytes(make_store, question_size, answer_size):
+    store = make_store(max_bytes=500)
+    await store.append("a", "A short question?", "A short answer.")
+    question, answer = "q" * question_size, "é" * answer_size
+    await store.append("a", question, answer)
+
+    stored = await store.get("a")
+    assert payload_size(stored) <= 500
+    last_question, last_answer = stored.turns[-1]
+    assert question.startswith(last_question) and answer.startswith(last_answer)
+    if question_size < 500:
+        assert last_question == question
+
+
+@pytest.mark.asyncio
+async def test_older_turns_are_summarized(make_store, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_CONTEXT_TURNS", 1)
+    store = make_store(summarize_after=2)
+    await store.append("a", "What is the notice period?", "It is 60 days. Notice is written.")
+    await store.append("a", "When is payment due?", "Within 30 days. Late fees apply.")
+    conversation = await store.append("a", "Who delivers?", "The supplier.")
+
+    assert conversation.turns == [("Who delivers?", "The supplier.")]
+    assert conversation.summary == (
+        "What is the notice period? -> It is 60 days.\n"
+        "When is payment due? -> Within 30 days."
+    )
+    assert (await store.get("a")).context(1) == [
+        (None, conversation.summary), ("Who delivers?", "The supplier.")
+    ]
+    assert store.summaries == 1
+
+
+@pytest.mark.asyncio
+async def test_no_context_turns_summarizes_every_turn(make_store, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_CONTEXT_TURNS", 0)
+    store = make_store(summarize_after=1)
+    await store.append("a", "First?", "One.")
+    conversation = await store.append("a", "Second?", "Two.")
+
+    assert conversation.turns == []
+    assert conversation.summary == "First? -> One.\nSecond? -> Two."
+    assert conversation.context(0) == [(None, conversation.summary)]
+
+
+@pytest.mark.asyncio
+async def test_custom_summarizer_is_used(make_store, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_CONTEXT_TURNS", 1)
+    calls = []
+
+    async def summarize(summary, turns):
+        calls.append(turns)
+        return await extractive_summary(summary, turns)
+
+    store = make_store(summarize_after=1)
+    await store.append("a", "First?", "One.", summarize)
+    await store.append("a", "Second?", "Two.", summarize)
+    assert calls == [[("First?", "One.")]]
+
+
+@pytest.mark.asyncio
+async def test_redis_expired_conversations_are_swept(redis_server, monkeypatch):
+    store = RedisConversationStore("redis://fake", ttl=60)
+    clock = [1_000_000.0]
+    monkeypatch.setattr(conversation_store, "time", SimpleNamespace(time=lambda: clock[0]))
+    await store.append("old", "Question?", "Answer.")
+    clock[0] += 61
+    await store.append("new", "Question?", "Answer.")
+
+    stats = await store.stats()
+    assert stats["conversations"] == 1
+    assert stats["bytes"] == len(json.dumps(
+        {"summary": "", "turns": [["Question?", "Answer."]]}
+    ).encode("utf-8"))
@@ -0,0 +1,87 @@
+import threading
+import pytest
+from langchain.schema.embeddings import Embeddings
+from app.services.embeddings import CachedEmbeddings, EmbeddingCache, HashEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Hash embeddings that record every batch sent to them."""
+
+    def __init__(self):
+        self.base = HashEmbeddings(256)
+        self.batches = []
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return self.base.embed_query(text)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+
+
+def cached_embeddings(cache, batch_size=10):
+    return CachedEmbeddings(CountingEmbeddings(), cache, "counting", batch_size, 2)
+
+
+def test_duplicates_are_embedded_once(cache):
+    embeddings = cached_embeddings(cache)
+    vectors = embeddings.embed_documents(["alpha", "beta", "alpha"])
+
+    assert embeddings.base.batches == [["alpha", "beta"]]
+    assert vectors[0] == vectors[2] != vectors[1]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["api_calls"]) == (1, 2, 1)
+
+
+def test_cached_texts_are_not_embedded_again(cache, tmp_path):
+    first = cached_embeddings(cache).embed_documents(["alpha", "beta"])
+
+    # A new process opening the same file finds them too
+    reopened = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    embeddings = cached_embeddings(reopened)
+    vectors = embeddings.embed_documents(["beta", "gamma", "alpha"])
+    assert (vectors[0], vectors[2]) == (first[1], first[0])
+    assert embeddings.base.batches == [["gamma"]]
+    assert (reopened.hits, reopened.misses) == (2, 1)
+
+
+def test_missing_texts_are_embedded_in_batches(cache):
+    embeddings = cached_embeddings(cache, batch_size=2)
+    texts = [f"text {number}" for number in range(5)]
+    vectors = embeddings.embed_documents(texts)
+
+    assert sorted(map(len, embeddings.base.batches)) == [1, 2, 2]
+    assert vectors == embeddings.embed_documents(texts)
+    assert cache.api_calls == 3
+
+
+@pytest.mark.asyncio
+async def test_async_path_dedupes_batches_and_caches(cache):
+    embeddings = cached_embeddings(cache, batch_size=2)
+    texts = ["a", "b", "c", "a", "d", "e"]
+    vectors = await embeddings.aembed_documents(texts)
+
+    assert sorted(text for batch in embeddings.base.batches for text in batch) == list("abcde")
+    assert max(map(len, embeddings.base.batches)) == 2
+    assert vectors == embeddings.embed_documents(texts)
+    assert len(embeddings.base.batches) == 3
+
+
+@pytest.mark.asyncio
+async def test_queries_bypass_the_cache(cache):
+    embeddings = cached_embeddings(cache)
+    vector = embeddings.embed_query("What is the notice period?")
+    assert await embeddings.aembed_query("What is the notice period?") == vector
+
+    assert embeddings.base.queries == ["What is the notice period?"] * 2
+    assert cache.get_many([EmbeddingCache.key("counting", "What is the notice period?")]) == {}
+    assert (cache.hits, cache.misses, cache.api_calls) == (0, 0, 0)
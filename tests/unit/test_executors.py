@@ -0,0 +1,94 @@
+from app.core.executors import BULK, INTERACTIVE, BoundedExecutor, Overloaded, priority
+import asyncio
+import threading
+import uuid
+import pytest
+
+
+def make_executor(max_queue: int = 8) -> BoundedExecutor:
+    # Each executor registers its own queue gauges
+    return BoundedExecutor(f"test_{uuid.uuid4().hex[:8]}", "thread", 1, max_queue)
+
+
+async def occupy(executor: BoundedExecutor) -> threading.Event:
+    """Hold the executor's only slot until the returned event is set."""
+    release = threading.Event()
+    asyncio.ensure_future(executor.run(release.wait))
+    while executor._running == 0:
+        await asyncio.sleep(0)
+    return release
+
+
+async def submit(executor: BoundedExecutor, level: int, label: str, order: list):
+    with priority(level):
+        task = asyncio.ensure_future(executor.run(order.append, label))
+    await asyncio.sleep(0)
+    return task
+
+
+@pytest.mark.asyncio
+async def test_interactive_work_runs_before_bulk():
+    executor = make_executor()
+    release = await occupy(executor)
+    order = []
+    tasks = [
+        await submit(executor, BULK, "bulk 1", order),
+        await submit(executor, BULK, "bulk 2", order),
+        await submit(executor, INTERACTIVE, "interactive 1", order),
+        await submit(executor, INTERACTIVE, "interactive 2", order),
+    ]
+    assert executor.queued(BULK) == 2
+    assert executor.queued(INTERACTIVE) == 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+    # Interactive work first, each level in arrival order
+    assert order == ["interactive 1", "interactive 2", "bulk 1", "bulk 2"]
+    assert executor.queued() == 0
+    assert executor._running == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_full_interactive_queue_is_refused():
+    executor = make_executor(max_queue=1)
+    release = await occupy(executor)
+    order = []
+    queued = await submit(executor, INTERACTIVE, "queued", order)
+
+    with pytest.raises(Overloaded) as refused:
+        await executor.run(order.append, "refused")
+    assert refused.value.queue == executor.name
+    assert refused.value.retry_after >= 1
+
+    # Bulk work waits rather than being refused
+    bulk = await submit(executor, BULK, "bulk", order)
+    release.set()
+    await asyncio.gather(queued, bulk)
+    assert order == ["queued", "bulk"]
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    executor = make_executor()
+    release = await occupy(executor)
+    order = []
+    cancelled = await submit(executor, INTERACTIVE, "cancelled", order)
+    kept = await submit(executor, INTERACTIVE, "kept", order)
+
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    assert executor.queued() == 1
+
+    release.set()
+    await kept
+    assert order == ["kept"]
+    assert executor._running == 0
+    executor.shutdown()
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        BoundedExecutor("test_unknown", "fiber", 1, 1)
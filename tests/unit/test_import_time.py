@@ -0,0 +1,39 @@
+"""``import app.main`` stays within its budget and leaves heavy deps lazy."""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from benchmarks.bench_import_time import HEAVY_MODULES
+
+ROOT = Path(__file__).resolve().parents[2]
+BUDGET_MS = 1500
+REPEAT = 3
+
+SCRIPT = (
+    "import time; started = time.perf_counter(); import app.main, json, sys; "
+    "print(json.dumps([time.perf_counter() - started, sorted(sys.modules)]))"
+)
+
+
+def import_app(tmp_path):
+    """Seconds ``import app.main`` took in a fresh interpreter, and the modules loaded."""
+    env = {**os.environ, "DATABASE_URI": f"sqlite:///{tmp_path}/test.db"}
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        capture_output=True, text=True, env=env, cwd=ROOT
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_import_within_budget(tmp_path):
+    # Best of a few runs, so a busy machine does not fail the test
+    best = min(import_app(tmp_path)[0] for _ in range(REPEAT))
+    assert best * 1000 <= BUDGET_MS, f"import app.main took {best * 1000:.0f}ms"
+
+
+def test_import_leaves_heavy_modules_lazy(tmp_path):
+    _, modules = import_app(tmp_path)
+    heavy = sorted(name for name in modules if name in HEAVY_MODULES)
+    assert heavy == [], f"imported eagerly: {', '.join(heavy)}"
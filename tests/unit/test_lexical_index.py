@@ -0,0 +1,118 @@
+from langchain.schema import Document as LCDocument
+from app.services.lexical_index import (
+    LexicalIndex,
+    build_index,
+    load_index,
+    reciprocal_rank_fusion,
+    term_coverage,
+    tokenize
+)
+from app.utils.text_processing import Chunk
+import pytest
+
+CHUNKS = [
+    Chunk("Invoices are payable within 45 days of receipt.", 1, 0, 48),
+    Chunk("Late payments accrue interest at 2% per month under clause 12.3.", 1, 50, 114),
+    Chunk("Either party may terminate with 30 days written notice.", 2, 116, 171),
+    Chunk("Résumé of part AB-1234: the invoice template.", 2, 173, 218),
+]
+
+
+def test_tokenize_drops_stopwords_and_lowercases():
+    assert tokenize("What is the Termination notice?") == ["termination", "notice"]
+
+
+def test_tokenize_keeps_compound_tokens_and_their_parts():
+    assert tokenize("See clause 12.3 and part AB-1234/x") == [
+        "see", "clause", "12.3", "12", "3", "part", "ab-1234/x", "ab", "1234", "x"
+    ]
+
+
+def test_term_coverage():
+    assert term_coverage("invoice payment terms", "Payment terms of every invoice") == 1.0
+    assert term_coverage("invoice payment terms", "The invoice") == pytest.approx(1 / 3)
+    assert term_coverage("what is the", "anything") == 0.0
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = str(tmp_path / "1.bm25")
+    build_index(path, CHUNKS)
+    return path
+
+
+def test_index_round_trip(index_path):
+    index = load_index(index_path)
+    assert index.chunk_count == len(CHUNKS)
+    for number, chunk in enumerate(CHUNKS):
+        assert index.chunk(number).to_dict() == chunk.to_dict()
+
+
+def test_search_ranks_matching_chunks(index_path):
+    index = load_index(index_path)
+    results = index.search("interest on late payments", k=2)
+    assert results[0][0] == 1
+    assert len(results) == 1
+    # Compound tokens are searchable whole or by part
+    assert index.search("clause 12.3", k=1)[0][0] == 1
+    assert index.search("ab-1234", k=1)[0][0] == 3
+    assert index.search("unrelated words", k=3) == []
+
+
+def test_not_an_index(tmp_path):
+    path = tmp_path / "1.bm25"
+    path.write_bytes(b"not an index at all")
+    with pytest.raises(ValueError):
+        load_index(str(path))
+
+
+def test_lexical_index_merges_documents(tmp_path):
+    index = LexicalIndex(root=str(tmp_path))
+    index.add_document(1, CHUNKS[:2])
+    index.add_document(2, CHUNKS[2:])
+
+    results = index.search([1, 2, 3], "invoice payable notice", k=3)
+    documents = {(document.metadata["document_id"], document.metadata["chunk"])
+                 for document, _ in results}
+    assert documents >= {(1, 0), (2, 0)}
+    assert [score for _, score in results] == sorted(
+        (score for _, score in results), reverse=True
+    )
+
+    index.delete_document(1)
+    assert not index.contains(1)
+    assert all(document.metadata["document_id"] == 2
+               for document, _ in index.search([1, 2], "invoice notice", k=3))
+
+
+def ranked(*texts):
+    return [
+        (LCDocument(page_content=text, metadata={"document_id": 1}), 1.0)
+        for text in texts
+    ]
+
+
+def test_rrf_rewards_agreement():
+    fused = reciprocal_rank_fusion(
+        [(ranked("a", "b", "c"), 1.0), (ranked("b", "d"), 1.0)], k=4, rank_constant=60
+    )
+    texts = [document.page_content for document, _ in fused]
+    assert texts[0] == "b"
+    assert set(texts) == {"a", "b", "c", "d"}
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_rrf_weights_and_limit():
+    fused = reciprocal_rank_fusion(
+        [(ranked("a"), 1.0), (ranked("b"), 3.0)], k=1, rank_constant=60
+    )
+    assert [(document.page_content, score) for document, score in fused] == \
+        [("b", pytest.approx(3 / 61))]
+
+
+def test_rrf_keeps_documents_apart():
+    same_text = [
+        (LCDocument(page_content="a", metadata={"document_id": 1}), 1.0),
+        (LCDocument(page_content="a", metadata={"document_id": 2}), 1.0),
+    ]
+    assert len(reciprocal_rank_fusion([(same_text, 1.0)], k=5)) == 2
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+import pytest
+from app.core import rate_limiter
+from app.core.rate_limiter import InMemoryRateLimitBackend, RedisRateLimitBackend
+
+WINDOW = 60
+# 10 seconds into a window
+START = 1_000_000 * WINDOW + 10
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [START]
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+async def hit_until_rejected(backend, key: str, max_requests: int):
+    results = [await backend.hit(key, max_requests, WINDOW) for _ in range(max_requests + 1)]
+    assert [result.allowed for result in results] == [True] * max_requests + [False]
+    assert [result.remaining for result in results] == list(range(max_requests - 1, -1, -1)) + [0]
+    return results[-1]
+
+
+@pytest.mark.asyncio
+async def test_redis_script_limits_within_window(clock, redis_server):
+    backend = RedisRateLimitBackend("redis://fake")
+    rejected = await hit_until_rejected(backend, "api:client", 5)
+
+    # The window ends after 50s; 4 of its 5 hits then fit after 12s more
+    assert rejected.retry_after == 62
+    clock[0] = START + 61
+    assert not (await backend.hit("api:client", 5, WINDOW)).allowed
+    clock[0] = START + 62
+    assert (await backend.hit("api:client", 5, WINDOW)).allowed
+
+
+@pytest.mark.asyncio
+async def test_redis_counters_are_shared_between_backends(clock, redis_server):
+    first = RedisRateLimitBackend("redis://fake")
+    second = RedisRateLimitBackend("redis://fake")
+    for _ in range(3):
+        assert (await first.hit("api:client", 5, WINDOW)).allowed
+    assert (await second.hit("api:client", 5, WINDOW)).remaining == 1
+    assert (await second.hit("api:client", 5, WINDOW)).allowed
+    assert not (await first.hit("api:client", 5, WINDOW)).allowed
+    # Other keys have their own counters
+    assert (await second.hit("api:other", 5, WINDOW)).allowed
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend_type", ["memory", "redis"])
+async def test_retry_after_waits_for_previous_window_to_slide_out(
+    backend_type, clock, redis_server
+):
+    backend = (
+        InMemoryRateLimitBackend() if backend_type == "memory"
+        else RedisRateLimitBackend("redis://fake")
+    )
+    clock[0] = START + 40  # 50s into the previous window
+    for _ in range(4):
+        assert (await backend.hit("api:client", 5, WINDOW)).allowed
+
+    # 6s into the next window: 4 * 0.9 + 1 leaves no room for a second request
+    clock[0] = START + 56
+    assert (await backend.hit("api:client", 5, WINDOW)).allowed
+    rejected = await backend.hit("api:client", 5, WINDOW)
+    assert not rejected.allowed
+    assert rejected.retry_after == 9
+
+    clock[0] = START + 64
+    assert not (await backend.hit("api:client", 5, WINDOW)).allowed
+    clock[0] = START + 65
+    assert (await backend.hit("api:client", 5, WINDOW)).allowed
+
+
+def test_retry_after_rounds_up_to_whole_seconds():
+    allowed, remaining, retry_after = rate_limiter.sliding_window(0, 5, 59.99, WINDOW, 5)
+    assert (allowed, remaining) == (False, 0)
+    assert retry_after == 13
+    assert rate_limiter.sliding_window(5, 4, 59.99, WINDOW, 5)[2] == 1
+
+
+class FailingBackend:
+    async def hit(self, key, max_requests, window_size):
+        raise ConnectionError("Redis is down")
+
+
+@pytest.mark.asyncio
+async def test_backend_errors_fail_open_and_are_logged(caplog):
+    limiter = rate_limiter.RateLimiter(FailingBackend())
+    with caplog.at_level("WARNING", logger="app.core.rate_limiter"):
+        result = await limiter.hit("api:client", 5)
+    assert result.allowed
+    assert "Rate limiter backend error" in caplog.text
+    assert "Redis is down" in caplog.text
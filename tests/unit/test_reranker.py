@@ -0,0 +1,97 @@
+from langchain.schema import Document as LCDocument
+from app.core.config import get_settings
+from app.services.reranker import LexicalReranker, Reranker, create_reranker, estimate_tokens
+import pytest
+
+settings = get_settings()
+
+
+class FixedReranker(Reranker):
+    """Scores candidates by their retrieval relevance."""
+
+    async def score(self, question, candidates):
+        return [relevance for _, relevance in candidates]
+
+
+def candidate(text: str, relevance: float):
+    return (LCDocument(page_content=text, metadata={"document_id": 1}), relevance)
+
+
+def texts(selected):
+    return [document.page_content for document, _ in selected]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+@pytest.mark.asyncio
+async def test_select_orders_by_score_and_keeps_k():
+    candidates = [candidate("c", 0.7), candidate("a", 0.9), candidate("b", 0.8)]
+    selected = await FixedReranker().select(
+        "question", candidates, k=2, token_budget=100, min_relative_score=0
+    )
+    assert texts(selected) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_select_skips_chunks_over_the_budget():
+    candidates = [
+        candidate("x" * 40, 0.9),  # 10 tokens
+        candidate("y" * 80, 0.8),  # 20 tokens, over the remaining budget
+        candidate("z" * 20, 0.7),  # 5 tokens, still fits
+    ]
+    selected = await FixedReranker().select(
+        "question", candidates, k=3, token_budget=16, min_relative_score=0
+    )
+    assert texts(selected) == ["x" * 40, "z" * 20]
+
+
+@pytest.mark.asyncio
+async def test_select_always_keeps_the_best_chunk():
+    candidates = [candidate("x" * 400, 0.9), candidate("y", 0.8)]
+    selected = await FixedReranker().select(
+        "question", candidates, k=2, token_budget=10, min_relative_score=0
+    )
+    assert texts(selected) == ["x" * 400]
+
+
+@pytest.mark.asyncio
+async def test_select_drops_chunks_far_below_the_best():
+    candidates = [candidate("a", 1.0), candidate("b", 0.6), candidate("c", 0.4)]
+    selected = await FixedReranker().select(
+        "question", candidates, k=3, token_budget=100, min_relative_score=0.5
+    )
+    assert texts(selected) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_select_without_candidates():
+    assert await FixedReranker().select("question", [], k=3) == []
+
+
+@pytest.mark.asyncio
+async def test_lexical_reranker_prefers_matching_chunks():
+    candidates = [
+        candidate("Either party may terminate with 30 days notice.", 0.9),
+        candidate("Late payments accrue interest at 2% per month.", 0.5),
+        candidate("The agreement is governed by Delaware law.", 0.8),
+    ]
+    reranker = LexicalReranker(lexical_weight=0.7)
+    scores = await reranker.score("What interest do late payments accrue?", candidates)
+    assert len(scores) == 3
+    assert scores.index(max(scores)) == 1
+    # No shared terms: only the weighted retrieval relevance remains
+    assert scores[2] == pytest.approx(0.3 * 0.8)
+
+
+def test_create_reranker(monkeypatch):
+    monkeypatch.setattr(settings, "RERANKER", "lexical")
+    assert isinstance(create_reranker(), LexicalReranker)
+    monkeypatch.setattr(settings, "RERANKER", "none")
+    assert create_reranker() is None
+    monkeypatch.setattr(settings, "RERANKER", "missing")
+    with pytest.raises(ValueError):
+        create_reranker()
@@ -0,0 +1,92 @@
+from app.utils.text_processing import (
+    BLOCK_SEPARATOR,
+    PAGE_SEPARATOR,
+    Chunk,
+    PageChunker,
+    load_chunks,
+    page_text,
+    save_chunks
+)
+import pytest
+
+BLOCKS = [
+    "Section 1. Payment terms apply to every invoice.",
+    "Invoices are payable within 45 days of receipt.",
+    "Late payments accrue interest at 2% per month.",
+    "Section 2. Either party may terminate with notice.",
+]
+
+
+def document(pages):
+    return PAGE_SEPARATOR.join(pages)
+
+
+def test_offsets_point_into_the_document_text():
+    pages = [BLOCK_SEPARATOR.join(BLOCKS), "  " + BLOCK_SEPARATOR.join(BLOCKS[:2]), ""]
+    text = document(pages)
+    chunks = PageChunker(chunk_size=120, chunk_overlap=50).split_text(text)
+
+    assert chunks
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+    assert {chunk.page for chunk in chunks} == {1, 2}
+
+
+def test_chunks_never_cross_pages():
+    pages = [BLOCKS[0], BLOCKS[1]]
+    chunks = PageChunker(chunk_size=500, chunk_overlap=0).split_text(document(pages))
+    assert [(chunk.page, chunk.text) for chunk in chunks] == [(1, BLOCKS[0]), (2, BLOCKS[1])]
+
+
+def test_chunks_hold_whole_blocks_and_overlap():
+    text = BLOCK_SEPARATOR.join(BLOCKS)
+    chunks = PageChunker(chunk_size=110, chunk_overlap=50).split_page(text, 1)
+
+    assert len(chunks) == 3
+    for chunk in chunks:
+        assert len(chunk.text) <= 110
+        assert all(
+            block in BLOCKS for block in chunk.text.split(BLOCK_SEPARATOR)
+        )
+    # Each chunk repeats the last block of the one before
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.start < previous.end
+        assert chunk.text.startswith(previous.text.split(BLOCK_SEPARATOR)[-1])
+    assert chunks[-1].text.endswith(BLOCKS[-1])
+
+
+def test_long_blocks_split_on_whitespace():
+    words = " ".join(f"word{i}" for i in range(200))
+    chunks = PageChunker(chunk_size=100, chunk_overlap=20).split_page(words, 1, offset=7)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk.text) <= 100
+        assert words[chunk.start - 7:chunk.end - 7] == chunk.text
+        assert not chunk.text.startswith(" ") and not chunk.text.endswith(" ")
+        assert chunk.text.split()[0].startswith("word")
+    assert chunks[0].start == 7
+    assert chunks[-1].end == 7 + len(words)
+
+
+def test_overlap_must_be_smaller_than_chunk():
+    with pytest.raises(ValueError):
+        PageChunker(chunk_size=100, chunk_overlap=100)
+
+
+def test_page_text_skips_images_and_empty_blocks():
+    blocks = [
+        (0, 0, 1, 1, " First block \n", 0, 0),
+        (0, 0, 1, 1, "<image>", 1, 1),
+        (0, 0, 1, 1, "   ", 2, 0),
+        (0, 0, 1, 1, "Second block", 3, 0),
+    ]
+    assert page_text(blocks) == "First block" + BLOCK_SEPARATOR + "Second block"
+
+
+def test_chunks_round_trip(tmp_path):
+    path = str(tmp_path / "1.chunks.jsonl")
+    chunks = [Chunk("Résumé", 1, 0, 6), Chunk("Invoices", 2, 8, 16)]
+    save_chunks(path, chunks)
+    assert [chunk.to_dict() for chunk in load_chunks(path)] == \
+        [chunk.to_dict() for chunk in chunks]
@@ -0,0 +1,75 @@
+from app.services.text_store import PageText, TextStore, write_pages
+from app.utils.text_processing import PAGE_SEPARATOR
+import pytest
+
+PAGES = [
+    "Invoices are payable within 45 days.",
+    "Résumé of the termination clause — 30 days’ notice.",
+    "",
+    "Late payments accrue interest at 2% per month.",
+]
+
+
+@pytest.fixture(params=["none", "zlib"])
+def pages_path(request, tmp_path):
+    path = str(tmp_path / "1.pages")
+    write_pages(path, PAGES, compression=request.param)
+    return path
+
+
+def test_pages_round_trip(pages_path):
+    text = PageText(pages_path)
+    assert text.page_count == len(PAGES)
+    assert list(text.pages()) == PAGES
+    assert text.text() == PAGE_SEPARATOR.join(PAGES)
+
+
+def test_span_matches_document_text(pages_path):
+    text = PageText(pages_path)
+    document = PAGE_SEPARATOR.join(PAGES)
+    start = 0
+    for page in PAGES:
+        for begin, end in [(0, len(page)), (3, 10), (len(page) // 2, len(page))]:
+            assert text.span(start + begin, start + end) == document[start + begin:start + end]
+        start += len(page) + len(PAGE_SEPARATOR)
+
+
+def test_uncompressed_pages_are_views(tmp_path):
+    path = str(tmp_path / "1.pages")
+    write_pages(path, PAGES)
+    assert isinstance(PageText(path).raw_page(1), memoryview)
+
+
+def test_page_out_of_range(pages_path):
+    text = PageText(pages_path)
+    for number in (0, len(PAGES) + 1):
+        with pytest.raises(IndexError):
+            text.page(number)
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        write_pages(str(tmp_path / "1.pages"), PAGES, compression="lz4")
+
+
+def test_plain_text_files_are_indexed(tmp_path):
+    path = tmp_path / "1.txt"
+    path.write_text(PAGE_SEPARATOR.join(PAGES), encoding="utf-8")
+    text = PageText(str(path))
+    assert list(text.pages()) == PAGES
+    offset = len(PAGES[0]) + len(PAGE_SEPARATOR)
+    assert text.span(offset, offset + 6) == PAGES[1][:6]
+
+
+def test_store_shares_and_reopens_mappings(tmp_path):
+    path = str(tmp_path / "1.pages")
+    write_pages(path, PAGES)
+    store = TextStore(max_open=2)
+    first = store.open(path)
+    assert store.open(path) is first
+
+    # A replaced file is mapped again
+    store.write(path, ["Rewritten page."])
+    reopened = store.open(path)
+    assert reopened is not first
+    assert reopened.page(1) == "Rewritten page."
@@ -0,0 +1,36 @@
+from datetime import datetime
+from app.utils.cache import LRUCache
+from app.utils.pagination import decode_cursor, encode_cursor
+import pytest
+import time
+
+
+def test_values_skip_expired_entries():
+    evicted = []
+    cache = LRUCache(max_entries=4, ttl=0.05, on_evict=lambda key, value: evicted.append(key))
+    cache.put("old", 1)
+    time.sleep(0.1)
+    cache.put("new", 2)
+
+    assert cache.values() == [2]
+    assert "old" not in cache
+    assert evicted == ["old"]
+    assert cache.stats()["expirations"] == 1
+
+
+def test_values_without_ttl_keep_everything():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.values() == [1, 2]
+
+
+def test_cursor_round_trip():
+    uploaded_at = datetime(2024, 5, 1, 12, 30, 15, 250000)
+    assert decode_cursor(encode_cursor(uploaded_at, 42)) == (uploaded_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "WzFd", "eyJhIjogMX0"])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+import os
+from app.services.embeddings import HashEmbeddings
+from app.services.vector_index import SharedIndex
+import pytest
+
+embeddings = HashEmbeddings(64)
+
+
+def document(document_id: int):
+    return SimpleNamespace(id=document_id, content_hash=f"hash-{document_id}")
+
+
+def add(index: SharedIndex, document_id: int, count: int = 3):
+    texts = [f"Document {document_id} chunk {number}" for number in range(count)]
+    index.add_document(document_id, texts, embeddings.embed_documents(texts))
+    return texts
+
+
+def search(index: SharedIndex, document_ids, text: str):
+    results = index.search(
+        [document(document_id) for document_id in document_ids],
+        embeddings.embed_query(text),
+        k=10
+    )
+    return {result.page_content for result, _ in results}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SharedIndex(embeddings, root=str(tmp_path))
+
+
+def generations(index: SharedIndex):
+    return sorted(name for name in os.listdir(index.root) if name.startswith("gen-"))
+
+
+def test_compaction_keeps_live_vectors(index):
+    kept = add(index, 1)
+    add(index, 2)
+    index.delete_document(2)
+
+    result = index.compact()
+
+    assert result == {"generation": 1, "vectors": len(kept), "removed": 0}
+    assert search(index, [1, 2], kept[0]) == set(kept)
+    assert set(index.get_vectors(document(1))) == set(kept)
+    assert not index.contains(document(2))
+
+
+def test_writes_after_compaction_use_the_new_generation(index):
+    add(index, 1)
+    index.compact()
+    texts = add(index, 2)
+
+    other = SharedIndex(embeddings, root=os.path.dirname(index.root))
+    assert other.contains(document(2))
+    assert search(other, [2], texts[0]) == set(texts)
+
+
+def test_other_processes_follow_a_compaction(index):
+    texts = add(index, 1)
+    # A separate instance compacts, as a compaction job would
+    SharedIndex(embeddings, root=os.path.dirname(index.root)).compact()
+
+    assert search(index, [1], texts[0]) == set(texts)
+    assert index._generation == 1
+
+
+def test_old_generations_removed_one_compaction_later(index):
+    add(index, 1)
+    index.compact()
+    assert generations(index) == ["gen-000000", "gen-000001"]
+
+    result = index.compact()
+
+    # The generation just replaced may still have readers and is kept
+    assert result["removed"] == 1
+    assert generations(index) == ["gen-000001", "gen-000002"]
@@ -0,0 +1,132 @@
+import io
+import os
+import struct
+import zipfile
+import zlib
+import pytest
+from app.utils.zipstream import UnsupportedEntry, ZipStreamError, read_zip
+
+FILES = {
+    "a.pdf": b"%PDF-1.4 first " * 5000,
+    "docs/b.pdf": os.urandom(200_000),
+    # The descriptor signature inside the data must not end a stored entry
+    "c.pdf": b"head PK\x07\x08" + b"\x01" * 12 + b"PK\x07\x08 tail",
+}
+
+
+class Unseekable(io.RawIOBase):
+    """A write-only stream, so zipfile appends data descriptors as streaming tools do."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+
+def make_zip(files=FILES, compression=zipfile.ZIP_DEFLATED, streamed=False, zip64=False):
+    output = Unseekable() if streamed else io.BytesIO()
+    with zipfile.ZipFile(output, "w", compression=compression) as archive:
+        for name, data in files.items():
+            with archive.open(name, "w", force_zip64=zip64) as entry:
+                entry.write(data)
+    return bytes(output.buffer) if streamed else output.getvalue()
+
+
+async def chunked(data: bytes, size: int = 1000):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def read_all(data: bytes, size: int = 1000) -> dict:
+    files = {}
+    async for entry in read_zip(chunked(data, size)):
+        files[entry.name] = b"".join([chunk async for chunk in entry.chunks()])
+    return files
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED])
+@pytest.mark.parametrize("streamed", [False, True], ids=["sizes", "data_descriptor"])
+@pytest.mark.parametrize("zip64", [False, True], ids=["zip32", "zip64"])
+async def test_reads_every_entry(compression, streamed, zip64):
+    archive = make_zip(compression=compression, streamed=streamed, zip64=zip64)
+    header_flags = struct.unpack_from("<H", archive, 6)[0]
+    assert bool(header_flags & 0x8) == streamed
+    assert await read_all(archive) == FILES
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 7, 65536])
+async def test_chunk_boundaries_do_not_matter(size):
+    archive = make_zip(compression=zipfile.ZIP_STORED, streamed=True)
+    assert await read_all(archive, size) == FILES
+
+
+def local_entry(name: bytes, data: bytes, extra: bytes, compressed_size: int, size: int) -> bytes:
+    header = struct.pack(
+        "<4sHHHHHIIIHH", b"PK\x03\x04", 45, 0, 0, 0, 0,
+        zlib.crc32(data), compressed_size, size, len(name), len(extra)
+    )
+    return header + name + extra + data
+
+
+@pytest.mark.asyncio
+async def test_zip64_extra_holds_only_the_marked_sizes():
+    data = b"%PDF-1.4 zip64 " * 100
+    # Only the compressed size is marked, so the extra field holds just that
+    extra = struct.pack("<HHQ", 0x0001, 8, len(data))
+    archive = local_entry(b"a.pdf", data, extra, 0xFFFFFFFF, len(data))
+    archive += local_entry(b"b.pdf", b"second", b"", 6, 6) + b"PK\x05\x06" + b"\x00" * 18
+    assert await read_all(archive) == {"a.pdf": data, "b.pdf": b"second"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streamed", [False, True], ids=["sizes", "data_descriptor"])
+@pytest.mark.parametrize("compression", [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED])
+async def test_truncated_archive(compression, streamed):
+    archive = make_zip(compression=compression, streamed=streamed)
+    with pytest.raises(ZipStreamError, match="truncated"):
+        await read_all(archive[:len(archive) // 2])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED])
+async def test_corrupt_entry(compression):
+    archive = bytearray(make_zip({"a.pdf": b"%PDF-1.4 " * 1000}, compression))
+    data_start = 30 + len("a.pdf")
+    archive[data_start + 20:data_start + 40] = os.urandom(20)
+    with pytest.raises(ZipStreamError, match="corrupt|CRC"):
+        await read_all(bytes(archive))
+
+
+@pytest.mark.asyncio
+async def test_not_a_zip():
+    with pytest.raises(ZipStreamError, match="Not a ZIP archive"):
+        await read_all(b"%PDF-1.4 not an archive")
+
+
+@pytest.mark.asyncio
+async def test_unsupported_entry_is_skipped():
+    archive = bytearray(make_zip({"a.pdf": b"bzip2 " * 100, "b.pdf": b"kept"}, zipfile.ZIP_STORED))
+    struct.pack_into("<H", archive, 8, 12)  # the first entry claims bzip2
+    names = []
+    async for entry in read_zip(chunked(bytes(archive))):
+        names.append(entry.name)
+        if entry.name == "a.pdf":
+            with pytest.raises(UnsupportedEntry):
+                await entry.chunks().__anext__()
+        else:
+            assert b"".join([chunk async for chunk in entry.chunks()]) == b"kept"
+    assert names == ["a.pdf", "b.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_unread_entries_are_skipped():
+    async for entry in read_zip(chunked(make_zip(streamed=True))):
+        # Read one chunk, leave the rest to the reader
+        await entry.chunks().__anext__()